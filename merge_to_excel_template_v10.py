@@ -1,103 +1,124 @@
 
+import hashlib
 import streamlit as st
 import pandas as pd
 from io import BytesIO
 
+from thermal_log_arrow import pa, write_dataset
+from thermal_log_cache import cached_upload
+from thermal_log_core import (
+    FILE_TYPES, UPLOAD_TYPES, concat_segments, content_key, normalize, summarize, summary_columns,
+)
+from thermal_log_correlation import prune_log, redundancy_table, redundant_columns
+from thermal_log_derived import (
+    apply_derived, compile_derived, definitions_text, load_definitions, parse_definitions,
+)
+from thermal_log_energy import energy_table
+from thermal_log_excel import write_workbook
+from thermal_log_fit import fit_table
+from thermal_log_lag import lag_results, lag_table
+from thermal_log_phases import phase_ranges, phase_table
+from thermal_log_quality import clean_log, quality_table
+from thermal_log_rules import check_logs, checked_columns
+from thermal_log_windows import WINDOW_MINUTES, WINDOW_COLUMNS, parse_phases, window_table
+
 try:
     import xlsxwriter
 except ImportError:
     st.error("請先安裝 xlsxwriter 套件：pip install xlsxwriter")
     st.stop()
 
+
+def frame_key(df):
+    # 小表格（Summary、能量、擬合…）的內容指紋，判斷已產生的匯出檔是否仍對應目前的結果
+    return hashlib.sha1(df.to_csv().encode("utf-8")).hexdigest()
+
+
 st.set_page_config(page_title="Thermal Log 整合工具 v10", layout="wide")
 st.title("📊 Thermal Log 統整工具 v10（欄位比對修復＋可視化）")
 
-uploaded_files = st.file_uploader("📂 上傳多個 CSV 或 Excel 檔案", type=["csv", "xls", "xlsx"], accept_multiple_files=True)
-
-sheet_data = {"HW64": [], "PTAT": [], "GPUmon": []}
-summary_columns = [
-    'Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]',
-    'IA Cores Power [W]', 'GT Cores Power [W]', ' 1:NVVDD Power (W)', ' 1:FBVDD Power (W)',
-    'CPU Package [蚓]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)', 'Temp0 [蚓]',
-    'SEN1-temp(Degree C)', 'SEN2-temp(Degree C)', 'SEN3-temp(Degree C)', 'SEN4-temp(Degree C)',
-    'SEN5-temp(Degree C)', 'SEN6-temp(Degree C)', 'SEN7-temp(Degree C)', 'SEN8-temp(Degree C)',
-    'SEN9-temp(Degree C)', 'J', 'C', 'D',
-    'HP1-1', 'HP1-2', 'HP1-3', 'HP1-4', 'HP2-1', 'HP2-2', 'HP2-3', 'HP2-4',
-    'CPUfin', 'GPUfin'
-]
-
-def normalize(col):
-    if not isinstance(col, str):
-        return ""
-    return col.strip().lower().replace(" ", "").replace(":", "").replace("（", "(").replace("）", ")")
-
-def classify_file(name):
-    lower = name.lower()
-    if "gpu" in lower:
-        return "GPUmon"
-    elif "ptat" in lower:
-        return "PTAT"
-    elif "hw" in lower:
-        return "HW64"
-    else:
-        return None
+uploaded_files = st.file_uploader("📂 上傳多個 CSV 或 Excel 檔案（可為 zip / gz / xz 壓縮檔）", type=UPLOAD_TYPES,
+                                  accept_multiple_files=True)
+
+sheet_data = {t: [] for t in FILE_TYPES}
 
 if uploaded_files:
-    merged_all = []
+    all_logs = []
     total_max_rows = 0
 
+    # 衍生欄位：以 {標準欄位名稱} 撰寫運算式，附加後與原生欄位一樣寫入各 sheet、Summary 與 Parquet
+    derived_text = st.text_area("🧮 衍生欄位（每行「名稱 = 運算式」，欄位名稱以 {} 包住）", value=definitions_text(load_definitions()))
+    try:
+        derived_plan = compile_derived(parse_definitions(derived_text))
+    except ValueError as e:
+        st.error(f"❌ 衍生欄位定義錯誤：{e}")
+        derived_plan = compile_derived({})
+    stat_columns = summary_columns + list(derived_plan["outputs"])
+    # 移除彼此幾乎相同（|r| ≥ 0.999）或固定不變的非標準欄位，各 sheet 與 Parquet 更小、匯出更快
+    drop_redundant = st.checkbox("🧹 移除重複 / 常數欄位（標準欄位與衍生欄位參照的欄位一律保留）", value=False)
+    raw_logs = []
+
     for f in uploaded_files:
-        file_type = classify_file(f.name)
-        if not file_type:
-            st.warning(f"⚠️ 檔案 `{f.name}` 無法分類，已略過")
-            continue
         try:
-            if f.name.endswith(".csv"):
-                if file_type == "GPUmon":
-                    df_raw = pd.read_csv(f, encoding="cp950", engine="python", on_bad_lines="skip", skiprows=35)
-                    df_raw.columns = df_raw.iloc[0]
-                    df = df_raw.iloc[1:].reset_index(drop=True)
-                else:
-                    df = pd.read_csv(f, encoding="cp950", engine="python", on_bad_lines="skip")
-            else:
-                df = pd.read_excel(f)
-
-            df.columns = df.columns.str.strip()
-            df = df.loc[:, ~df.columns.duplicated()]  # 🔧 移除重複欄位
-
-            if file_type == "HW64":
-                df = df.iloc[5:-2].reset_index(drop=True)
-            elif file_type == "PTAT":
-                df = df.iloc[5:].reset_index(drop=True)
-
-            sheet_data[file_type].append(df)
-            merged_all.append(df)
-            total_max_rows = max(total_max_rows, len(df))
-            st.success(f"✅ 已處理 `{f.name}`（{file_type}，共 {len(df)} 筆）")
+            # 壓縮檔內的成員依檔名分類，以串流解壓縮後平行解析
+            entries = cached_upload("v10", f.name, f.getvalue())
         except Exception as e:
             st.error(f"❌ 錯誤：{f.name} → {e}")
+            continue
+        if not entries:
+            st.warning(f"⚠️ 壓縮檔 `{f.name}` 內沒有可分類的檔案，已略過")
+        for name, file_type, log, error in entries:
+            if not file_type:
+                st.warning(f"⚠️ 檔案 `{name}` 無法分類，已略過")
+            elif error:
+                st.error(f"❌ 錯誤：{name} → {error}")
+            else:
+                raw_logs.append(log)
+                if drop_redundant:
+                    log = prune_log(log, redundant_columns(log, keep=derived_plan["channels"]))
+                log = apply_derived(log, derived_plan)
+                sheet_data[file_type].append(log)
+                all_logs.append(log)
+                total_max_rows = max(total_max_rows, len(log))
+                st.success(f"✅ 已處理 `{name}`（{file_type}，共 {len(log)} 筆）")
+
+    st.markdown("### 🩺 資料品質（時間中斷、卡值、超出範圍、突波）")
+    quality_df = quality_table(all_logs)
+    if len(quality_df):
+        st.warning(f"⚠️ {quality_df['檔案'].nunique()} 個檔案共 {len(quality_df)} 項異常")
+        st.dataframe(quality_df, use_container_width=True)
+    else:
+        st.success("✅ 未發現資料品質問題")
+    exclude_flagged = st.checkbox("📋 Summary 排除被標記的異常樣本", value=False)
 
     st.markdown("### 📊 設定 Summary 統計範圍")
+    # 自動偵測各檔案的工作階段；選擇階段時各檔案各自取該階段的範圍，取代串接後的起訖列
+    log_phases = {id(log): phase_ranges(log) for log in all_logs}
+    phase_labels = list(dict.fromkeys(label for ranges in log_phases.values() for label in ranges))
+    chosen_phase = st.selectbox("🧭 套用工作階段", ["（依起始列 / 結束列）", *phase_labels])
     start_row = st.number_input("📍 起始列 (從 0 開始)", min_value=0, value=0)
     end_row = st.number_input("📍 結束列（不含）", min_value=start_row + 1, value=total_max_rows)
 
     st.markdown("### 📋 Summary 統計（平均值）")
-    if merged_all:
-        stat_df = pd.concat(merged_all, ignore_index=True).iloc[start_row:end_row]
-        stat_df.columns = stat_df.columns.str.strip()
-        norm_stat_cols = [normalize(c) for c in stat_df.columns]
+    if all_logs:
+        if chosen_phase in phase_labels:
+            segments = [(log, *log_phases[id(log)][chosen_phase])
+                        for log in all_logs if chosen_phase in log_phases[id(log)]]
+        else:
+            # 等同串接所有檔案後取 start_row ~ end_row，但不複製資料
+            segments = concat_segments(all_logs, start_row, end_row)
+        if exclude_flagged:
+            segments = [(clean_log(log), s, e) for log, s, e in segments]
+        norm_stat_cols = list(dict.fromkeys(normalize(c) for log, _, _ in segments for c in log.columns))
 
         results = []
         missing_columns = []
+        resolved = {col for log, _, _ in segments for col in log.standard}
 
-        for col in summary_columns:
-            target_key = normalize(col)
-            match = [c for c in stat_df.columns if normalize(c) == target_key]
-            if match:
-                series = pd.to_numeric(stat_df[match[0]], errors='coerce').dropna()
-                value = f"{series.mean():.2f}" if not series.empty else "-"
-            else:
-                value = "-"
+        for col, values in summarize(segments, stat_columns).items():
+            mean = values["mean"]
+            value = f"{mean:.2f}" if mean is not None else "-"
+            if col not in resolved:
                 missing_columns.append(col)
             results.append({"參數名稱": col, "平均值": value})
 
@@ -111,5 +132,101 @@ if uploaded_files:
         with st.expander("📋 所有目前欄位名稱（正規化後）"):
             st.write(norm_stat_cols)
 
+        if drop_redundant:
+            with st.expander("🧹 已移除的重複 / 常數欄位"):
+                redundancy_df = redundancy_table(raw_logs, keep=derived_plan["channels"])
+                st.dataframe(redundancy_df[redundancy_df["可移除"]], use_container_width=True)
+
+        st.markdown("### 🔋 能量（Wh，依時間戳記積分，取樣中斷的區間不列入）")
+        energy_ranges = [("全部", log, None, None) for log in all_logs]
+        energy_ranges += [(f"Summary 範圍 {s}:{e}", log, s, e) for log, s, e in segments]  # 排除的樣本不積分
+        energy_df = energy_table(energy_ranges)
+        st.dataframe(energy_df, use_container_width=True)
+
+        st.markdown("### ⏱️ 熱時間常數（負載步階後擬合 T∞ − ΔT·e^(−t/τ)）")
+        fit_df = fit_table(all_logs)
+        st.dataframe(fit_df, use_container_width=True)
+
+        st.markdown("### 🧭 工作階段（功耗變化點自動切分）")
+        phases_df = phase_table(all_logs)
+        st.dataframe(phases_df, use_container_width=True)
+
+        st.markdown("### 🧩 分段統計（每 N 分鐘或自訂階段的 mean / min / max）")
+        window_minutes = st.number_input("每段分鐘數", min_value=0.5, value=float(WINDOW_MINUTES), step=0.5)
+        phases_text = st.text_input("自訂階段（名稱=起始分鐘，逗號分隔；空白則依固定分鐘數切分）", placeholder="idle=0, load=5, cooldown=35")
+        try:
+            windows_df = window_table(all_logs, window_minutes, parse_phases(phases_text))
+        except ValueError as e:
+            st.error(f"❌ 階段格式錯誤：{e}")
+            windows_df = pd.DataFrame(columns=WINDOW_COLUMNS)
+        st.dataframe(windows_df, use_container_width=True)
+
+        st.markdown("### ✅ 規格檢查（各檔案完整資料）")
+        try:
+            compliance = check_logs(all_logs)
+        except ValueError as e:
+            st.error(f"❌ 限制值檔案錯誤：{e}")
+            compliance = None
+        else:
+            failed = compliance.index[compliance["結果"] == "FAIL"].tolist()
+            if failed:
+                st.error(f"❌ 不通過：{', '.join(failed)}")
+            st.dataframe(checked_columns(compliance), use_container_width=True)
+
+        st.markdown("### 📤 匯出 B Excel（含 Summary 與圖表）")
+        add_charts = st.checkbox("📈 加入 Excel 原生圖表（各感測器分組，抽樣資料）", value=True)
+        tables = {
+            "Energy": energy_df, "Fit": fit_df, "Quality": quality_df, "Phases": phases_df, "Windows": windows_df,
+        }
+        if compliance is not None:
+            tables["Compliance"] = compliance.reset_index()
+        # 活頁簿（含圖表）按下按鈕才產生，結果依檔案內容與設定存在 session_state；其他選項變更的 rerun 不重建
+        b_key = (
+            tuple((t, tuple(content_key(log) for log in logs)) for t, logs in sheet_data.items()), add_charts,
+            frame_key(summary_df), tuple((name, frame_key(df)) for name, df in tables.items()),
+        )
+        if st.button("🛠️ 產生 B Excel"):
+            b_excel = BytesIO()
+            write_workbook(b_excel, sheet_data, summary_df, charts=add_charts, tables=tables)
+            st.session_state["b_excel"] = (b_key, b_excel.getvalue())
+        built = st.session_state.get("b_excel")
+        if built is not None and built[0] == b_key:
+            st.download_button(
+                label="⬇️ 下載 B Excel（含統整 Summary）",
+                data=built[1],
+                file_name="B_full_data_with_summary.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        elif built is not None:
+            st.info("ℹ️ 資料或設定已變更，請重新產生 B Excel")
+
+        st.markdown("### 📦 匯出 Parquet（合併、時間對齊、標準欄位名稱）")
+        if pa is None:
+            st.warning("請先安裝 pyarrow 套件：pip install pyarrow")
+        else:
+            include_raw = st.checkbox("包含非標準欄位", value=False)
+            # 各 logger 的時鐘偏移以共同功耗欄位的 FFT 互相關估計，合併時校正到 HW64 的時間軸
+            correct_lag = st.checkbox("🕒 校正 logger 時鐘偏移（互相關估計）", value=True)
+            # 與 B Excel 相同：按下按鈕才估計偏移並寫出，結果依檔案內容與設定存在 session_state
+            parquet_key = (tuple(content_key(log) for log in all_logs), include_raw, correct_lag, tuple(stat_columns))
+            if st.button("🛠️ 產生 Parquet"):
+                lags = lag_results(all_logs) if correct_lag else {}
+                parquet_buffer = BytesIO()
+                write_dataset(parquet_buffer, all_logs, "parquet", include_raw=include_raw, targets=stat_columns,
+                              offsets={name: r["offset"] for name, r in lags.items()})
+                st.session_state["parquet"] = (parquet_key, parquet_buffer.getvalue(), lag_table(lags))
+            built = st.session_state.get("parquet")
+            if built is not None and built[0] == parquet_key:
+                if len(built[2]):
+                    st.dataframe(built[2], use_container_width=True)
+                st.download_button(
+                    label="⬇️ 下載 Parquet",
+                    data=built[1],
+                    file_name="merged_data.parquet",
+                    mime="application/octet-stream"
+                )
+            elif built is not None:
+                st.info("ℹ️ 資料或設定已變更，請重新產生 Parquet")
+
 else:
     st.info("請上傳至少一個檔案以開始。")
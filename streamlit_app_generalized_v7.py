@@ -4,35 +4,41 @@ import matplotlib.pyplot as plt
 import numpy as np
 from io import BytesIO, StringIO
 
+from thermal_log_cache import cached_upload
+from thermal_log_core import detect_format, write_csv
+from thermal_log_correlation import prune_log, redundancy_table, redundant_columns
+from thermal_log_derived import apply_derived, compile_derived, definitions_text, load_definitions, parse_definitions
+from thermal_log_energy import POWER_CHANNELS, cumulative_energy, energy_table, log_seconds, standard_ranges
+from thermal_log_events import event_table
+from thermal_log_fit import fit_table
+from thermal_log_overlay import aligned_seconds, load_starts
+from thermal_log_phases import phase_ranges, phase_table, phase_window_table
+from thermal_log_pyramid import pyramid_view
+from thermal_log_quality import clean_log, quality_table
+from thermal_log_steady import STEADY_TOLERANCE, all_steady, steady_table
+from thermal_log_windows import WINDOW_MINUTES, parse_phases, window_table
+
 def normalize(col):
     if not isinstance(col, str):
         return ""
     return col.strip().lower().replace(" ", "").replace(":", "").replace("（", "(").replace("）", ")")
 
-def classify_file(filename):
-    lower = filename.lower()
-    if "gpu" in lower:
-        return "GPUmon"
-    elif "ptat" in lower:
-        return "PTAT"
-    elif "hw" in lower:
-        return "HW64"
-    else:
-        return "Other"
+def classify_file(source, filename):
+    # 依標題區指紋辨識格式（檔名改過也能辨識），查無時才模糊比對欄位與檔名
+    return detect_format(source, filename) or "Other"
 
 st.set_page_config(page_title="Thermal Log 分析工具 v6", layout="wide")
 st.title("Thermal Log 分析工具（格式修正 v6）")
 
-uploaded_files = st.file_uploader("請上傳 thermal log 的 CSV 檔（可多選）", type="csv", accept_multiple_files=True)
+uploaded_files = st.file_uploader("請上傳 thermal log 的 CSV 檔（可多選，可為 zip / gz / xz 壓縮檔）", type=["csv", "zip", "gz", "xz"], accept_multiple_files=True)
 
-all_dataframes = {}
+logs = {}
 file_column_selection = {}
 file_range_selection = {}
-valid_dataframes = []
 common_params = [
     'Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]',
     'IA Cores Power [W]', 'GT Cores Power [W]', ' 1:NVVDD Power (W)', ' 1:FBVDD Power (W)',
-    'CPU Package [蚓]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)',
+    'CPU Package [°C]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)',
     'SEN1-temp(Degree C)', 'SEN2-temp(Degree C)', 'SEN3-temp(Degree C)', 'SEN4-temp(Degree C)',
     'SEN5-temp(Degree C)', 'SEN6-temp(Degree C)', 'SEN7-temp(Degree C)', 'SEN8-temp(Degree C)', 'SEN9-temp(Degree C)'
 ]
@@ -40,123 +46,249 @@ common_params = [
 if uploaded_files:
     st.info("📌 每個檔案可選擇多個欄位與資料範圍，圖表支援高解析度（DPI 200）")
 
+    # 衍生欄位：以 {標準欄位名稱} 撰寫運算式，附加後與原生欄位一樣可選取、統計、匯出與繪圖
+    derived_text = st.text_area("🧮 衍生欄位（每行「名稱 = 運算式」，欄位名稱以 {} 包住，如 Rth = ({CPU Package [°C]} - {Temp0 [°C]}) / {CPU Package Power [W]}）",
+                                value=definitions_text(load_definitions()))
+    try:
+        derived_plan = compile_derived(parse_definitions(derived_text))
+    except ValueError as e:
+        st.error(f"❌ 衍生欄位定義錯誤：{e}")
+        derived_plan = compile_derived({})
+    common_params = common_params + list(derived_plan["outputs"])
+
+    # 彼此幾乎相同（|r| ≥ 0.999）或固定不變的欄位；標準欄位與衍生欄位參照的欄位一律保留
+    redundancy_mode = st.radio("🧹 重複 / 常數欄位", ["保留", "隱藏（欄位選單不顯示）", "移除（載入後捨棄，匯出也不包含）"],
+                               horizontal=True)
+    raw_logs = []
+    hidden_columns = {}
+
     for uploaded_file in uploaded_files:
+        filename = uploaded_file.name
         try:
-            filename = uploaded_file.name
-            shortname = filename.split('/')[-1]
-            file_type = classify_file(filename)
-
-            if file_type == "GPUmon":
-                all_lines = uploaded_file.getvalue().decode('cp950').splitlines()
-                df = pd.read_csv(StringIO("\n".join(all_lines[35:])), encoding='cp950', engine='python')
-            elif file_type == "PTAT":
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip')
-                df = df.iloc[5:].reset_index(drop=True)
-            elif file_type == "HW64":
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', skipfooter=2, on_bad_lines='skip')
-                df = df.iloc[:, :-6]  # 移除最後六欄
-                df = df.iloc[:-2] .reset_index(drop=True)
+            # 快取命中時不需重新讀檔；壓縮檔成員以串流解壓縮後平行解析；只保留 float32 矩陣
+            # 各格式的前言、標題列、檔尾與雜訊欄位依 thermal_log_formats 的規格處理
+            entries = cached_upload("v7", filename, uploaded_file.getvalue(), classify=classify_file)
+        except Exception as e:
+            st.error(f"❌ 檔案 {filename} 發生錯誤：{e}")
+            continue
+        for shortname, file_type, log, error in entries:
+            if error:
+                st.error(f"❌ 檔案 {shortname} 發生錯誤：{error}")
             else:
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip')
-                df = df.reset_index(drop=True)
+                raw_logs.append(log)
+                redundant = redundant_columns(log, keep=derived_plan["channels"]) if redundancy_mode != "保留" else []
+                if redundancy_mode.startswith("移除"):
+                    log = prune_log(log, redundant)
+                else:
+                    hidden_columns[shortname.split('/')[-1]] = set(redundant)
+                logs[shortname.split('/')[-1]] = apply_derived(log, derived_plan)
 
-            df.columns = df.columns.str.strip()
-            all_dataframes[shortname] = df
-            valid_dataframes.append((shortname, df))
+    if redundancy_mode != "保留":
+        with st.expander("🧹 重複 / 常數欄位清單"):
+            st.dataframe(redundancy_table(raw_logs, keep=derived_plan["channels"]))
 
+    # 載入時掃描時間中斷、卡值、超出範圍與突波；勾選後彙總數值排除被標記的樣本
+    quality_df = quality_table(list(logs.values()))
+    if len(quality_df):
+        st.warning(f"🩺 資料品質：{quality_df['檔案'].nunique()} 個檔案共 {len(quality_df)} 項異常")
+        with st.expander("🩺 資料品質報告"):
+            st.dataframe(quality_df)
+    exclude_flagged = st.checkbox("彙總時排除被標記的異常樣本", value=False)
+
+    for shortname, log in logs.items():
+        try:
             st.markdown(f"---\n### 📁 檔案：{shortname}")
 
-            selected_cols = st.multiselect(f"選擇要分析的欄位（{shortname}）", df.columns.tolist(), key='col_' + shortname)
+            hidden = hidden_columns.get(shortname, set())
+            selected_cols = st.multiselect(f"選擇要分析的欄位（{shortname}）", [c for c in log.columns if c not in hidden],
+                                           key='col_' + shortname)
             file_column_selection[shortname] = selected_cols
 
-            total_rows = len(df)
-            start_index = st.number_input(f"從第 N 筆開始（{shortname}）", min_value=0, max_value=total_rows - 1, value=0, key='start_' + shortname)
-            end_index = st.number_input(f"到第 M 筆結束（{shortname}）", min_value=start_index + 1, max_value=total_rows, value=total_rows, key='end_' + shortname)
+            total_rows = len(log)
+            # 選擇自動偵測的工作階段時，直接把起訖筆數設為該階段的範圍
+            ranges = phase_ranges(log)
+
+            def snap_to_phase(shortname=shortname, ranges=ranges):
+                phase = st.session_state['phase_' + shortname]
+                if phase in ranges:
+                    st.session_state['start_' + shortname], st.session_state['end_' + shortname] = ranges[phase]
+
+            if ranges:
+                st.selectbox(f"🧭 套用工作階段（{shortname}）", ["（自訂範圍）", *ranges], key='phase_' + shortname,
+                             on_change=snap_to_phase)
+            st.session_state.setdefault('start_' + shortname, 0)
+            st.session_state.setdefault('end_' + shortname, total_rows)
+            start_index = st.number_input(f"從第 N 筆開始（{shortname}）", min_value=0, max_value=total_rows - 1, key='start_' + shortname)
+            end_index = st.number_input(f"到第 M 筆結束（{shortname}）", min_value=start_index + 1, max_value=total_rows, key='end_' + shortname)
             file_range_selection[shortname] = (start_index, end_index)
 
             if selected_cols:
-                df_subset = df.iloc[start_index:end_index]
                 st.write("📊 統計資訊：")
                 for col in selected_cols:
-                    series = pd.to_numeric(df_subset[col], errors='coerce').dropna()
+                    values = log.column(col, start_index, end_index)
                     st.write(f"🔹 **{col}**")
-                    st.write(f"- 最大值：{series.max():.2f}")
-                    st.write(f"- 最小值：{series.min():.2f}")
-                    st.write(f"- 平均值：{series.mean():.2f}")
+                    st.write(f"- 最大值：{np.nanmax(values):.2f}")
+                    st.write(f"- 最小值：{np.nanmin(values):.2f}")
+                    st.write(f"- 平均值：{np.nanmean(values):.2f}")
 
         except Exception as e:
-            st.error(f"❌ 檔案 {filename} 發生錯誤：{e}")
+            st.error(f"❌ 檔案 {shortname} 發生錯誤：{e}")
 
     st.markdown("---")
     st.subheader("📌 常用參數彙總（唯一值，不顯示檔名）")
 
     unique_param_results = []
     added_keys = set()
+    # 溫度欄位在負載步階後的指數擬合：τ、T∞ 與 R² 與數值列在同一列
+    fits = fit_table(logs.values()).set_index(["檔案", "參數名稱"])
 
-    for shortname, df in valid_dataframes:
-        df_tail = df.tail(600)
+    for shortname, log in logs.items():
+        summary_log = clean_log(log) if exclude_flagged else log
         for col in common_params:
             key = normalize(col)
             if key in added_keys:
                 continue
-            match = [c for c in df_tail.columns if normalize(c) == key]
+            match = [c for c in log.columns if normalize(c) == key]
             if match:
-                values = pd.to_numeric(df_tail[match[0]], errors='coerce').dropna()
-                value = f"{values.mean():.2f}" if not values.empty else "-"
-                unique_param_results.append((col, value))
+                values = summary_log.column(match[0], -600)
+                values = values[~np.isnan(values)]
+                value = f"{values.mean():.2f}" if values.size else "-"
+                fit = fits.loc[(log.name, col.strip())] if (log.name, col.strip()) in fits.index else None
+                unique_param_results.append((col, value, *(
+                    (fit["τ (s)"], fit["T∞"], fit["R²"]) if fit is not None else (None, None, None))))
                 added_keys.add(key)
 
-    summary_df = pd.DataFrame(unique_param_results, columns=["參數名稱", "數值"])
+    summary_df = pd.DataFrame(unique_param_results, columns=["參數名稱", "數值", "τ (s)", "T∞", "R²"])
     desired_order = [
         'Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]',
         'IA Cores Power [W]', 'GT Cores Power [W]', ' 1:NVVDD Power (W)', ' 1:FBVDD Power (W)',
-        'CPU Package [蚓]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)',
+        'CPU Package [°C]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)',
         'SEN1-temp(Degree C)', 'SEN2-temp(Degree C)', 'SEN3-temp(Degree C)', 'SEN4-temp(Degree C)',
         'SEN5-temp(Degree C)', 'SEN6-temp(Degree C)', 'SEN7-temp(Degree C)', 'SEN8-temp(Degree C)', 'SEN9-temp(Degree C)'
     ]
+    desired_order += list(derived_plan["outputs"])
     summary_df = summary_df.set_index("參數名稱").reindex(desired_order).reset_index()
     st.dataframe(summary_df)
 
-    export_raw_dataframes = []
-    for shortname, df in all_dataframes.items():
+    # 未跑完（或仍在記錄中）的 log 也可預測各溫度欄位的最終穩態值，全部達到容許誤差即可提前結束
+    st.subheader("⏳ 穩態預測")
+    tolerance = st.number_input("容許誤差（°C）", min_value=0.1, value=STEADY_TOLERANCE, step=0.1)
+    steady_df = steady_table(logs.values(), tolerance=tolerance)
+    if len(steady_df):
+        if all_steady(steady_df):
+            st.success("✅ 所有溫度欄位的預測穩態值皆在容許誤差內，可提前結束測試")
+        else:
+            remaining = steady_df["預估還需 (s)"].max()
+            st.info(f"⏳ 尚未達穩態，預估還需約 {remaining / 60:.1f} 分鐘" if pd.notna(remaining) and remaining != float("inf")
+                    else "⏳ 尚未達穩態")
+        st.dataframe(steady_df)
+
+    # 功耗欄位以實際時間戳記積分成能量；取樣中斷的區間不列入
+    st.subheader("🔋 能量（Wh，依時間戳記積分）")
+    energy_ranges = []
+    for shortname, log in logs.items():
+        start_index, end_index = file_range_selection.get(shortname, (0, len(log)))
+        energy_ranges.extend(standard_ranges(log, start_index, end_index))
+    energy_df = energy_table(energy_ranges)
+    if len(energy_df):
+        st.dataframe(energy_df)
+        if st.checkbox("顯示累積能量曲線", value=False):
+            fig_e, ax_e = plt.subplots(figsize=(12, 4), dpi=200)
+            for shortname, log in logs.items():
+                for channel in POWER_CHANNELS:
+                    curve = cumulative_energy(log, channel)
+                    if curve is not None:
+                        ax_e.plot(log_seconds(log) / 60, curve, label=f"{shortname} - {channel.strip()}")
+            ax_e.set_xlabel("Minutes")
+            ax_e.set_ylabel("Wh")
+            ax_e.grid(True)
+            ax_e.legend(loc="upper center", bbox_to_anchor=(0.5, -0.25), ncol=3, frameon=False)
+            st.pyplot(fig_e)
+    else:
+        st.write("沒有含時間戳記的功耗欄位")
+
+    # 功耗變化點切分出的 idle / ramp / load / cooldown 階段
+    st.subheader("🧭 工作階段")
+    st.dataframe(phase_table(logs.values()))
+
+    # 每 N 分鐘（或自訂 / 自動偵測的階段）一列的 mean / min / max，所有欄位以 reduceat 一次彙總
+    st.subheader("🧩 分段統計")
+    if st.checkbox("依自動偵測的工作階段切分", value=False):
+        st.dataframe(phase_window_table(list(logs.values())))
+    else:
+        window_minutes = st.number_input("每段分鐘數", min_value=0.5, value=float(WINDOW_MINUTES), step=0.5)
+        phases_text = st.text_input("自訂階段（名稱=起始分鐘，逗號分隔；空白則依固定分鐘數切分）", placeholder="idle=0, load=5, cooldown=35")
+        try:
+            windows_df = window_table(logs.values(), window_minutes, parse_phases(phases_text))
+            st.dataframe(windows_df)
+        except ValueError as e:
+            st.error(f"❌ 階段格式錯誤：{e}")
+
+    # 匯出欄位只保留 view，寫入 CSV bytes 時才逐段複製；每個檔案的所選欄位前附上該檔案的 Timestamp
+    export_columns = []
+    for shortname, log in logs.items():
         selected_cols = file_column_selection.get(shortname, [])
-        start_index, end_index = file_range_selection.get(shortname, (0, len(df)))
+        start_index, end_index = file_range_selection.get(shortname, (0, len(log)))
         if selected_cols:
-            df_subset = df.iloc[start_index:end_index][selected_cols].copy()
-            export_raw_dataframes.append(df_subset.reset_index(drop=True))
+            export_columns.extend(log.to_columns(selected_cols, start_index, end_index, with_time=True).items())
 
-    if export_raw_dataframes:
-        merged_export = pd.concat(export_raw_dataframes, axis=1)
+    if export_columns:
         buffer = BytesIO()
-        merged_export.to_csv(buffer, index=False, encoding='utf-8-sig')
+        write_csv(buffer, export_columns)
         buffer.seek(0)
         st.download_button("⬇️ 匯出所選 raw data 為 CSV", buffer, file_name="selected_raw_data.csv", mime="text/csv")
 
+    # 所有檔案、所有欄位的過溫 / 降頻事件；圖上以色塊標示所選欄位的事件區段
+    events = event_table(logs.values())
+    if len(events):
+        st.subheader("⚠️ 過溫 / 降頻事件")
+        st.dataframe(events)
+
     chart_title = st.text_input("🖋️ 圖表標題", value="跨檔案多欄位比較圖")
     st.subheader("📈 同圖比較曲線圖")
+    # 多個檔案時預設以負載起點對齊（t = 0），x 軸改為秒數；偵測不到步階的檔案以所選範圍起點為 0
+    align = st.checkbox("⏱️ 以負載起點對齊（t = 0）", value=len(logs) > 1)
+    starts = load_starts(logs.values()) if align else {}
+    unaligned = [name for name, s in starts.items() if s is None]
+    if unaligned:
+        st.caption(f"⚠️ 找不到負載步階，以所選範圍起點對齊：{', '.join(unaligned)}")
     fig, ax = plt.subplots(figsize=(12, 5), dpi=200)
+    pixel_width = int(fig.get_figwidth() * fig.dpi)
 
-    for shortname, df in all_dataframes.items():
+    for shortname, log in logs.items():
         selected_cols = file_column_selection.get(shortname, [])
-        start_index, end_index = file_range_selection.get(shortname, (0, len(df)))
-        df_subset = df.iloc[start_index:end_index]
+        start_index, end_index = file_range_selection.get(shortname, (0, len(log)))
+        origin = starts.get(log.name)
+        origin = start_index if origin is None else origin
+
+        def to_x(rows, log=log, start_index=start_index, origin=origin):
+            # 相對 start_index 的筆數 → 對齊後的秒數（未對齊時維持筆數）
+            return aligned_seconds(log, np.asarray(rows) + start_index, origin) if align else rows
+
         for col in selected_cols:
-            if col in df_subset.columns:
-                series = pd.to_numeric(df_subset[col], errors='coerce').dropna()
-                ax.plot(series.reset_index(drop=True), label=f"{shortname} - {col}")
+            if col in log.column_index:
+                # 依可見範圍與像素寬度挑選金字塔層級，只畫數千點
+                x, y = pyramid_view(log.matrix, log.pyramid, log.column_index[col],
+                                    start_index, end_index, max_points=pixel_width)
+                line, = ax.plot(to_x(x), y, label=f"{shortname} - {col}")
+                spans = events[(events["檔案"] == log.name) & (events["欄位"] == col)
+                               & (events["end"] > start_index) & (events["start"] < end_index)]
+                for s, e in zip(spans["start"], spans["end"]):
+                    ax.axvspan(*to_x([max(s, start_index) - start_index, min(e, end_index) - start_index]),
+                               color=line.get_color(), alpha=0.15)
 
     ax.set_title(chart_title)
-    ax.set_xlabel("Index")
+    ax.set_xlabel("Seconds from load start" if align else "Index")
     ax.set_ylabel("Value")
     ax.grid(True)
     ax.legend(loc="upper center", bbox_to_anchor=(0.5, -0.25), ncol=3, frameon=False)
     st.pyplot(fig)
 
     labels = []
-    for shortname, df in all_dataframes.items():
+    for shortname, log in logs.items():
         selected_cols = file_column_selection.get(shortname, [])
         for col in selected_cols:
-            if col in df.columns:
+            if col in log.column_index:
                 labels.append(f"{shortname} - {col}")
     if labels:
         st.markdown("**📋 曲線項目說明：**")
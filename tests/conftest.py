@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 合成的 HW64 / PTAT / GPUmon CSV：版面依 thermal_log_formats.py 的內建規格（前言、說明列、檔尾）
+# 功耗為隨機長度的高低負載段，溫度以一階響應跟隨功耗，足以讓互相關、階段切分等有明確的結構
+
+START = datetime(2025, 7, 30, 10, 0, 0)
+
+
+def power_profile(n, seed=0, low=10.0, high=60.0):
+    # 每 20 ~ 90 秒切換一次高低負載的功耗序列（1 Hz）
+    rng = np.random.default_rng(seed)
+    values = np.empty(n)
+    i, level = 0, low
+    while i < n:
+        length = int(rng.integers(20, 90))
+        values[i:i + length] = level
+        level = high if level == low else low
+        i += length
+    return values + rng.normal(0, 0.3, n)
+
+
+def temperature_profile(power, tau=40.0, ambient=35.0, gain=0.8):
+    temperature = np.empty(len(power))
+    t = ambient + gain * power[0]
+    for i, p in enumerate(power):
+        t += (ambient + gain * p - t) / tau
+        temperature[i] = t
+    return temperature
+
+
+def _rows(values):
+    return [",".join(f"{v:.3f}" for v in row) for row in zip(*values)]
+
+
+def hw64_csv(power, start=START, temperature=None):
+    temperature = temperature_profile(power) if temperature is None else temperature
+    total = power + 25.0
+    warmup = 5
+    times = [start + timedelta(seconds=i - warmup) for i in range(len(power) + warmup)]
+    lines = ["Date,Time,Total System Power [W],CPU Package Power [W],CPU Package [°C]"]
+    values = _rows([np.r_[np.zeros(warmup), c] for c in (total, power, temperature)])
+    lines += [f"{t:%d.%m.%Y},{t:%H:%M:%S.%f}"[:-3] + "," + v for t, v in zip(times, values)]
+    lines += ["Date,Time,Total System Power [W],CPU Package Power [W],CPU Package [°C]", ",,System,CPU,CPU"]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def ptat_csv(power, start=START, clock_offset=0.0):
+    # clock_offset：PTAT 主機時鐘相對真實時間的偏移（秒）；時間欄位只有 hh:mm:ss:fff
+    sensors = [temperature_profile(power, tau=30.0 + 5 * i, ambient=30.0 + i) for i in range(1, 10)]
+    header = "Time," + ",".join(f"SEN{i}-temp(Degree C)" for i in range(1, 10)) + ",CPU Package Power [W]"
+    lines = [header] + [",".join(["desc"] * 11)] * 5
+    for i, v in enumerate(_rows([*sensors, power])):
+        t = start + timedelta(seconds=i + clock_offset)
+        lines.append(f"{t:%H:%M:%S}:{t.microsecond // 1000:03d},{v}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def gpumon_csv(power, start=START, clock_offset=0.0):
+    lines = [f"GPUmon preamble line {i}" for i in range(35)]
+    lines += [" , (W), (W), (C)", "Time, 1:TGP (W), 1:NVVDD Power (W), 1:Temperature GPU (C)"]
+    temperature = temperature_profile(power, tau=25.0, ambient=40.0)
+    for i, v in enumerate(_rows([power, 0.6 * power, temperature])):
+        t = start + timedelta(seconds=i + clock_offset)
+        lines.append(f"{t:%H:%M:%S.%f}"[:-3] + "," + v)
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@pytest.fixture
+def logs_dir(tmp_path, monkeypatch):
+    # 指紋表與解析快取寫到暫存目錄，不影響使用者的 ~/.thermal_log_cache
+    import thermal_log_core
+    monkeypatch.setattr(thermal_log_core, "HEADERS_FILE", str(tmp_path / "header_formats.json"))
+    monkeypatch.setattr(thermal_log_core, "_headers", None)
+    return tmp_path
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from conftest import hw64_csv, power_profile, ptat_csv
+from thermal_log_catalog import connect, ingest_bytes, list_channels, list_runs
+
+
+def test_time_only_runs_have_no_run_date(logs_dir):
+    conn = connect(str(logs_dir / "catalog.db"))
+    power = power_profile(300)
+    ingest_bytes(conn, hw64_csv(power), "run_hw64.csv")
+    ingest_bytes(conn, ptat_csv(power), "run_ptat.csv")
+    runs = list_runs(conn).set_index("name")
+    assert runs.loc["run_hw64.csv", "run_date"] == "2025-07-30"
+    assert pd.isna(runs.loc["run_ptat.csv", "run_date"])
+    assert runs.loc["run_ptat.csv", "start_time"].startswith("10:00:00")
+    assert list(list_runs(conn, date_from="2025-07-30", date_to="2025-07-30")["name"]) == ["run_hw64.csv"]
+
+
+def test_migrations_run_once(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    connect(path).close()
+    conn = connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+
+
+def test_batch_catalog_stores_the_parsed_log(logs_dir):
+    # 衍生欄位、--drop-redundant 只影響本次輸出，run 目錄保存的是檔案本身的欄位
+    from thermal_log_batch import main
+
+    (logs_dir / "run_hw64.csv").write_bytes(hw64_csv(power_profile(300)))
+    db = str(logs_dir / "catalog.db")
+    argv = [str(logs_dir / "run_hw64.csv"), "-o", str(logs_dir / "out"), "--jobs", "1", "--format", "json",
+            "--no-lag", "--catalog", db, "--drop-redundant", "--derived", "Rth = {CPU Package [°C]} / 2"]
+    assert main(argv) == 0
+    conn = connect(db)
+    assert set(list_channels(conn)) == {"Total System Power [W]", "CPU Package Power [W]", "CPU Package [°C]"}
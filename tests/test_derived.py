@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from thermal_log_core import ThermalLog
+from thermal_log_derived import apply_derived, compile_derived, evaluate_derived, parse_definitions
+
+COLUMNS = ["Total System Power [W]", "CPU Package Power [W]", "CPU Package [°C]", "Temp0 [°C]"]
+
+
+@pytest.fixture
+def log():
+    matrix = np.array([[80.0, 8.18, 70.0, 30.0], [90.0, 20.0, 75.0, 31.0], [100.0, 0.0, 80.0, 32.0]])
+    return ThermalLog("run_hw64.csv", "HW64", COLUMNS, matrix, fingerprint="f")
+
+
+def test_expression_values(log):
+    plan = compile_derived({
+        "Rth CPU [°C/W]": "({CPU Package [°C]} - {Temp0 [°C]}) / {CPU Package Power [W]}",
+        "Rest [W]": "{Total System Power [W]} - {CPU Package Power [W]}",
+        "Peak [W]": "max({Rest [W]}, 75) + abs(-1) * sqrt(4)",
+    })
+    values = evaluate_derived(plan, log)
+    np.testing.assert_allclose(values["Rth CPU [°C/W]"][:2], [40 / 8.18, 44 / 20.0], rtol=1e-6)
+    assert np.isnan(values["Rth CPU [°C/W]"][2])  # 除以 0 → NaN
+    np.testing.assert_allclose(values["Rest [W]"], [71.82, 70.0, 100.0], rtol=1e-6)
+    np.testing.assert_allclose(values["Peak [W]"], [75 + 2, 75 + 2, 100 + 2], rtol=1e-6)
+    assert all(v.dtype == np.float32 for v in values.values())
+
+
+def test_shared_subexpressions_are_computed_once():
+    plan = compile_derived({
+        "A": "{CPU Package [°C]} - {Temp0 [°C]}",
+        "B": "({CPU Package [°C]} - {Temp0 [°C]}) * 2",
+        "C": "{Temp0 [°C]} + {CPU Package [°C]}",
+        "D": "{CPU Package [°C]} + {Temp0 [°C]}",
+    })
+    assert sum(op == "Sub" for op, *_ in plan["nodes"]) == 1
+    assert sum(op == "Add" for op, *_ in plan["nodes"]) == 1
+    assert plan["outputs"]["C"] == plan["outputs"]["D"]
+
+
+@pytest.mark.parametrize("expression", [
+    "abs({Total System Power [W]} - 100, {CPU Package Power [W]})",
+    "max({CPU Package Power [W]})",
+    "sqrt()",
+    "abs(*{CPU Package Power [W]})",
+    "abs(x={CPU Package Power [W]})",
+    "{CPU Package Power [W]}.real",
+    "__import__('os')",
+    "{CPU Package Power [W]} +",
+])
+def test_invalid_expressions_raise_value_error(expression):
+    with pytest.raises(ValueError):
+        compile_derived({"X": expression})
+
+
+def test_cached_columns_are_never_written(log):
+    before = log.matrix.copy()
+    plan = compile_derived({"X": "abs({CPU Package Power [W]})", "Y": "-{CPU Package Power [W]}",
+                            "Z": "{CPU Package Power [W]}"})
+    result = apply_derived(log, plan)
+    result.column("Z")[:] = -1
+    np.testing.assert_array_equal(log.matrix, before)
+
+
+def test_missing_channels_are_skipped(log):
+    plan = compile_derived({"GPU [W]": "{ 1:TGP (W)} * 2", "CPU x2": "{CPU Package Power [W]} * 2"})
+    assert set(evaluate_derived(plan, log)) == {"CPU x2"}
+
+
+def test_apply_derived_memo_follows_expression(log):
+    first = apply_derived(log, compile_derived({"T [°C]": "{CPU Package [°C]}"}))
+    assert apply_derived(log, compile_derived({"T [°C]": "{CPU Package [°C]}"})) is first
+    edited = apply_derived(log, compile_derived({"T [°C]": "{CPU Package [°C]} + 300"}))
+    np.testing.assert_allclose(edited.column("T [°C]"), first.column("T [°C]") + 300)
+    assert edited.variant != first.variant
+    assert "T [°C]" not in log.column_index
+
+
+def test_parse_definitions():
+    text = "# 註解\nRth = ({CPU Package [°C]} - {Temp0 [°C]}) / {CPU Package Power [W]}\n\n"
+    assert parse_definitions(text) == {"Rth": "({CPU Package [°C]} - {Temp0 [°C]}) / {CPU Package Power [W]}"}
+    with pytest.raises(ValueError):
+        parse_definitions("no equals sign")
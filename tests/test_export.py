@@ -0,0 +1,19 @@
+from io import BytesIO
+
+from conftest import hw64_csv, power_profile, ptat_csv
+from thermal_log_core import load_log, write_csv
+
+
+def test_write_csv_includes_timestamps_across_chunks():
+    power = power_profile(300)
+    hw64 = load_log(hw64_csv(power), "run_hw64.csv", "HW64")
+    ptat = load_log(ptat_csv(power[:50]), "run_ptat.csv", "PTAT")
+    columns = [*hw64.to_columns(["CPU Package Power [W]"], 10, 200, with_time=True).items(),
+               *ptat.to_columns(["SEN1-temp(Degree C)"], with_time=True).items()]
+    buffer = BytesIO()
+    write_csv(buffer, columns, chunk_rows=64)
+    lines = buffer.getvalue().decode("utf-8-sig").splitlines()
+    assert lines[0] == "Timestamp,CPU Package Power [W],Timestamp,SEN1-temp(Degree C)"
+    assert len(lines) == 1 + 190
+    assert lines[1].startswith("2025-07-30 10:00:10.000,") and ",10:00:00.000," in lines[1]  # PTAT 不輸出佔位日期
+    assert lines[100].startswith("2025-07-30 10:01:49.000,") and lines[100].endswith(",,")
@@ -0,0 +1,71 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from conftest import gpumon_csv, hw64_csv, power_profile, ptat_csv
+from thermal_log_core import (detect_format, header_fingerprint, header_region, header_table, load_log,
+                              remember_header)
+
+
+def _table(logs_dir):
+    return json.loads((logs_dir / "header_formats.json").read_text(encoding="utf-8"))
+
+
+def test_detects_renamed_files_by_content(logs_dir):
+    power = power_profile(120)
+    assert detect_format(hw64_csv(power), "cpu_log_A.csv") == "HW64"
+    assert detect_format(ptat_csv(power), "sensors.csv") == "PTAT"
+    assert detect_format(gpumon_csv(power), "card.csv") == "GPUmon"
+    assert {entry["format"] for entry in _table(logs_dir).values()} == {"HW64", "PTAT", "GPUmon"}
+    assert all(entry["confirmed"] for entry in _table(logs_dir).values())
+
+
+def test_filename_guess_is_not_remembered(logs_dir):
+    data = b"Foo,Bar,Baz\n1,2,3\n4,5,6\n"
+    assert detect_format(data, "ptat_run.csv") == "PTAT"
+    assert not (logs_dir / "header_formats.json").exists()
+    assert detect_format(data, "other.csv") is None
+
+
+def test_unconfirmed_entries_are_rechecked(logs_dir):
+    data = hw64_csv(power_profile(120))
+    key = header_fingerprint(header_region(data.decode("utf-8")))
+    header_table()[key] = {"format": "PTAT", "columns": []}  # 舊版依檔名猜測寫入的項目
+    assert detect_format(data, "ptat_named.csv") == "HW64"
+    assert header_table()[key]["format"] == "HW64"
+
+
+def _remember(path, key):
+    remember_header(key, "HW64", ["Date", "Time"], path)
+
+
+def test_concurrent_writes_keep_all_entries(logs_dir):
+    # 多個行程同時寫入（如 thermal_log_batch --jobs）：每個行程只知道自己的項目，寫入時需與檔案合併
+    path = str(logs_dir / "header_formats.json")
+    keys = [f"key{i}" for i in range(24)]
+    with ProcessPoolExecutor(6) as pool:
+        list(pool.map(_remember, [path] * len(keys), keys))
+    assert set(keys) <= set(_table(logs_dir))
+
+
+def _quoted(data):
+    lines = data.decode("utf-8").splitlines()
+    return ("\n".join(",".join(f'"{f}"' for f in line.split(",")) for line in lines) + "\n").encode("utf-8")
+
+
+@pytest.mark.parametrize("quote", [False, True])
+def test_hw64_quoted_and_unquoted_headers(quote):
+    power = power_profile(120)
+    data = hw64_csv(power)
+    if quote:
+        data = _quoted(data)
+    else:
+        # 未加引號的 HWiNFO 標題中可能夾著單獨的引號（quoting=3 的原因）
+        data = data.replace(b"CPU Package [\xc2\xb0C]", b'Drive "C:" Temp [\xc2\xb0C]', 1)
+    log = load_log(data, "run_hw64.csv", "HW64")
+    assert {"Total System Power [W]", "CPU Package Power [W]"} <= set(log.standard)
+    assert not any('"' in c for c in log.columns if "Drive" not in c)
+    assert len(log) == len(power) and not np.isnat(log.timestamps).any()
+    np.testing.assert_allclose(log.column(log.standard["CPU Package Power [W]"]), power, atol=1e-3)
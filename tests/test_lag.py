@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import START, gpumon_csv, hw64_csv, power_profile, ptat_csv
+from thermal_log_core import TIME_ONLY_DATE, format_spec, load_log, on_date, parse_timestamps, time_only
+from thermal_log_lag import estimate_lag, lag_results
+
+
+def test_time_only_logs_use_placeholder_date():
+    ts = parse_timestamps(pd.DataFrame({"Time": ["10:00:00:250", "10:00:01:250", ""]}), format_spec("PTAT"))
+    assert ts[0] == np.datetime64("1900-01-01T10:00:00.250")
+    assert np.isnat(ts[2])
+    assert time_only(ts)
+
+
+def test_time_only_midnight_rollover():
+    ts = parse_timestamps(pd.DataFrame({"Time": ["23:59:59:000", "00:00:01:000"]}), format_spec("PTAT"))
+    assert (ts[1] - ts[0]) == np.timedelta64(2, "s")
+
+
+def test_dated_logs_are_not_time_only():
+    ts = parse_timestamps(pd.DataFrame({"Date": ["30.7.2025"], "Time": ["10:00:00.000"]}), format_spec("HW64"))
+    assert ts[0] == np.datetime64("2025-07-30T10:00:00")
+    assert not time_only(ts)
+
+
+def test_on_date_picks_reference_day_across_midnight():
+    reference = np.array(["2025-07-30T23:59:50"], dtype="datetime64[ns]")
+    ts = TIME_ONLY_DATE + np.array([np.timedelta64(5, "s")]).astype("timedelta64[ns]")  # 00:00:05
+    assert on_date(ts, reference)[0] == np.datetime64("2025-07-31T00:00:05")
+    assert on_date(reference, ts) is reference
+
+
+@pytest.mark.parametrize("clock_offset", [-8.0, 3.4])
+def test_estimate_lag_on_time_only_ptat(clock_offset):
+    power = power_profile(1800, seed=1)
+    hw64 = load_log(hw64_csv(power), "run_hw64.csv", "HW64")
+    ptat = load_log(ptat_csv(power, clock_offset=clock_offset), "run_ptat.csv", "PTAT")
+    assert time_only(ptat.timestamps) and not time_only(hw64.timestamps)
+    result = estimate_lag(hw64, ptat)
+    assert result is not None
+    assert result["offset"] == pytest.approx(-clock_offset, abs=0.2)
+    assert result["correlation"] > 0.9
+
+
+def test_lag_results_include_time_only_loggers():
+    power = power_profile(1800, seed=2)
+    logs = [
+        load_log(hw64_csv(power), "run_hw64.csv", "HW64"),
+        load_log(ptat_csv(power, clock_offset=-8.0), "run_ptat.csv", "PTAT"),
+        load_log(gpumon_csv(power, clock_offset=5.0), "run_gpumon.csv", "GPUmon"),
+    ]
+    results = lag_results(logs)
+    assert set(results) == {"run_ptat.csv", "run_gpumon.csv"}
+    assert results["run_ptat.csv"]["offset"] == pytest.approx(8.0, abs=0.2)
+    assert results["run_gpumon.csv"]["offset"] == pytest.approx(-5.0, abs=0.2)
+    assert all(r["reference"] == "run_hw64.csv" for r in results.values())
+
+
+def test_other_day_is_not_matched():
+    power = power_profile(1800, seed=3)
+    hw64 = load_log(hw64_csv(power), "run_hw64.csv", "HW64")
+    ptat = load_log(ptat_csv(power, start=START.replace(hour=16)), "run_ptat.csv", "PTAT")
+    assert estimate_lag(hw64, ptat) is None
+
+
+def test_dataset_aligns_time_only_logs_to_reference_date(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    from thermal_log_arrow import write_dataset
+    from thermal_log_lag import estimate_offsets
+
+    power = power_profile(1800, seed=4)
+    logs = [load_log(hw64_csv(power), "run_hw64.csv", "HW64"),
+            load_log(ptat_csv(power, clock_offset=-8.0), "run_ptat.csv", "PTAT")]
+    target = tmp_path / "merged.parquet"
+    write_dataset(str(target), logs, offsets=estimate_offsets(logs))
+    table = pq.read_table(target).to_pandas()
+    ptat = table[table["source"] == "run_ptat.csv"]
+    assert ptat["timestamp"].iloc[0] == pytest.approx(pd.Timestamp(START), abs=pd.Timedelta("0.2s"))
+    assert ptat["t"].iloc[0] == pytest.approx(0.0, abs=0.2)
@@ -0,0 +1,32 @@
+import pytest
+
+from conftest import hw64_csv, power_profile
+from thermal_log_batch import snap_to_phase
+from thermal_log_core import load_log, summarize
+from thermal_log_phases import find_phase, phase_ranges
+
+RANGES = {"idle": (0, 50), "load 1": (50, 100), "cooldown 1": (100, 130), "load 2": (130, 230),
+          "cooldown 2": (230, 260), "load 3": (260, 360)}
+
+
+@pytest.mark.parametrize("phase, expected", [
+    ("load", ("load 2", (130, 230))),  # 最長的一段，同長取較早者
+    ("load 3", ("load 3", (260, 360))),
+    ("idle", ("idle", (0, 50))),
+    ("cooldown", ("cooldown 1", (100, 130))),
+    ("ramp", None),
+    ("lo", None),
+])
+def test_find_phase(phase, expected):
+    assert find_phase(RANGES, phase) == expected
+
+
+def test_batch_summary_snaps_to_longest_numbered_load():
+    log = load_log(hw64_csv(power_profile(1800, seed=0)), "run_hw64.csv", "HW64")
+    ranges = phase_ranges(log)
+    assert "load" not in ranges and "load 2" in ranges  # 循環負載：load 帶編號
+    longest = max((r for label, r in ranges.items() if label.startswith("load ")), key=lambda r: r[1] - r[0])
+    results = [{"name": log.name, "log": log, "error": None, "summary": {}}]
+    snap_to_phase(results, "load", ["CPU Package Power [W]"])
+    assert results[0]["window"] == longest
+    assert results[0]["summary"] == summarize([(log, *longest)], ["CPU Package Power [W]"], ("mean",))
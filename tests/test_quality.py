@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from conftest import hw64_csv, power_profile, temperature_profile
+from thermal_log_core import ThermalLog, load_log
+from thermal_log_derived import apply_derived, compile_derived
+from thermal_log_quality import clean_log, quality_report, scan_log
+
+TEMPERATURE = "CPU Package [°C]"
+
+
+@pytest.fixture
+def log():
+    # 1 Hz、30 分鐘；溫度欄位注入 255 °C、凍結 700 秒、單點突波各一處（暖機列載入時已去除，索引即樣本位置）
+    power = power_profile(1800, seed=5)
+    temperature = temperature_profile(power)
+    temperature[100] = 255.0
+    temperature[300:1000] = temperature[300]
+    temperature[1400] += 30.0
+    return load_log(hw64_csv(power, temperature=temperature), "run_hw64.csv", "HW64")
+
+
+def _rows(flags, log, column=TEMPERATURE):
+    return np.flatnonzero(flags[:, log.column_index[column]])
+
+
+def test_flags_injected_defects(log):
+    flags, gaps = scan_log(log)
+    assert list(_rows(flags["超出範圍"], log)) == [100]
+    stuck = _rows(flags["卡值"], log)
+    assert stuck[0] == 300 and stuck[-1] == 999
+    assert 1400 in _rows(flags["突波"], log)
+    assert not flags["突波"][:, log.column_index["CPU Package Power [W]"]].any()
+    assert gaps["count"] == 0 and gaps["interval"] == pytest.approx(1.0)
+
+
+def test_short_plateau_is_not_stuck():
+    power = power_profile(1800, seed=6)
+    temperature = temperature_profile(power)
+    temperature[300:800] = temperature[300]  # 500 秒 < STUCK_SECONDS
+    log = load_log(hw64_csv(power, temperature=temperature), "run_hw64.csv", "HW64")
+    assert not scan_log(log)[0]["卡值"].any()
+
+
+def test_timestamp_gaps():
+    seconds = np.r_[np.arange(100), np.arange(160, 260)].astype("timedelta64[s]")
+    timestamps = np.datetime64("2025-07-30T10:00:00", "ns") + seconds.astype("timedelta64[ns]")
+    matrix = np.linspace(40.0, 60.0, 200)[:, None]
+    log = ThermalLog("gap.csv", "HW64", [TEMPERATURE], matrix, timestamps=timestamps, fingerprint="gap")
+    _, gaps = scan_log(log)
+    assert gaps["count"] == 1 and gaps["first"] == 100
+    assert gaps["seconds"] == pytest.approx(61.0)
+    assert quality_report(log)["問題"].tolist() == ["時間中斷"]
+
+
+def test_clean_log_masks_flagged_samples(log):
+    cleaned = clean_log(log)
+    column = cleaned.column(TEMPERATURE)
+    assert np.isnan(column[[100, 300, 999, 1400]]).all()
+    assert not np.isnan(log.column(TEMPERATURE)).any()
+    assert cleaned.variant == log.variant + ("clean",)
+    ok = ThermalLog("ok.csv", "HW64", ["x"], np.arange(5.0)[:, None], fingerprint="ok")
+    assert clean_log(ok) is ok
+
+
+def test_edited_derived_channel_is_rescanned(log):
+    # 同名衍生欄位改了算式後，結果必須重新掃描，不能沿用前一次的標記
+    first = apply_derived(log, compile_derived({"Hot [°C]": "{CPU Package Power [W]}"}))
+    assert not _rows(scan_log(first)[0]["超出範圍"], first, "Hot [°C]").size
+    edited = apply_derived(log, compile_derived({"Hot [°C]": "{CPU Package Power [W]} + 300"}))
+    assert _rows(scan_log(edited)[0]["超出範圍"], edited, "Hot [°C]").size == len(edited)
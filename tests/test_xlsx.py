@@ -0,0 +1,113 @@
+import re
+import zipfile
+from datetime import datetime, timedelta
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from thermal_log_core import normalize, read_xlsx
+
+openpyxl = pytest.importorskip("openpyxl")
+xlsxwriter = pytest.importorskip("xlsxwriter")
+
+# 寬表（超過 Z 欄）、稀疏（空儲存格、整列空白）、欄位中夾文字、公式與日期儲存格
+N_ROWS = 400
+CHANNELS = [f"CH{i} [°C]" for i in range(30)] + ["CPU & GPU <Power> [W]"]
+START = datetime(2025, 7, 30, 10, 0, 0)
+
+
+def _rows():
+    rng = np.random.default_rng(0)
+    for r in range(N_ROWS):
+        if r == 50:
+            yield [None] * (len(CHANNELS) + 1)
+            continue
+        values = [float(v) for v in np.round(rng.normal(50, 20, len(CHANNELS)), 3)]
+        values[r % len(CHANNELS)] = None
+        if r == 7:
+            values[3] = "N/A"
+        if r == 8:
+            values[4] = -1.25e-7
+        yield [START + timedelta(seconds=r, milliseconds=250)] + values
+
+
+def _openpyxl_book():
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(["Time"] + CHANNELS)
+    for row in _rows():
+        sheet.append(row)
+    buffer = BytesIO()
+    book.save(buffer)
+    return buffer.getvalue()
+
+
+def _xlsxwriter_book():
+    buffer = BytesIO()
+    book = xlsxwriter.Workbook(buffer)
+    sheet = book.add_worksheet()
+    time_format = book.add_format({"num_format": "yyyy-mm-dd hh:mm:ss.000"})
+    sheet.write_row(0, 0, ["Time"] + CHANNELS)
+    for r, row in enumerate(_rows(), start=1):
+        for c, value in enumerate(row):
+            if isinstance(value, datetime):
+                sheet.write_datetime(r, c, value, time_format)
+            elif value is not None:
+                sheet.write(r, c, value)
+    sheet.write_formula(N_ROWS, 1, "=B2+B3", None, 12.5)  # 含快取值的公式
+    book.close()
+    return buffer.getvalue()
+
+
+def _replace_sheet(data, pattern, repl):
+    out = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as src, zipfile.ZipFile(out, "w") as dst:
+        for item in src.infolist():
+            content = src.read(item)
+            if item.filename == "xl/worksheets/sheet1.xml":
+                content = re.sub(pattern, repl, content.decode("utf-8")).encode("utf-8")
+            dst.writestr(item, content)
+    return out.getvalue()
+
+
+def _assert_matches_read_excel(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    assert len(actual) == len(expected)
+    for column in expected.columns:
+        if normalize(column) in ("time", "date"):
+            np.testing.assert_array_equal(pd.to_datetime(actual[column]).to_numpy(),
+                                          pd.to_datetime(expected[column]).dt.round("ms").to_numpy())
+        else:
+            np.testing.assert_allclose(actual[column].astype(float), pd.to_numeric(expected[column], errors="coerce"),
+                                       rtol=1e-6, equal_nan=True)
+
+
+@pytest.mark.parametrize("build", [_openpyxl_book, _xlsxwriter_book])  # inline string / shared string
+@pytest.mark.parametrize("block_chars", [1 << 12, 8 << 20])
+def test_matches_read_excel(build, block_chars):
+    data = build()
+    _assert_matches_read_excel(read_xlsx(data, block_chars=block_chars), pd.read_excel(BytesIO(data)))
+
+
+def test_selected_columns_keep_time():
+    data = _xlsxwriter_book()
+    wanted = {"CH27 [°C]", "CPU & GPU <Power> [W]"}
+    actual = read_xlsx(data, usecols=lambda name: name in wanted)
+    assert list(actual.columns) == ["Time", "CH27 [°C]", "CPU & GPU <Power> [W]"]
+    _assert_matches_read_excel(actual, pd.read_excel(BytesIO(data), usecols=list(actual.columns)))
+
+
+@pytest.mark.parametrize("pattern, repl", [
+    (r'<c r="[A-Z]+\d+"', "<c"),  # 沒有 r 座標
+    (r'<c r="([A-Z]+\d+)" t="(\w+)"', r'<c t="\2" r="\1"'),  # 屬性順序不同
+    (r'<c r="([A-Z]+3\d\d)" t="(\w+)"', r'<c t="\2" r="\1"'),  # 只有後段資料列不同，在串流途中才發現
+])
+def test_falls_back_to_read_excel(pattern, repl, tmp_path):
+    data = _replace_sheet(_openpyxl_book(), pattern, repl)
+    expected = pd.read_excel(BytesIO(data))
+    _assert_matches_read_excel(read_xlsx(data, block_chars=1 << 12), expected)
+    path = tmp_path / "log.xlsx"
+    path.write_bytes(data)
+    _assert_matches_read_excel(read_xlsx(str(path), block_chars=1 << 12), expected)
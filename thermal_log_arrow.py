@@ -0,0 +1,121 @@
+import json
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 為選用套件，只有 Parquet / Arrow 匯出需要
+    pa = pq = None
+
+from thermal_log_core import on_date, reference_log, summary_columns
+
+# 匯出合併後的欄式資料（Parquet 或 Arrow IPC）：
+# 每個檔案一個 row group / record batch，欄位使用標準名稱，時間軸對齊到最早開始的檔案
+# source、file_type 以 dictionary 編碼，下游 pandas / notebook 讀取比 CSV、xlsx 快很多
+# offsets = {檔名: 秒數}（thermal_log_lag.estimate_offsets）：合併前先校正各 logger 的時鐘偏移，timestamp 與 t 皆已校正
+# 只有時間的檔案（PTAT、GPUmon）以參考檔案（reference_log）的日期補上日期後才對齊
+
+FORMATS = ("parquet", "arrow")
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("請先安裝 pyarrow 套件：pip install pyarrow")
+
+
+def shifted_timestamps(log, offsets=None, reference=None):
+    # 補上參考日期並套用時鐘偏移後的時間戳記（以毫秒為單位）；沒有時間欄位時回傳 None
+    if log.timestamps is None:
+        return None
+    ts = on_date(log.timestamps, reference.timestamps if reference is not None else None)
+    offset = (offsets or {}).get(log.name, 0.0)
+    return ts + np.timedelta64(int(round(offset * 1000)), "ms") if offset else ts
+
+
+def aligned_t0(logs, offsets=None, reference=None):
+    # 所有檔案中最早的有效時間戳記（已補上參考日期並套用偏移）；都沒有時間欄位時回傳 None
+    starts = []
+    for log in logs:
+        ts = shifted_timestamps(log, offsets, reference)
+        if ts is not None:
+            valid = ts[~np.isnat(ts)]
+            if valid.size:
+                starts.append(valid[0])
+    return min(starts) if starts else None
+
+
+def dataset_columns(logs, targets=summary_columns, include_raw=False):
+    # 輸出欄位：(輸出名稱, 取值函式)；標準欄位去掉前後空白，include_raw 時附加其他原始欄位
+    names = [t for t in targets if any(t in log.standard for log in logs)]
+    columns = [(t.strip(), lambda log, t=t: log.standard_column(t)) for t in names]
+    if include_raw:
+        used = {t.strip() for t in names}
+        for c in dict.fromkeys(c for log in logs for c in log.columns):
+            if c not in used and not any(log.standard.get(t) == c for log in logs for t in names):
+                columns.append((c, lambda log, c=c: log.column(c) if c in log.column_index else None))
+    return columns
+
+
+def build_schema(columns, logs, offsets=None):
+    fields = [
+        pa.field("source", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("file_type", pa.dictionary(pa.int32(), pa.string())),
+        pa.field("timestamp", pa.timestamp("ms")),
+        pa.field("t", pa.float64()),
+    ] + [pa.field(name, pa.float32()) for name, _ in columns]
+    metadata = {
+        "thermal_log.files": json.dumps(
+            [{"name": log.name, "type": log.file_type, "fingerprint": log.fingerprint, "rows": len(log),
+              "standard": log.standard} for log in logs],
+            ensure_ascii=False,
+        ),
+        "thermal_log.offsets": json.dumps(offsets or {}),
+    }
+    return pa.schema(fields, metadata=metadata)
+
+
+def log_batch(log, columns, schema, t0, dictionaries, offsets=None, reference=None):
+    # 單一檔案 → RecordBatch；數值欄位直接由 ThermalLog 的 float32 view 建立
+    # 所有 batch 共用同一組 dictionary（Arrow IPC file 不允許 batch 間替換 dictionary）
+    n = len(log)
+    source_names, type_names = dictionaries
+    sources = pa.DictionaryArray.from_arrays(
+        pa.array(np.full(n, source_names.index(log.name), dtype=np.int32)), pa.array(source_names))
+    types = pa.DictionaryArray.from_arrays(
+        pa.array(np.full(n, type_names.index(log.file_type or ""), dtype=np.int32)), pa.array(type_names))
+    shifted = shifted_timestamps(log, offsets, reference)
+    if shifted is not None:
+        ts = shifted.astype("datetime64[ms]")
+        timestamp = pa.array(ts, type=pa.timestamp("ms"), mask=np.isnat(ts))
+        t = (shifted - t0) / np.timedelta64(1, "s") if t0 is not None else np.full(n, np.nan)
+        t = pa.array(np.where(np.isnat(shifted), np.nan, t), from_pandas=True)
+    else:
+        timestamp = pa.nulls(n, pa.timestamp("ms"))
+        t = pa.nulls(n, pa.float64())
+    arrays = [sources, types, timestamp, t]
+    for _, getter in columns:
+        values = getter(log)
+        arrays.append(pa.nulls(n, pa.float32()) if values is None else pa.array(values, from_pandas=True))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_dataset(target, logs, fmt="parquet", include_raw=False, targets=summary_columns, offsets=None):
+    # target 可為檔案路徑或 BytesIO；targets 為輸出的標準欄位（可附加衍生欄位名稱）；offsets 為各檔案的時鐘偏移（秒）
+    require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"未知的格式：{fmt}")
+    columns = dataset_columns(logs, targets, include_raw)
+    schema = build_schema(columns, logs, offsets)
+    reference = reference_log(logs)
+    t0 = aligned_t0(logs, offsets, reference)
+    dictionaries = (list(dict.fromkeys(log.name for log in logs)),
+                    list(dict.fromkeys(log.file_type or "" for log in logs)))
+    if fmt == "parquet":
+        with pq.ParquetWriter(target, schema, compression="zstd", use_dictionary=["source", "file_type"]) as writer:
+            for log in logs:
+                writer.write_table(pa.Table.from_batches([log_batch(log, columns, schema, t0, dictionaries, offsets, reference)]))
+    else:
+        with pa.ipc.new_file(target, schema) as writer:
+            for log in logs:
+                writer.write_batch(log_batch(log, columns, schema, t0, dictionaries, offsets, reference))
@@ -0,0 +1,277 @@
+import argparse
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from thermal_log_arrow import write_dataset
+from thermal_log_catalog import connect, ingest_log
+from thermal_log_core import (
+    FILE_TYPES, STAT_FUNCS, archive_members, is_archive, parse_window, process_file, summarize, summary_columns,
+    summary_table, window_segments,
+)
+from thermal_log_correlation import prune_log, redundancy_table, redundant_columns
+from thermal_log_derived import apply_derived, compile_derived, load_definitions, parse_definitions
+from thermal_log_energy import energy_table
+from thermal_log_events import event_table
+from thermal_log_excel import write_workbook
+from thermal_log_fit import fit_table
+from thermal_log_lag import lag_results, lag_table
+from thermal_log_phases import find_phase, phase_ranges, phase_table
+from thermal_log_quality import clean_log, quality_table
+from thermal_log_rules import check_logs, default_rules
+from thermal_log_windows import WINDOW_MINUTES, parse_phases, window_table
+
+# 命令列批次模式：不載入 Streamlit，可排程跑 nightly regression
+# 用法：python thermal_log_batch.py "logs/**/*.csv" --jobs 4 --summary-window 600 --stats mean,max
+
+
+def expand_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+        for p in matches:
+            if os.path.isfile(p) and p not in paths:
+                paths.append(p)
+    return paths
+
+
+def expand_tasks(paths):
+    # 壓縮檔展開成 (路徑, 成員) 工作，讓各成員也能分散到不同 process 平行解析
+    tasks = []
+    for path in paths:
+        if is_archive(path):
+            tasks.extend((path, member) for member in archive_members(path, os.path.basename(path)))
+        else:
+            tasks.append((path, None))
+    return tasks
+
+
+def run_batch(paths, jobs=None, window=None, stats=("mean",)):
+    tasks = expand_tasks(paths)
+    if jobs == 1 or len(tasks) <= 1:
+        return [process_file(p, window, stats, m) for p, m in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        n = len(tasks)
+        return list(pool.map(process_file, [p for p, _ in tasks], [window] * n, [tuple(stats)] * n,
+                             [m for _, m in tasks]))
+
+
+def drop_redundant(results, keep=()):
+    # 移除各檔案重複 / 常數的非標準欄位 → 被移除欄位的清單（DataFrame）
+    logs = [r["log"] for r in results if not r["error"]]
+    table = redundancy_table(logs, keep=keep)
+    for r in results:
+        if not r["error"]:
+            r["log"] = prune_log(r["log"], redundant_columns(r["log"], keep=keep))
+    return table[table["可移除"]]
+
+
+def add_derived(results, plan, window=None, stats=("mean",)):
+    # 衍生欄位附加到各檔案，並補上各檔案 Summary 中的衍生欄位統計
+    names = list(plan["outputs"])
+    for r in results:
+        if not r["error"] and names:
+            r["log"] = apply_derived(r["log"], plan)
+            r["summary"].update(summarize(window_segments([r["log"]], window), names, stats))
+
+
+def snap_to_phase(results, phase, targets=summary_columns, stats=("mean",)):
+    # 各檔案的 Summary 改為自動偵測的指定階段（如 load、load 2）；只給類別時取該類最長的一段
+    # 沒有此階段的檔案保留原統計範圍
+    for r in results:
+        if r["error"]:
+            continue
+        ranges = phase_ranges(r["log"])
+        found = find_phase(ranges, phase)
+        if found is not None:
+            r["phase"], r["window"] = found
+            r["summary"] = summarize([(r["log"], *r["window"])], targets, stats)
+        else:
+            print(f"⚠️ {r['name']}：找不到階段 {phase}（可用：{', '.join(ranges) or '無'}），沿用原統計範圍",
+                  file=sys.stderr)
+
+
+def exclude_flagged(results, window=None, targets=summary_columns, stats=("mean",)):
+    # Summary 改用排除品質標記樣本後的資料（原始資料的匯出不受影響）
+    for r in results:
+        if not r["error"]:
+            r["summary_log"] = clean_log(r["log"])
+            r["summary"] = summarize([(r["summary_log"], *r.get("window", window or (None, None)))], targets, stats)
+
+
+def build_outputs(results, stats, window=None, targets=summary_columns):
+    ok = [r for r in results if not r["error"]]
+    fits = fit_table([r["log"] for r in ok])
+
+    # 每檔一列的 Summary（欄位 = 標準欄位 × 統計量）
+    per_file_rows = []
+    for r in ok:
+        row = {"file": r["name"], "type": r["type"], "rows": r["rows"]}
+        for target, values in r["summary"].items():
+            for stat in stats:
+                row[f"{target.strip()} [{stat}]"] = values[stat]
+        # 溫度欄位的時間常數擬合結果
+        for fit in fits[fits["檔案"] == r["log"].name].itertuples(index=False):
+            row[f"{fit[1]} [tau]"], row[f"{fit[1]} [T_inf]"], row[f"{fit[1]} [R2]"] = fit[4], fit[5], fit[8]
+        per_file_rows.append(row)
+    per_file_df = pd.DataFrame(per_file_rows)
+
+    # 所有檔案合併後的 Summary（同一標準欄位跨檔案合併統計）
+    combined = summarize([(r.get("summary_log", r["log"]), *r.get("window", window or (None, None))) for r in ok],
+                         targets, stats)
+    combined_df = summary_table(combined, stats)
+
+    sheet_logs = {t: [r["log"] for r in ok if r["type"] == t] for t in FILE_TYPES}
+    return per_file_df, combined, combined_df, sheet_logs, fits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thermal Log 批次整合（無 Streamlit）")
+    parser.add_argument("inputs", nargs="+", help="檔案路徑、資料夾或 glob（如 logs/**/*.csv），可為 .zip / .gz / .xz")
+    parser.add_argument("-o", "--out", default="batch_output", help="輸出資料夾（預設 batch_output）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="平行處理的 process 數（預設為 CPU 數）")
+    parser.add_argument("--summary-window", default="",
+                        help="統計範圍：N = 最後 N 筆；START:END = 第 START 到 END（不含）筆；空白 = 全部")
+    parser.add_argument("--stats", default="mean",
+                        help=f"逗號分隔的統計量，可用：{','.join(STAT_FUNCS)}（預設 mean）")
+    parser.add_argument("--format", default="csv,xlsx,json", help="輸出格式：csv,xlsx,json,parquet,arrow（預設 csv,xlsx,json）")
+    parser.add_argument("--no-charts", action="store_true", help="xlsx 不加入 Charts / ChartData sheet")
+    parser.add_argument("--derived", action="append", default=None,
+                        help="衍生欄位「名稱 = 運算式」，可重複指定（預設讀取 thermal_log_derived.json）")
+    parser.add_argument("--summary-phase", default=None,
+                        help="Summary 改用自動偵測的工作階段，取代 --summary-window；同類階段有多段時名稱帶編號"
+                             "（load 1、load 2…），只給類別（如 load）時取該類最長的一段")
+    parser.add_argument("--interval", type=float, default=WINDOW_MINUTES,
+                        help=f"分段統計每段分鐘數（預設 {WINDOW_MINUTES}）")
+    parser.add_argument("--phases", default="", help="分段統計改依自訂階段切分，如 idle=0,load=5,cooldown=35（分鐘）")
+    parser.add_argument("--no-lag", action="store_true", help="Parquet / Arrow 合併時不校正 logger 時鐘偏移")
+    parser.add_argument("--drop-redundant", action="store_true",
+                        help="移除彼此幾乎相同（|r| ≥ 0.999）或固定不變的非標準欄位，並輸出 redundancy.csv")
+    parser.add_argument("--exclude-flagged", action="store_true",
+                        help="Summary 排除資料品質檢查標記的樣本（卡值、超出範圍、突波）")
+    parser.add_argument("--catalog", default=None, help="同時匯入 SQLite run 目錄（資料庫路徑）")
+    parser.add_argument("--platform", default=None, help="匯入目錄時的平台名稱（預設為上層資料夾名稱）")
+    args = parser.parse_args(argv)
+
+    stats = [s.strip() for s in args.stats.split(",") if s.strip()]
+    unknown = [s for s in stats if s not in STAT_FUNCS]
+    if unknown:
+        parser.error(f"未知的統計量：{', '.join(unknown)}")
+    formats = {f.strip().lower() for f in args.format.split(",") if f.strip()}
+    window = parse_window(args.summary_window)
+    try:
+        definitions = parse_definitions("\n".join(args.derived)) if args.derived else load_definitions()
+        plan = compile_derived(definitions)
+        phases = parse_phases(args.phases)
+        rules = default_rules()
+    except ValueError as e:
+        parser.error(str(e))
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("❌ 找不到任何輸入檔案", file=sys.stderr)
+        return 1
+
+    results = run_batch(paths, args.jobs, window, stats)
+    for r in results:
+        # 讀檔後的原始 log 另外保存：run 目錄依內容指紋去重，不能存入依命令列選項加上 / 移除的欄位
+        r["parsed_log"] = r.get("log")
+        if r["error"]:
+            print(f"⚠️ {r['name']}：{r['error']}，已略過", file=sys.stderr)
+        else:
+            print(f"✅ {r['name']}（{r['type']}，共 {r['rows']} 筆）")
+
+    os.makedirs(args.out, exist_ok=True)
+    if args.drop_redundant:
+        redundancy = drop_redundant(results, plan["channels"])
+        print(f"🧹 移除 {len(redundancy)} 個重複 / 常數欄位")
+        redundancy.to_csv(os.path.join(args.out, "redundancy.csv"), index=False, encoding="utf-8-sig")
+    add_derived(results, plan, window, stats)
+    targets = summary_columns + list(plan["outputs"])
+    if args.summary_phase:
+        snap_to_phase(results, args.summary_phase, targets, stats)
+    if args.exclude_flagged:
+        exclude_flagged(results, window, targets, stats)
+    per_file_df, combined, combined_df, sheet_logs, fits = build_outputs(results, stats, window, targets)
+    ok_logs = [r["log"] for r in results if not r["error"]]
+    events = event_table(ok_logs)
+    if len(events):
+        print(f"⚠️ 偵測到 {len(events)} 個過溫 / 降頻事件")
+    energy_ranges = [("全部", log, None, None) for log in ok_logs]
+    if window is not None:
+        energy_ranges += [(f"summary window {args.summary_window}", log, *window) for log in ok_logs]
+    energy = energy_table(energy_ranges)
+    quality = quality_table(ok_logs)
+    if len(quality):
+        print(f"🩺 資料品質：{quality['檔案'].nunique()} 個檔案共 {len(quality)} 項異常（見 quality.csv）")
+    lags = {} if args.no_lag else lag_results(ok_logs)
+    offsets = {name: r["offset"] for name, r in lags.items()}
+    lag_df = lag_table(lags)
+    phase_df = phase_table(ok_logs)
+    windows = window_table(ok_logs, args.interval, phases)
+    compliance = check_logs(ok_logs, rules).reset_index()
+    failed = compliance.loc[compliance["結果"] == "FAIL", "檔案"].tolist()
+    if failed:
+        print(f"❌ 規格檢查不通過：{', '.join(failed)}")
+
+    if "csv" in formats:
+        per_file_df.to_csv(os.path.join(args.out, "summary_per_file.csv"), index=False, encoding="utf-8-sig")
+        combined_df.to_csv(os.path.join(args.out, "summary.csv"), index=False, encoding="utf-8-sig")
+        events.to_csv(os.path.join(args.out, "events.csv"), index=False, encoding="utf-8-sig")
+        compliance.to_csv(os.path.join(args.out, "compliance.csv"), index=False, encoding="utf-8-sig")
+        energy.to_csv(os.path.join(args.out, "energy.csv"), index=False, encoding="utf-8-sig")
+        fits.to_csv(os.path.join(args.out, "fit.csv"), index=False, encoding="utf-8-sig")
+        windows.to_csv(os.path.join(args.out, "windows.csv"), index=False, encoding="utf-8-sig")
+        phase_df.to_csv(os.path.join(args.out, "phases.csv"), index=False, encoding="utf-8-sig")
+        quality.to_csv(os.path.join(args.out, "quality.csv"), index=False, encoding="utf-8-sig")
+        lag_df.to_csv(os.path.join(args.out, "lag.csv"), index=False, encoding="utf-8-sig")
+    if "xlsx" in formats:
+        write_workbook(os.path.join(args.out, "B_full_data_with_summary.xlsx"), sheet_logs, combined_df,
+                       charts=not args.no_charts, tables={"Energy": energy, "Fit": fits, "Quality": quality, "Phases": phase_df, "Windows": windows, "Compliance": compliance})
+    for fmt in ("parquet", "arrow"):
+        if fmt in formats and ok_logs:
+            write_dataset(os.path.join(args.out, f"merged_data.{fmt}"), ok_logs, fmt, targets=targets, offsets=offsets)
+    if "json" in formats:
+        report = {
+            "window": args.summary_window or None,
+            "phase": args.summary_phase,
+            "exclude_flagged": args.exclude_flagged,
+            "stats": stats,
+            "files": [
+                {k: r.get(k) for k in ("name", "path", "type", "rows", "resolved", "phase", "summary", "error")}
+                for r in results
+            ],
+            "summary": combined,
+            "energy": energy.to_dict(orient="records"),
+            "fit": json.loads(fits.to_json(orient="records", force_ascii=False)),
+            "quality": json.loads(quality.to_json(orient="records", force_ascii=False)),
+            "lag": lag_df.to_dict(orient="records"),
+            "phases": phase_df.to_dict(orient="records"),
+            "windows": json.loads(windows.to_json(orient="records", force_ascii=False)),
+            "compliance": compliance.to_dict(orient="records"),
+            "events": json.loads(events.to_json(orient="records", date_format="iso", force_ascii=False)),
+        }
+        with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=2)
+
+    if args.catalog:
+        conn = connect(args.catalog)
+        for r in results:
+            if r["error"]:
+                continue
+            platform = args.platform or os.path.basename(os.path.dirname(os.path.abspath(r["path"]))) or None
+            ingest_log(conn, r["parsed_log"], platform=platform)
+        conn.close()
+
+    print(f"📦 輸出至 {os.path.abspath(args.out)}")
+    return 0 if any(not r["error"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from thermal_log_core import (
+    LRUCache, ThermalLog, archive_members, detect_format, file_fingerprint, is_archive, load_log, load_member, read_log,
+)
+from thermal_log_pyramid import PYRAMID_FACTORS, build_pyramid
+
+# 解析結果快取：以檔案指紋為 key，將 ThermalLog（數值矩陣、時間戳記、min/max 金字塔）存成 .npz
+# 同一個檔案在 Streamlit rerun 或下次開啟時不需重新讀檔、轉換與抽樣
+
+CACHE_DIR = os.environ.get("THERMAL_LOG_CACHE", os.path.join(os.path.expanduser("~"), ".thermal_log_cache"))
+CACHE_VERSION = 4  # 解析結果改變（如欄位名稱修正）時遞增，舊快取自動失效
+MEMORY_LIMIT = 1 << 30  # 記憶體中保留的 ThermalLog 總大小（位元組），超過時淘汰最久未用者，之後改從 .npz 讀回
+
+_memory = LRUCache(MEMORY_LIMIT, weight=lambda log: log.nbytes)
+
+
+def cache_path(key):
+    return os.path.join(CACHE_DIR, f"{key}-v{CACHE_VERSION}.npz")
+
+
+def store(key, log):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    arrays = {
+        "meta": np.array([log.name, log.file_type or "", log.fingerprint or "", log.source or ""], dtype=str),
+        "columns": np.array(log.columns, dtype=str),
+        "matrix": log.matrix,
+    }
+    if log.timestamps is not None:
+        arrays["timestamps"] = log.timestamps
+    for f, (mn, mx, mean) in (log.pyramid or {}).items():
+        arrays[f"min_{f}"], arrays[f"max_{f}"], arrays[f"mean_{f}"] = mn, mx, mean
+    tmp = cache_path(key) + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, cache_path(key))
+
+
+def load(key):
+    log = _memory.get(key)
+    if log is not None:
+        return log
+    path = cache_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            name, file_type, fingerprint, source = data["meta"].tolist()
+            log = ThermalLog(
+                name, file_type or None, data["columns"].tolist(), data["matrix"],
+                timestamps=data["timestamps"] if "timestamps" in data else None,
+                fingerprint=fingerprint or None, source=source or None,
+                pyramid={
+                    f: (data[f"min_{f}"], data[f"max_{f}"], data[f"mean_{f}"])
+                    for f in PYRAMID_FACTORS if f"min_{f}" in data
+                },
+            )
+    except (OSError, ValueError, KeyError):
+        return None
+    _memory[key] = log
+    return log
+
+
+def _finish(key, log):
+    if log.pyramid is None:
+        log.pyramid = build_pyramid(log.matrix)
+    try:
+        store(key, log)
+    except OSError:
+        pass  # 無法寫入時僅保留記憶體快取
+    _memory[key] = log
+    return log
+
+
+def cached_log(key, build):
+    # 快取命中時直接回傳；否則呼叫 build() 取得 ThermalLog，建立金字塔並寫入快取
+    log = load(key)
+    if log is not None:
+        return log
+    return _finish(key, build())
+
+
+def cached_upload(prefix, name, data, reader=read_log, classify=detect_format, jobs=None):
+    # 上傳檔或壓縮檔 → [(檔名, file_type, ThermalLog 或 None, 錯誤訊息或 None), ...]
+    # classify(source, name) → file_type；預設依標題區指紋辨識內容，已知版面只需查表
+    # 壓縮檔成員的快取 key 為「壓縮檔指紋 + 成員名稱」，命中時完全不需解壓縮；未命中者以 thread 平行解析
+    fingerprint = file_fingerprint(data)
+    if not is_archive(name):
+        file_type = classify(data, name)
+        if not file_type:
+            return [(name, None, None, "無法分類")]
+        log = cached_log(f"{prefix}-{file_type}-{fingerprint}",
+                         lambda: load_log(data, name, file_type, fingerprint, reader))
+        return [(name, file_type, log, None)]
+
+    members = archive_members(data, name)
+    keys = {m: f"{prefix}-{fingerprint}-{file_fingerprint(m.encode())[:12]}" for m in members}
+    logs = {m: load(keys[m]) for m in members}
+    errors = {}
+    missing = [m for m in members if logs[m] is None]
+    if missing:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = {m: pool.submit(load_member, data, name, m, reader) for m in missing}
+            for m, future in futures.items():
+                try:
+                    logs[m] = _finish(keys[m], future.result())
+                except Exception as e:
+                    errors[m] = str(e)
+    return [(os.path.basename(m), logs[m].file_type if logs[m] is not None else None, logs[m], errors.get(m))
+            for m in members]
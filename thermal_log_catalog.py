@@ -0,0 +1,304 @@
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import (
+    HEADER_REPAIRS, LOG_FORMATS, detect_format, elapsed_seconds, file_fingerprint, is_archive, load_archive, load_log,
+    normalize, read_log, summary_columns, time_only, to_float,
+)
+
+# 本機 SQLite 歷史 run 目錄：每個檔案存一次指紋、類型、筆數、時間範圍與各標準欄位統計
+# 查詢只讀資料庫，不需要重新讀原始 CSV
+
+DEFAULT_DB = "thermal_catalog.db"
+TAIL_ROWS = 600  # 與各工具的 tail(600) 穩態平均一致
+
+# 目錄只記錄標準欄位的統計，讀檔時略過其他欄位（xlsx 不解析其他儲存格）
+read_channels = partial(read_log, targets=summary_columns)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    fingerprint TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    path TEXT,
+    file_type TEXT NOT NULL,
+    platform TEXT,
+    run_date TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    duration_s REAL,
+    row_count INTEGER NOT NULL,
+    ingested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    channel TEXT NOT NULL,
+    channel_key TEXT NOT NULL,
+    source_column TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL,
+    min REAL,
+    max REAL,
+    std REAL,
+    tail_mean REAL,
+    PRIMARY KEY (run_id, channel_key)
+);
+CREATE INDEX IF NOT EXISTS idx_runs_platform ON runs(platform);
+CREATE INDEX IF NOT EXISTS idx_runs_date ON runs(run_date);
+CREATE INDEX IF NOT EXISTS idx_channels_key ON channels(channel_key, run_id);
+"""
+
+CHANNEL_STATS = ("mean", "min", "max", "std", "tail_mean")
+
+
+def _repair_headers(conn):
+    # 舊版資料庫以亂碼欄位名稱（如 CPU Package [蚓]）記錄，改成修正後的名稱
+    for bad, good in HEADER_REPAIRS:
+        conn.execute("UPDATE channels SET channel = replace(channel, ?, ?), channel_key = replace(channel_key, ?, ?),"
+                     " source_column = replace(source_column, ?, ?) WHERE channel LIKE ?",
+                     (bad, good, normalize(bad), normalize(good), bad, good, f"%{bad}%"))
+
+
+def _clear_time_only_dates(conn):
+    # 舊版以匯入當天的日期記錄只有時間的格式（PTAT、GPUmon）：日期改為 NULL，起訖只保留時間
+    formats = [name for name, spec in LOG_FORMATS.items() if not spec["time_columns"].get("date")]
+    conn.execute("UPDATE runs SET run_date = NULL, start_time = substr(start_time, 12), end_time = substr(end_time, 12)"
+                 f" WHERE run_date IS NOT NULL AND file_type IN ({', '.join('?' * len(formats))})", formats)
+
+
+# 資料庫升級步驟：第 i 個將 PRAGMA user_version 從 i 升到 i + 1，每個資料庫只執行一次
+MIGRATIONS = [_repair_headers, _clear_time_only_dates]
+
+
+def connect(db_path=DEFAULT_DB):
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(SCHEMA)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version < len(MIGRATIONS):
+        with conn:
+            for migrate in MIGRATIONS[version:]:
+                migrate(conn)
+            conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    return conn
+
+
+def has_fingerprint(conn, fingerprint):
+    return conn.execute("SELECT 1 FROM runs WHERE fingerprint = ?", (fingerprint,)).fetchone() is not None
+
+
+def channel_stats(log):
+    # 每個標準欄位一列：(標準名稱, 實際欄位, count, mean, min, max, std, tail_mean)
+    rows = []
+    for target, source in log.standard.items():
+        values = log.column(source).astype(np.float64)
+        tail = values[-TAIL_ROWS:]
+        values = values[~np.isnan(values)]
+        tail = tail[~np.isnan(tail)]
+        if not values.size:
+            continue
+        rows.append((
+            target, source, int(values.size),
+            to_float(values.mean()), to_float(values.min()), to_float(values.max()), to_float(values.std()),
+            to_float(tail.mean()) if tail.size else None,
+        ))
+    return rows
+
+
+def ingest_log(conn, log, platform=None):
+    # 已存在相同指紋的檔案時略過，回傳 run id 或 None
+    if has_fingerprint(conn, log.fingerprint):
+        return None
+    start_time = end_time = run_date = None
+    duration = None
+    ts = log.timestamps
+    if ts is not None:
+        # 只有時間的格式沒有實際日期：run_date 為 NULL（日期篩選不列入），起訖只記錄時間
+        valid = ts[~np.isnat(ts)]
+        start_time, end_time = str(valid[0]), str(valid[-1])
+        if time_only(ts):
+            start_time, end_time = start_time[11:], end_time[11:]
+        else:
+            run_date = start_time[:10]
+        duration = float(np.nanmax(elapsed_seconds(ts)))
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (fingerprint, name, path, file_type, platform, run_date, start_time, end_time,"
+            " duration_s, row_count, ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (log.fingerprint, log.name, log.source, log.file_type, platform, run_date, start_time, end_time,
+             duration, len(log), time.time()),
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO channels (run_id, channel, channel_key, source_column, count, mean, min, max, std, tail_mean)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, row[0], normalize(row[0]), *row[1:]) for row in channel_stats(log)],
+        )
+    return run_id
+
+
+def ingest_bytes(conn, data, name, path=None, platform=None):
+    file_type = detect_format(data, name)
+    if not file_type:
+        raise ValueError(f"無法分類：{name}")
+    fingerprint = file_fingerprint(data)
+    if has_fingerprint(conn, fingerprint):
+        return None
+    log = load_log(data, name, file_type, fingerprint, read_channels)
+    log.source = path
+    return ingest_log(conn, log, platform=platform)
+
+
+def ingest_upload(conn, data, name, path=None, platform=None, jobs=None):
+    # 一般檔案或壓縮檔 → [(檔名, run id 或 None, 錯誤訊息或 None), ...]；壓縮檔成員平行解析
+    if not is_archive(name):
+        try:
+            return [(name, ingest_bytes(conn, data, name, path=path, platform=platform), None)]
+        except Exception as e:
+            return [(name, None, str(e))]
+    results = []
+    for member, log, error in load_archive(path or data, name, jobs, read_channels):
+        results.append((member, ingest_log(conn, log, platform=platform) if log is not None else None, error))
+    return results
+
+
+def ingest_path(conn, path, platform=None):
+    # 預設以上層資料夾名稱作為平台名稱
+    if platform is None:
+        platform = os.path.basename(os.path.dirname(os.path.abspath(path))) or None
+    with open(path, "rb") as fp:
+        data = fp.read()
+    return ingest_upload(conn, data, os.path.basename(path), path=path, platform=platform)
+
+
+def _filters(platform=None, date_from=None, date_to=None, file_type=None):
+    clauses, params = [], []
+    if platform:
+        clauses.append("r.platform = ?")
+        params.append(platform)
+    if date_from:
+        clauses.append("r.run_date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("r.run_date <= ?")
+        params.append(date_to)
+    if file_type:
+        clauses.append("r.file_type = ?")
+        params.append(file_type)
+    return clauses, params
+
+
+def query_channel(conn, channel, stat="max", platform=None, date_from=None, date_to=None, file_type=None):
+    # 指定欄位在所有符合條件的 run 中的統計值，依數值由大到小排列
+    if stat not in CHANNEL_STATS:
+        raise ValueError(f"未知的統計量：{stat}")
+    clauses, params = _filters(platform, date_from, date_to, file_type)
+    sql = (
+        f"SELECT r.name, r.platform, r.run_date, r.file_type, c.source_column, c.{stat} AS value"
+        " FROM channels c JOIN runs r ON r.id = c.run_id WHERE c.channel_key = ?"
+    )
+    if clauses:
+        sql += " AND " + " AND ".join(clauses)
+    sql += " ORDER BY value DESC"
+    return pd.read_sql_query(sql, conn, params=[normalize(channel), *params])
+
+
+def aggregate_channel(conn, channel, stat="max", agg="MAX", platform=None, date_from=None, date_to=None):
+    # 例如「平台 X 所有 run 的 GPU 溫度最大值」→ aggregate_channel(conn, ' 1:Temperature GPU (C)', 'max', 'MAX', 'X')
+    if stat not in CHANNEL_STATS:
+        raise ValueError(f"未知的統計量：{stat}")
+    agg = agg.upper()
+    if agg not in ("MAX", "MIN", "AVG", "COUNT"):
+        raise ValueError(f"未知的彙總方式：{agg}")
+    clauses, params = _filters(platform, date_from, date_to)
+    sql = f"SELECT {agg}(c.{stat}) FROM channels c JOIN runs r ON r.id = c.run_id WHERE c.channel_key = ?"
+    if clauses:
+        sql += " AND " + " AND ".join(clauses)
+    return conn.execute(sql, [normalize(channel), *params]).fetchone()[0]
+
+
+def stat_matrix(conn, channels, stats, platform=None, date_from=None, date_to=None):
+    # 所有符合條件的 run 中，各 (標準欄位, 統計量) 的值 → (run 名稱列表, 矩陣 shape = (run 數, 欄位數))
+    # 一次查詢取回，缺少的欄位為 NaN；規格檢查不需重新讀原始檔
+    for stat in stats:
+        if stat not in CHANNEL_STATS:
+            raise ValueError(f"未知的統計量：{stat}")
+    keys = [normalize(c) for c in channels]
+    clauses, params = _filters(platform, date_from, date_to)
+    sql = (
+        f"SELECT r.id, r.name, c.channel_key, {', '.join(f'c.{s}' for s in CHANNEL_STATS)}"
+        f" FROM runs r LEFT JOIN channels c ON c.run_id = r.id AND c.channel_key IN ({', '.join('?' * len(keys))})"
+    )
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY r.run_date, r.name, r.id"
+    df = pd.read_sql_query(sql, conn, params=[*keys, *params])
+    run_index, run_ids = pd.factorize(df["id"])
+    names = df.drop_duplicates("id")["name"].tolist()
+    table = df[list(CHANNEL_STATS)].to_numpy(dtype=np.float64)
+    values = np.full((len(run_ids), len(keys)), np.nan)
+    for j, (key, stat) in enumerate(zip(keys, stats)):
+        rows = (df["channel_key"] == key).to_numpy()
+        values[run_index[rows], j] = table[rows, CHANNEL_STATS.index(stat)]
+    return names, values
+
+
+def list_runs(conn, platform=None, date_from=None, date_to=None):
+    clauses, params = _filters(platform, date_from, date_to)
+    sql = ("SELECT r.id, r.name, r.platform, r.file_type, r.run_date, r.start_time, r.end_time,"
+           " r.duration_s, r.row_count FROM runs r")
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY r.run_date, r.name"
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def list_platforms(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT platform FROM runs WHERE platform IS NOT NULL ORDER BY 1")]
+
+
+def list_channels(conn):
+    return [row[0] for row in conn.execute("SELECT DISTINCT channel FROM channels ORDER BY 1")]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Thermal Log 歷史 run 目錄（SQLite）")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"資料庫路徑（預設 {DEFAULT_DB}）")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="匯入檔案")
+    p_ingest.add_argument("paths", nargs="+")
+    p_ingest.add_argument("--platform", default=None, help="平台名稱（預設為上層資料夾名稱）")
+
+    p_query = sub.add_parser("query", help="查詢欄位統計")
+    p_query.add_argument("channel")
+    p_query.add_argument("--stat", default="max", choices=CHANNEL_STATS)
+    p_query.add_argument("--platform", default=None)
+    p_query.add_argument("--date-from", default=None)
+    p_query.add_argument("--date-to", default=None)
+    args = parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.command == "ingest":
+        for path in args.paths:
+            for name, run_id, error in ingest_path(conn, path, args.platform):
+                if error:
+                    print(f"❌ {path}：{name}：{error}", file=sys.stderr)
+                else:
+                    print(f"✅ {path}：{name}" if run_id else f"⏭️ {path}：{name}（已存在）")
+    else:
+        result = query_channel(conn, args.channel, args.stat, args.platform, args.date_from, args.date_to)
+        print(result.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
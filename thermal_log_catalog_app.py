@@ -0,0 +1,61 @@
+import streamlit as st
+import pandas as pd
+
+from thermal_log_catalog import (
+    CHANNEL_STATS, DEFAULT_DB, aggregate_channel, connect, ingest_upload, list_channels, list_platforms,
+    list_runs, query_channel,
+)
+from thermal_log_core import UPLOAD_TYPES
+from thermal_log_rules import check_catalog, checked_columns
+
+st.set_page_config(page_title="Thermal Log 歷史資料庫", layout="wide")
+st.title("🗄️ Thermal Log 歷史 run 查詢（SQLite）")
+
+db_path = st.sidebar.text_input("資料庫路徑", value=DEFAULT_DB)
+conn = connect(db_path)
+
+with st.expander("📥 匯入新的 log 檔", expanded=False):
+    platform = st.text_input("平台名稱", value="")
+    uploaded_files = st.file_uploader("📂 上傳 CSV 或 Excel 檔案（可為 zip / gz / xz 壓縮檔）", type=UPLOAD_TYPES, accept_multiple_files=True)
+    if uploaded_files and st.button("匯入資料庫"):
+        for f in uploaded_files:
+            for name, run_id, error in ingest_upload(conn, f.getvalue(), f.name, platform=platform or None):
+                if error:
+                    st.error(f"❌ 錯誤：{name} → {error}")
+                elif run_id:
+                    st.success(f"✅ 已匯入 `{name}`")
+                else:
+                    st.info(f"⏭️ `{name}` 已存在（指紋相同），略過")
+
+channels = list_channels(conn)
+if not channels:
+    st.info("資料庫尚無資料，請先匯入 log 檔。")
+    st.stop()
+
+st.markdown("### 🔎 跨 run 查詢")
+col1, col2, col3 = st.columns(3)
+channel = col1.selectbox("欄位", channels)
+stat = col2.selectbox("統計量", CHANNEL_STATS, index=CHANNEL_STATS.index("max"))
+platform_filter = col3.selectbox("平台", ["（全部）"] + list_platforms(conn))
+platform_filter = None if platform_filter == "（全部）" else platform_filter
+
+col4, col5 = st.columns(2)
+date_from = col4.text_input("起始日期（YYYY-MM-DD，可留空）", value="")
+date_to = col5.text_input("結束日期（YYYY-MM-DD，可留空）", value="")
+
+result = query_channel(conn, channel, stat, platform_filter, date_from or None, date_to or None)
+overall = aggregate_channel(conn, channel, stat, "MAX", platform_filter, date_from or None, date_to or None)
+st.metric(f"所有 run 的最大 {stat}", f"{overall:.2f}" if overall is not None else "-")
+st.dataframe(result, use_container_width=True)
+
+st.markdown("### ✅ 規格檢查")
+try:
+    compliance = check_catalog(conn, platform=platform_filter, date_from=date_from or None, date_to=date_to or None)
+except ValueError as e:
+    st.error(f"❌ 限制值檔案錯誤：{e}")
+else:
+    st.metric("不通過的 run", f"{(compliance['結果'] == 'FAIL').sum()} / {len(compliance)}")
+    st.dataframe(checked_columns(compliance), use_container_width=True)
+
+with st.expander("📋 所有 run"):
+    st.dataframe(list_runs(conn, platform_filter, date_from or None, date_to or None), use_container_width=True)
@@ -0,0 +1,1047 @@
+import codecs
+import csv
+import gzip
+import hashlib
+import html
+import io
+import json
+import lzma
+import os
+import re
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO, StringIO
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from thermal_log_formats import FORMAT_DEFAULTS, HEADERS_FILE, LOG_FORMATS
+
+# 不依賴 Streamlit 的共用處理流程：分類 → 讀檔 → 裁切 → 欄位對應 → 統計
+# merge_to_excel_template_v10.py 與 thermal_log_batch.py 共用同一份邏輯
+
+FILE_TYPES = tuple(LOG_FORMATS)
+ARCHIVE_EXTENSIONS = (".zip", ".gz", ".xz")
+UPLOAD_TYPES = ["csv", "xls", "xlsx", "zip", "gz", "xz"]
+ENCODING_SAMPLE = 64 << 10  # 判斷編碼時讀取的位元組數
+HEADER_SAMPLE = 16 << 10  # 內容辨識格式時讀取的位元組數
+HEADER_LINES = 64  # 標題區（前言、單位列、標題列）最多的列數
+FUZZY_THRESHOLD = 0.6
+XLSX_BLOCK_CHARS = 8 << 20  # 每次解壓縮的 sheet XML 字元數
+
+summary_columns = [
+    'Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]',
+    'IA Cores Power [W]', 'GT Cores Power [W]', ' 1:NVVDD Power (W)', ' 1:FBVDD Power (W)',
+    'CPU Package [°C]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)', 'Temp0 [°C]',
+    'SEN1-temp(Degree C)', 'SEN2-temp(Degree C)', 'SEN3-temp(Degree C)', 'SEN4-temp(Degree C)',
+    'SEN5-temp(Degree C)', 'SEN6-temp(Degree C)', 'SEN7-temp(Degree C)', 'SEN8-temp(Degree C)',
+    'SEN9-temp(Degree C)', 'J', 'C', 'D',
+    'HP1-1', 'HP1-2', 'HP1-3', 'HP1-4', 'HP2-1', 'HP2-2', 'HP2-3', 'HP2-4',
+    'CPUfin', 'GPUfin'
+]
+
+# 匯出圖表與規則檢查用的感測器分組
+SENSOR_GROUPS = {
+    "Power": [
+        'Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]',
+        'IA Cores Power [W]', 'GT Cores Power [W]', ' 1:NVVDD Power (W)', ' 1:FBVDD Power (W)',
+    ],
+    "CPU/GPU Temperature": ['CPU Package [°C]', ' 1:Temperature GPU (C)', ' 1:Temperature Memory (C)', 'Temp0 [°C]'],
+    "SEN": [f'SEN{i}-temp(Degree C)' for i in range(1, 10)],
+    "Heatpipe": ['HP1-1', 'HP1-2', 'HP1-3', 'HP1-4', 'HP2-1', 'HP2-2', 'HP2-3', 'HP2-4'],
+    "Fin / TC": ['CPUfin', 'GPUfin', 'J', 'C', 'D'],
+}
+
+STAT_FUNCS = {
+    "mean": np.nanmean,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "std": np.nanstd,
+    "median": np.nanmedian,
+}
+
+
+def to_float(value):
+    # 資料以 float32 保存，只有約 7 位有效數字，輸出時去掉多餘的尾數
+    return float(f"{value:.7g}")
+
+
+def clean_float32(values):
+    # to_float 的向量版：float32 → float64 並取 7 位有效數字（51.630001068 → 51.63）
+    x = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        scale = 10.0 ** (6 - np.floor(np.log10(np.abs(x))))
+        out = np.round(x * scale) / scale
+    return np.where(np.isfinite(out), out, x)
+
+
+# 欄位名稱的亂碼修正表：西歐編碼（cp1252）寫出的 °C 以 cp950 讀入會變成「蚓」，UTF-8 的 °C 以 cp950 / cp1252 讀入則為「簞C」/「Â°C」
+HEADER_REPAIRS = (
+    ("蚓", "°C"),
+    ("蚌", "°F"),
+    ("盜", "µs"),
+    ("簞", "°"),
+    ("繕", "µ"),
+    ("Â°", "°"),
+    ("Âµ", "µ"),
+)
+
+
+def detect_encoding(sample):
+    # 依 BOM 與開頭樣本判斷：UTF-8 / UTF-16 / 其餘視為 cp950
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if sample and sample.count(0) > len(sample) // 4:
+        return "utf-16-le" if sample[1::2].count(0) > sample[0::2].count(0) else "utf-16-be"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)  # 樣本結尾被截斷的多位元組字元不算錯誤
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "cp950"
+
+
+def peek_sample(source, size=ENCODING_SAMPLE):
+    # 讀取開頭樣本但不消耗 source：路徑另外開檔，可 seek 者讀完退回原位，串流則用 peek
+    if isinstance(source, str):
+        with open(source, "rb") as fp:
+            return fp.read(size)
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source[:size])
+    if hasattr(source, "peek"):
+        return source.peek(size)[:size]
+    position = source.tell()
+    sample = source.read(size)
+    source.seek(position)
+    return sample
+
+
+def sniff_encoding(source, size=ENCODING_SAMPLE):
+    return detect_encoding(peek_sample(source, size))
+
+
+def repair_header(name):
+    for bad, good in HEADER_REPAIRS:
+        name = name.replace(bad, good)
+    return name
+
+
+_NUMBER = re.compile(r"^[-+]?(\d+([.:/]\d+)*|\.\d+)([eE][-+]?\d+)?$")
+_headers = None
+_headers_lock = threading.Lock()
+
+
+def header_region(text):
+    # 開頭到第一筆資料列（過半欄位為數字）之前的所有列：前言、單位列與標題列；樣本內找不到資料列時回傳 None
+    region = []
+    for line in text.split("\n", HEADER_LINES)[:HEADER_LINES]:
+        line = line.rstrip("\r")
+        fields = [f.strip().strip('"') for f in line.split(",")]
+        if len(fields) >= 3 and sum(bool(_NUMBER.match(f)) for f in fields if f) * 2 >= len(fields):
+            return region
+        region.append(line)
+    return None
+
+
+def header_fingerprint(region):
+    # 數字一律視為 0，前言中的日期、序號不同仍是同一個版面
+    return hashlib.sha1("\n".join(re.sub(r"\d+", "0", line) for line in region).encode("utf-8")).hexdigest()
+
+
+def header_columns(region):
+    # 標題區中不重複欄位最多的一列視為標題列（單位列、說明列的內容大多重複）
+    best = max(region, key=lambda line: len({f.strip() for f in line.split(",")}), default="")
+    return [repair_header(f.strip().strip('"')) for f in best.split(",") if f.strip()]
+
+
+def _read_headers(path):
+    try:
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def header_table(path=None):
+    global _headers
+    if _headers is None:
+        _headers = _read_headers(path or HEADERS_FILE)
+    return _headers
+
+
+@contextmanager
+def file_lock(path, timeout=5.0, stale=30.0):
+    # 跨行程的簡單檔案鎖：以 O_EXCL 建立 path.lock；鎖檔超過 stale 秒（持有者已中止）時接手
+    # 逾時仍取不到鎖時照常執行（最多遺失一筆記錄），不讓讀檔卡住
+    lock = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    owned = False
+    while not owned:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            owned = True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > stale:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                break
+            time.sleep(0.01)
+    try:
+        yield
+    finally:
+        if owned:
+            try:
+                os.remove(lock)
+            except OSError:
+                pass
+
+
+def remember_header(key, file_type, columns, path=None):
+    # 只記錄依內容辨識的版面；寫入時在鎖內重新讀檔合併，平行讀檔的其他行程寫入的項目不會被覆蓋
+    path = path or HEADERS_FILE
+    entry = {"format": file_type, "columns": columns, "confirmed": True}
+    with _headers_lock:
+        header_table(path)[key] = entry
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with file_lock(path):
+                table = _read_headers(path)
+                table[key] = entry
+                tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as fp:
+                    json.dump(table, fp, ensure_ascii=False)
+                os.replace(tmp, path)
+            _headers.update(table)
+        except OSError:
+            pass  # 無法寫入時僅保留記憶體中的表
+
+
+def fuzzy_format(columns, table=None):
+    # 查表未命中時的模糊比對：與已知版面比 Jaccard，與格式 signature 比涵蓋率，取最高分且達門檻者
+    keys = {normalize(c) for c in columns}
+    if not keys:
+        return None
+    scores = {}
+    for entry in (table or {}).values():
+        if not entry.get("confirmed"):
+            continue
+        known = {normalize(c) for c in entry["columns"]}
+        score = len(keys & known) / len(keys | known)
+        scores[entry["format"]] = max(scores.get(entry["format"], 0), score)
+    for file_type, spec in LOG_FORMATS.items():
+        signature = {normalize(c) for c in spec["signature"]}
+        if signature:
+            scores[file_type] = max(scores.get(file_type, 0), len(keys & signature) / len(signature))
+    file_type, score = max(scores.items(), key=lambda item: item[1], default=(None, 0))
+    return file_type if score >= FUZZY_THRESHOLD else None
+
+
+def detect_format(source, name):
+    # 內容辨識格式：標題區指紋查表（已知版面只需一次 dict 查詢）→ 模糊比對 → 檔名規則
+    # 只有模糊比對（依內容）的結果以 confirmed 寫回指紋表，依檔名猜測的不記錄；舊版未標 confirmed 的項目重新比對
+    # 非 CSV（xlsx 等）只依檔名判斷
+    if not name.lower().endswith(".csv"):
+        return classify_file(name)
+    for size in (HEADER_SAMPLE // 4, HEADER_SAMPLE):  # 多數檔案的標題區在前 4 KB 內
+        sample = peek_sample(source, size)
+        region = header_region(sample.decode(detect_encoding(sample), errors="replace"))
+        if region is not None or len(sample) < size:
+            break
+    if not region:
+        return classify_file(name)
+    key = header_fingerprint(region)
+    table = header_table()
+    if table.get(key, {}).get("confirmed"):
+        return table[key]["format"]
+    columns = header_columns(region)
+    file_type = fuzzy_format(columns, table)
+    if file_type:
+        remember_header(key, file_type, columns)
+        return file_type
+    return classify_file(name)
+
+
+def normalize(col):
+    if not isinstance(col, str):
+        return ""
+    return col.strip().lower().replace(" ", "").replace(":", "").replace("（", "(").replace("）", ")")
+
+
+def classify_file(name):
+    # 依格式規格的 match 比對檔名，priority 小者優先
+    lower = os.path.basename(name).lower()
+    for file_type, spec in sorted(LOG_FORMATS.items(), key=lambda item: item[1]["priority"]):
+        if any(m in lower for m in spec["match"]):
+            return file_type
+    return None
+
+
+def file_fingerprint(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+_EMPTY_TEXT = ("", "nan", "NaN", "NaT", "None")
+_TIME_FORMATS = ("%H:%M:%S.%f", "%H:%M:%S")
+_BARE_TIME = re.compile(r"^\d{1,2}:\d{2}(:\d{2}([.:]\d+)?)?(\s*[AaPp][Mm])?$")
+# 只有時間沒有日期的 log（PTAT、GPUmon）以固定的佔位日期解析（不用今天：解析結果與快取不隨讀檔日期改變）
+# 需要實際日期時以 on_date 移到參考檔案（如同一次測試的 HW64）的日期上；time_only 判斷是否為佔位日期
+TIME_ONLY_DATE = np.datetime64("1900-01-01", "D")
+
+
+def _guess_format(value, dayfirst=False):
+    fmt = guess_datetime_format(value, dayfirst=dayfirst)
+    if fmt is not None:
+        return fmt
+    for fmt in _TIME_FORMATS:
+        try:
+            datetime.strptime(value, fmt)
+            return fmt
+        except ValueError:
+            pass
+    return None
+
+
+def parse_timestamps(df, spec=None):
+    # 依格式規格的 time_columns / time_format 找出 Date / Time 欄位轉成 datetime64[ns]；無時間欄位時回傳 None
+    spec = spec or FORMAT_DEFAULTS
+    names = spec["time_columns"]
+    keys = {normalize(c): c for c in df.columns}
+    time_col = keys.get(normalize(names.get("time", "Time")))
+    if time_col is None:
+        return None
+    times = df[time_col].astype(str).str.strip()
+    date_col = keys.get(normalize(names["date"])) if names.get("date") else None
+    if date_col is not None:
+        text = df[date_col].astype(str).str.strip() + " " + times
+    else:
+        text = times
+    dayfirst = date_col is not None
+    # 多數檔案整欄格式一致：由第一筆推斷格式後向量化解析，不符合該格式的少數列才逐筆解析
+    # 只有時間沒有日期時補上佔位日期 TIME_ONLY_DATE
+    fmt = spec["time_format"]
+    if fmt is None:
+        text = text.str.replace(r"(\d+:\d+:\d+):(\d+)$", r"\1.\2", regex=True)  # hh:mm:ss:fff
+        filled = text[~text.isin(_EMPTY_TEXT)]
+        fmt = _guess_format(filled.iloc[0], dayfirst) if len(filled) else None
+    if fmt is None:
+        if date_col is None:
+            text = text.where(~text.str.match(_BARE_TIME), f"{TIME_ONLY_DATE} " + text)
+        ts = pd.to_datetime(text, format="mixed", dayfirst=dayfirst, errors="coerce").to_numpy(dtype="datetime64[ns]")
+    else:
+        if not fmt.startswith(("%Y", "%d", "%m")):
+            text = text.where(text.isin(_EMPTY_TEXT), f"{TIME_ONLY_DATE} " + text)
+            fmt = "%Y-%m-%d " + fmt
+        ts = pd.to_datetime(text, format=fmt, errors="coerce").to_numpy(dtype="datetime64[ns]")
+        retry = (np.isnat(ts) & ~text.isin(_EMPTY_TEXT)).to_numpy()
+        if retry.any():
+            rest = text[retry].str.replace(r"(\d+:\d+:\d+):(\d+)$", r"\1.\2", regex=True)
+            ts[retry] = pd.to_datetime(rest, format="mixed", dayfirst=dayfirst, errors="coerce").to_numpy(
+                dtype="datetime64[ns]")
+    if date_col is None and len(ts) > 1:
+        # 只有時間欄位時處理跨午夜
+        valid = ~np.isnat(ts)
+        step = np.diff(ts[valid].astype("int64"))
+        rollover = np.zeros(len(ts), dtype=np.int64)
+        rollover[valid] = np.concatenate([[0], np.cumsum(step < -12 * 3600 * 10**9)])
+        ts = ts + rollover.astype("timedelta64[D]")
+    if np.isnat(ts).all():
+        return None
+    return ts
+
+
+def time_only(ts):
+    # 時間戳記是否只有時間（日期為 TIME_ONLY_DATE 佔位，跨午夜後為其後幾天）
+    if ts is None:
+        return False
+    valid = ts[~np.isnat(ts)]
+    return bool(valid.size) and valid[0] < TIME_ONLY_DATE + np.timedelta64(1, "D")
+
+
+def on_date(ts, reference):
+    # 只有時間的 ts 移到參考時間戳記的日期上（取起點最接近參考起點的那一天，處理跨午夜開始的情況）
+    # ts 已有日期、或參考也沒有日期時原樣回傳
+    if not time_only(ts) or reference is None or time_only(reference):
+        return ts
+    ref = reference[~np.isnat(reference)]
+    if not ref.size:
+        return ts
+    start = ts[~np.isnat(ts)][0]
+    base = ref[0].astype("datetime64[D]") - TIME_ONLY_DATE
+    days = min((base + np.timedelta64(d, "D") for d in (-1, 0, 1)), key=lambda d: abs(start + d - ref[0]))
+    return ts + days
+
+
+def reference_log(logs):
+    # 參考時鐘：第一個有實際日期的 HW64 檔案；沒有時為第一個有實際日期的檔案，再沒有時為第一個有時間戳記的檔案
+    timed = [log for log in logs if log.timestamps is not None]
+    dated = [log for log in timed if not time_only(log.timestamps)]
+    return next((log for log in dated if log.file_type == "HW64"), next(iter(dated or timed), None))
+
+
+def elapsed_seconds(ts):
+    # datetime64 → 相對第一個有效時間的秒數（float64，NaT → NaN）
+    valid = ~np.isnat(ts)
+    out = np.full(len(ts), np.nan)
+    if valid.any():
+        out[valid] = (ts[valid] - ts[valid][0]).astype("int64") / 1e9
+    return out
+
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_XLSX_CELL = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*?)(?:/>|><v>([^<]*)</v></c>|>(.*?)</c>)', re.S)
+_XLSX_VALUE = re.compile(r"<v>([^<]*)</v>")
+_XLSX_TEXT = re.compile(r"<t[^>]*>([^<]*)</t>")
+_XLSX_TYPE = re.compile(r'\bt="(\w+)"')
+_TIME_KEYS = ("date", "time")
+
+
+def _xlsx_first_sheet(zf):
+    # workbook.xml 第一個 sheet 的 r:id → workbook.xml.rels 的 Target
+    try:
+        workbook = ET.fromstring(zf.read("xl/workbook.xml"))
+        rel_id = workbook.find(f"{_XLSX_NS}sheets/{_XLSX_NS}sheet").get(f"{_XLSX_REL_NS}id")
+        rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        for rel in rels:
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target").lstrip("/")
+                return target if target.startswith("xl/") else f"xl/{target}"
+    except (KeyError, AttributeError):
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+
+def _xlsx_shared_strings(zf):
+    try:
+        fp = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with fp:
+        for _, elem in ET.iterparse(fp):
+            if elem.tag == f"{_XLSX_NS}si":
+                strings.append("".join(t.text or "" for t in elem.iter(f"{_XLSX_NS}t")))
+                elem.clear()
+    return strings
+
+
+def _column_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n - 1
+
+
+def _column_letters(n):
+    letters = ""
+    n += 1
+    while n:
+        n, r = divmod(n - 1, 26)
+        letters = chr(65 + r) + letters
+    return letters
+
+
+def _header_names(cells):
+    # 與 pd.read_excel 相同：空白標題為 Unnamed: N，重複標題依序加 .1、.2
+    names, seen = [], {}
+    for i, value in enumerate(cells):
+        name = str(value).strip() if value not in (None, "") else f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _cell_type(attrs):
+    kind = _XLSX_TYPE.search(attrs)
+    return kind.group(1) if kind else ""
+
+
+def _cell_values(matches, strings):
+    # (欄, 列, 屬性, <v>, 內容) → 儲存格文字（object 陣列）
+    # 一般數值儲存格直接取 <v>；只有 shared string、inline string、公式等少數儲存格逐一處理
+    values = np.array(matches[3], dtype=object)
+    attrs = pd.Series(matches[2], dtype=object)
+    kinds = attrs.map({a: _cell_type(a) for a in set(matches[2])}).to_numpy(dtype=object)
+    inner = np.array(matches[4], dtype=object)
+    for i in np.flatnonzero((kinds != "") | inner.astype(bool)):
+        if inner[i]:
+            v = _XLSX_VALUE.search(inner[i])
+            values[i] = v.group(1) if v else "".join(_XLSX_TEXT.findall(inner[i]))
+        if kinds[i] == "s" and values[i]:
+            values[i] = strings[int(values[i])]
+        elif kinds[i] in ("str", "inlineStr"):
+            values[i] = html.unescape(values[i])
+    return values
+
+
+def _excel_serial_text(values):
+    # Date / Time 欄位若存成 Excel 序號（數值），轉成文字時間供 parse_timestamps 使用
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    if numbers.isna().all():
+        return values
+    ts = pd.to_datetime(numbers, unit="D", origin="1899-12-30").dt.round("ms").dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return np.where(numbers.isna(), values, ts.to_numpy(dtype=object))
+
+
+def _xlsx_unaddressed(text):
+    # 沒有 r 座標、或 r 不是第一個屬性的儲存格數（text 需在 </row> 處切齊；str.count 比 regex 掃描快得多）
+    return text.count("<c ") + text.count("<c>") + text.count("<c/>") - text.count('<c r="')
+
+
+def read_xlsx(source, usecols=None, block_chars=XLSX_BLOCK_CHARS):
+    # 串流讀取 .xlsx 第一個 sheet：不建立整本 workbook 的 DOM，只解析需要的欄位
+    # 每次解壓縮約 block_chars 字元（切在 </row>），以 regex 一次取出所需欄位的儲存格，轉成一段 float32 陣列
+    # usecols(欄位名稱) → bool；Date / Time 欄位保留文字
+    # 有任何儲存格沒有 r 座標（或 r 不是第一個屬性）的檔案，regex 無法定位，退回 pd.read_excel
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    elif hasattr(source, "seekable") and not source.seekable():
+        source = BytesIO(source.read())  # zip 需要可 seek 的來源（如壓縮檔中的 xlsx 成員）
+
+    def fallback():
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return pd.read_excel(source, usecols=usecols)
+
+    with zipfile.ZipFile(source) as zf:
+        strings = _xlsx_shared_strings(zf)
+        with io.TextIOWrapper(zf.open(_xlsx_first_sheet(zf)), encoding="utf-8") as text:
+            buffer = text.read(block_chars)
+            while "</row>" not in buffer and '<c r="' in buffer:
+                more = text.read(block_chars)
+                if not more:
+                    break
+                buffer += more
+            first = _XLSX_CELL.search(buffer)
+            if first is None:
+                if "<sheetData/>" in buffer or "<sheetData></sheetData>" in buffer:
+                    return pd.DataFrame()
+                return fallback()
+
+            # 標題列
+            header_end = buffer.index("</row>", first.start()) + len("</row>")
+            if _xlsx_unaddressed(buffer[:header_end]):
+                return fallback()
+            header_row = int(first.group(2))
+            matches = list(zip(*_XLSX_CELL.findall(buffer, first.start(), header_end)))
+            header_cells = dict(zip([_column_number(c) for c in matches[0]], _cell_values(matches, strings).tolist()))
+            header = _header_names([header_cells.get(i) for i in range(max(header_cells) + 1)])
+            wanted = [i for i, name in enumerate(header)
+                      if usecols is None or usecols(name) or normalize(name) in _TIME_KEYS]
+            position = {_column_letters(i): k for k, i in enumerate(wanted)}
+            text_cols = [k for k, i in enumerate(wanted) if normalize(header[i]) in _TIME_KEYS]
+            cell_re = re.compile(
+                r'<c r="(' + "|".join(sorted(position, key=len, reverse=True)) + r')(\d+)"([^>]*?)(?:/>|><v>([^<]*)</v></c>|>(.*?)</c>)', re.S)
+
+            parts, text_parts = [], {k: [] for k in text_cols}
+            next_row = header_row + 1
+            buffer = buffer[header_end:]
+            while True:
+                more = text.read(block_chars)
+                buffer += more
+                cut = buffer.rfind("</row>") + len("</row>") if more else len(buffer)
+                if more and cut < len("</row>"):
+                    continue
+                block, buffer = buffer[:cut], buffer[cut:]
+                if _xlsx_unaddressed(block):
+                    return fallback()
+                found = cell_re.findall(block) if position else []
+                if found:
+                    matches = list(zip(*found))
+                    rows = np.array(matches[1]).astype(np.int64)
+                    cols = pd.Series(matches[0], dtype=object).map(position).to_numpy(dtype=np.int64)
+                    values = _cell_values(matches, strings)
+                    last = int(rows.max())
+                    chunk = np.full((last - next_row + 1, len(wanted)), np.nan, dtype=np.float32)
+                    chunk[rows - next_row, cols] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(
+                        dtype=np.float32, na_value=np.nan)
+                    for k in text_cols:
+                        column = np.full(len(chunk), None, dtype=object)
+                        mask = cols == k
+                        column[rows[mask] - next_row] = values[mask]
+                        text_parts[k].append(_excel_serial_text(column))
+                    parts.append(chunk)
+                    next_row = last + 1
+                if not more:
+                    break
+
+    names = [header[i] for i in wanted]
+    matrix = np.concatenate(parts) if parts else np.empty((0, len(wanted)), dtype=np.float32)
+    data = {}
+    for k, name in enumerate(names):
+        data[name] = np.concatenate(text_parts[k]) if k in text_parts and parts else matrix[:, k]
+    return pd.DataFrame(data, columns=names)
+
+
+def _column_filter(targets):
+    # targets（標準欄位名稱）→ usecols(欄位名稱) → bool；Date / Time 一律保留
+    if targets is None:
+        return None
+    keys = {normalize(t) for t in targets} | set(_TIME_KEYS)
+
+    def usecols(column):
+        return normalize(repair_header(column)) in keys
+    return usecols
+
+
+def _drop_footer(df, rule):
+    if isinstance(rule, int):
+        return df.iloc[:len(df) - rule] if rule else df
+    # "non-numeric"：去掉結尾沒有任何數值的列（重複標題列、分組名稱等），最多檢查 10 列
+    tail = df.iloc[-10:]
+    numeric = tail.apply(pd.to_numeric, errors="coerce").notna().any(axis=1).to_numpy()
+    keep = len(numeric)
+    while keep and not numeric[keep - 1]:
+        keep -= 1
+    return df.iloc[:len(df) - len(numeric) + keep]
+
+
+def compile_format(spec):
+    # 格式規格 → reader(source, name, targets=None) → DataFrame
+    # CSV 直接把標題列位置、略過的列與 read_csv 參數交給 C parser，不先讀成 object 再 iloc 裁切
+    spec = {**FORMAT_DEFAULTS, **spec}
+    header_re = re.compile(spec["header_pattern"]) if spec["header_pattern"] else None
+    junk_re = re.compile("|".join(f"(?:{p})" for p in spec["junk_columns"])) if spec["junk_columns"] else None
+    unit_before = 1 if spec["unit_row"] == "before" else 0
+    unit_after = 1 if spec["unit_row"] == "after" else 0
+    csv_options = {"engine": "c", "on_bad_lines": "skip", "low_memory": False, **spec["csv"]}
+
+    def header_line(source, encoding):
+        # → (標題列位置, 標題列內容)
+        lines = peek_sample(source).decode(encoding, errors="replace").split("\n")[:-1]  # 最後一列可能被樣本截斷
+        if header_re is not None:
+            for i, line in enumerate(lines):
+                if header_re.search(line):
+                    return i, line
+        i = spec["preamble"] + unit_before
+        return i, lines[i] if i < len(lines) else ""
+
+    def reader(source, name, targets=None):
+        if isinstance(source, (bytes, bytearray)):
+            source = BytesIO(source)
+        usecols = _column_filter(targets)
+        lower = name.lower()
+        if lower.endswith(".csv"):
+            # 依樣本判斷編碼後交給 read_csv 逐段解碼；少數無法解碼的位元組以 � 取代，不整檔重試
+            encoding = sniff_encoding(source)
+            header, line = header_line(source, encoding)
+            body = header + 1 + unit_after
+            skiprows = [*range(header), *range(header + 1, body + spec["skip_rows"])]
+            options = csv_options
+            if '"' in line:
+                # 標題列有引號時整檔是一般的 CSV 引號格式，quoting=3 會讓欄位名稱與資料都帶著引號
+                options = {k: v for k, v in csv_options.items() if k != "quoting"}
+            df = pd.read_csv(source, encoding=encoding, encoding_errors="replace", skiprows=skiprows, header=0,
+                             **options)
+        else:
+            df = read_xlsx(source, usecols) if lower.endswith(".xlsx") else pd.read_excel(source)
+            df = df.iloc[unit_after + spec["skip_rows"]:]
+
+        df.columns = [repair_header(c) for c in df.columns.astype(str).str.strip().str.strip('"')]
+        keep = ~df.columns.duplicated()  # 🔧 移除重複欄位
+        if junk_re is not None:
+            keep &= ~df.columns.str.contains(junk_re)
+        if usecols is not None:
+            keep &= [usecols(c) for c in df.columns]
+        df = df.loc[:, keep]
+        return _drop_footer(df, spec["footer"]).reset_index(drop=True)
+
+    return reader
+
+
+_readers = {}
+
+
+def format_spec(file_type):
+    return LOG_FORMATS.get(file_type, FORMAT_DEFAULTS)
+
+
+def read_log(source, name, file_type, targets=None):
+    # source 可為檔案路徑、bytes 或 file-like（如 Streamlit UploadedFile）；依 file_type 的格式規格讀檔
+    # 指定 targets（標準欄位名稱）時只保留對應得到的欄位與 Date / Time，xlsx 會直接略過其他儲存格
+    if file_type not in _readers:
+        _readers[file_type] = compile_format(format_spec(file_type))
+    return _readers[file_type](source, name, targets)
+
+
+def resolve_columns(columns, targets=summary_columns):
+    # 標準欄位名稱 → 實際欄位名稱（找不到者不列入）
+    lookup = {}
+    for c in columns:
+        lookup.setdefault(normalize(c), c)
+    resolved = {}
+    for target in targets:
+        key = normalize(target)
+        if key in lookup:
+            resolved[target] = lookup[key]
+    return resolved
+
+
+def numeric_matrix(df):
+    # 所有欄位轉成 float32 矩陣（無法轉換者為 NaN），shape = (筆數, 欄位數)
+    # 採 column-major，單一欄位在記憶體中連續，欄位與範圍切片皆為 view
+    matrix = np.empty((len(df), len(df.columns)), dtype=np.float32, order="F")
+    for i in range(len(df.columns)):
+        column = df.iloc[:, i]
+        try:
+            matrix[:, i] = column.to_numpy(dtype=np.float32, na_value=np.nan)  # 整欄都是數字（含文字型數字）時直接轉換
+        except (ValueError, TypeError):
+            matrix[:, i] = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    return matrix
+
+
+class ThermalLog:
+    # 精簡的 log 容器：float32 數值矩陣 + 欄位索引 + 標準欄位對應 + 時間戳記
+    # 取代各 app 中重複保存的 object dtype DataFrame
+    # variant：由同一檔案衍生出的版本（加衍生欄位、移除欄位、排除異常值），納入 content_key 區分記憶結果
+    __slots__ = ("name", "file_type", "fingerprint", "source", "columns", "column_index",
+                 "standard", "matrix", "timestamps", "pyramid", "variant")
+
+    def __init__(self, name, file_type, columns, matrix, timestamps=None, fingerprint=None, source=None,
+                 pyramid=None):
+        self.name = name
+        self.file_type = file_type
+        self.fingerprint = fingerprint
+        self.source = source
+        self.columns = list(columns)
+        self.column_index = {c: i for i, c in enumerate(self.columns)}
+        self.standard = resolve_columns(self.columns)
+        self.matrix = np.asfortranarray(matrix, dtype=np.float32)
+        self.timestamps = timestamps
+        self.pyramid = pyramid
+        self.variant = ()
+
+    @classmethod
+    def from_frame(cls, df, name, file_type, fingerprint=None, source=None):
+        # 只保留至少有一個數值的欄位；Date / Time 另存成 datetime64 陣列
+        matrix = numeric_matrix(df)
+        keep = ~np.isnan(matrix).all(axis=0)
+        columns = [str(c) for c, k in zip(df.columns, keep) if k]
+        return cls(name, file_type, columns, matrix[:, keep], parse_timestamps(df, format_spec(file_type)),
+                   fingerprint, source)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    def __repr__(self):
+        return f"ThermalLog({self.name!r}, {self.file_type}, rows={len(self)}, columns={len(self.columns)})"
+
+    @property
+    def nbytes(self):
+        total = self.matrix.nbytes
+        if self.timestamps is not None:
+            total += self.timestamps.nbytes
+        if self.pyramid:
+            total += sum(a.nbytes for level in self.pyramid.values() for a in level)
+        return total
+
+    def column(self, name, start=None, end=None):
+        # 單一欄位（可指定範圍）的 view，不複製資料
+        return self.matrix[start:end, self.column_index[name]]
+
+    def standard_column(self, standard_name, start=None, end=None):
+        # 以標準欄位名稱取值，檔案中沒有此欄位時回傳 None
+        if standard_name not in self.standard:
+            return None
+        return self.column(self.standard[standard_name], start, end)
+
+    def rows(self, start=None, end=None):
+        # 範圍切片的 view（所有欄位）
+        return self.matrix[start:end]
+
+    def select(self, columns, start=None, end=None):
+        # {欄位: view}；多欄位以 dict 保存 view，避免 fancy indexing 產生複本
+        return {c: self.column(c, start, end) for c in columns if c in self.column_index}
+
+    def to_columns(self, columns=None, start=None, end=None, with_time=False):
+        # {欄位: view}，with_time 時最前面加上 Timestamp（datetime64 view）；供 write_csv 與 to_frame 使用
+        columns = self.columns if columns is None else columns
+        data = {}
+        if with_time and self.timestamps is not None:
+            data["Timestamp"] = self.timestamps[start:end]
+        data.update(self.select(columns, start, end))
+        return data
+
+    def to_frame(self, columns=None, start=None, end=None, with_time=False):
+        # 只在輸出邊界（CSV / Excel）才建立 DataFrame 複本
+        return pd.DataFrame(self.to_columns(columns, start, end, with_time))
+
+
+class LRUCache:
+    # 有上限的記憶表：超過 limit 時淘汰最久未使用的項目（至少保留最新一筆）
+    # weight(value) 為每筆的成本（如 nbytes），未指定時以筆數計；Streamlit 各 session 共用，以 lock 保護
+    def __init__(self, limit, weight=None):
+        self.limit = limit
+        self.weight = weight or (lambda value: 1)
+        self.items = OrderedDict()
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def __len__(self):
+        return len(self.items)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+            self.items.move_to_end(key)
+            return self.items[key][0]
+
+    def __getitem__(self, key):
+        with self.lock:
+            self.items.move_to_end(key)
+            return self.items[key][0]
+
+    def __setitem__(self, key, value):
+        cost = self.weight(value)
+        with self.lock:
+            if key in self.items:
+                self.total -= self.items.pop(key)[1]
+            self.items[key] = (value, cost)
+            self.total += cost
+            while self.total > self.limit and len(self.items) > 1:
+                self.total -= self.items.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.total = 0
+
+
+def content_key(log):
+    # 快取讀回的 ThermalLog 每次 rerun 都是新物件：以內容指紋 + 檔名 + 筆數 + 欄位數 + 版本辨識同一份資料，供各模組記憶計算結果
+    # 程式直接建立、沒有檔案指紋的 log 以矩陣內容的雜湊代替（id() 在物件釋放後會被重用）
+    if log.fingerprint is None:
+        matrix = log.matrix.T if log.matrix.flags.f_contiguous else np.ascontiguousarray(log.matrix)
+        log.fingerprint = hashlib.sha1(matrix).hexdigest()
+    return (log.fingerprint, log.name, len(log), len(log.columns), log.variant)
+
+
+def parse_window(text):
+    # "600" → 最後 600 筆；"100:700" → 第 100 ~ 699 筆；"" / None → 全部
+    if text is None or str(text).strip() == "":
+        return None
+    text = str(text).strip()
+    if ":" in text:
+        start, end = text.split(":", 1)
+        return (int(start) if start.strip() else None, int(end) if end.strip() else None)
+    return (-int(text), None)
+
+
+def write_csv(target, columns, encoding="utf-8-sig", chunk_rows=8192):
+    # columns: [(欄位名稱, 1-D view), ...]；長度不同時以空白補齊（等同 pd.concat(axis=1)）
+    # datetime64 欄位（log.timestamps 的 view）輸出到毫秒，只有時間的檔案不輸出佔位日期
+    # 逐段格式化後寫入，只有每段 chunk_rows 筆的暫存複本，不建立完整 DataFrame
+    if encoding.lower() == "utf-8-sig":
+        target.write("\ufeff".encode("utf-8"))
+        encoding = "utf-8"
+    header = StringIO()
+    csv.writer(header, lineterminator="\n").writerow([name for name, _ in columns])
+    target.write(header.getvalue().encode(encoding))
+    n_rows = max((len(values) for _, values in columns), default=0)
+    clocks = {i: "%H:%M:%S.%f" if time_only(values) else "%Y-%m-%d %H:%M:%S.%f"
+              for i, (_, values) in enumerate(columns) if values.dtype.kind == "M"}
+    chunk = np.empty((min(chunk_rows, n_rows), len(columns)), dtype=np.float32)
+    for start in range(0, n_rows, chunk_rows):
+        end = min(start + chunk_rows, n_rows)
+        block = chunk[:end - start]
+        block.fill(np.nan)
+        for i, (_, values) in enumerate(columns):
+            if i not in clocks:
+                part = values[start:end]
+                block[:len(part), i] = part
+        frame = pd.DataFrame(block)
+        for i, clock in clocks.items():
+            frame[i] = pd.Series(columns[i][1][start:end]).dt.strftime(clock).str[:-3]
+        target.write(frame.to_csv(header=False, index=False, lineterminator="\n").encode(encoding))
+
+
+def window_segments(logs, window=None):
+    # 每個檔案各自套用統計範圍 → [(log, start, end), ...]
+    start, end = window if window is not None else (None, None)
+    return [(log, start, end) for log in logs]
+
+
+def concat_segments(logs, start, end):
+    # 與 v10 相同語意：所有檔案依序串接後取第 start ~ end 筆，不實際串接資料
+    segments = []
+    offset = 0
+    for log in logs:
+        s, e = max(start - offset, 0), min(end - offset, len(log))
+        if s < e:
+            segments.append((log, s, e))
+        offset += len(log)
+    return segments
+
+
+def summarize(segments, targets=summary_columns, stats=("mean",)):
+    # 回傳 {標準欄位: {統計量: 數值或 None}}；同一欄位跨檔案合併統計，缺少的欄位為 None
+    result = {}
+    for target in targets:
+        parts = [log.standard_column(target, s, e) for log, s, e in segments]
+        parts = [p for p in parts if p is not None]
+        values = np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)
+        values = values[~np.isnan(values)].astype(np.float64)
+        result[target] = {stat: (to_float(STAT_FUNCS[stat](values)) if values.size else None) for stat in stats}
+    return result
+
+
+def summary_table(summary, stats=("mean",)):
+    rows = []
+    for target, values in summary.items():
+        row = {"參數名稱": target}
+        for stat in stats:
+            row[stat] = values.get(stat)
+        rows.append(row)
+    return pd.DataFrame(rows, columns=["參數名稱", *stats])
+
+
+class _HashingReader(io.RawIOBase):
+    # 邊讀邊計算 sha1：解壓縮串流直接送進 parser，讀完即得到與原始檔相同的指紋
+    def __init__(self, raw):
+        self.raw = raw
+        self.hash = hashlib.sha1()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.hash.update(data)
+        return len(data)
+
+
+def load_log(source, name, file_type, fingerprint=None, reader=read_log):
+    # 讀檔後立即轉成 ThermalLog，object DataFrame 不再保留
+    # source 可為路徑、bytes 或 binary stream（如壓縮檔成員）；reader(source, name, file_type) → DataFrame
+    if isinstance(source, str) and fingerprint is None:
+        with open(source, "rb") as fp:
+            source = fp.read()
+    if isinstance(source, (bytes, bytearray)) and fingerprint is None:
+        fingerprint = file_fingerprint(source)
+    if hasattr(source, "read") and fingerprint is None:
+        hashing = _HashingReader(source)
+        stream = io.BufferedReader(hashing, 1 << 20)
+        df = reader(stream, name, file_type)
+        while stream.read(1 << 20):
+            pass  # parser 未讀完時補讀剩餘部分，指紋才完整
+        return ThermalLog.from_frame(df, name, file_type, hashing.hash.hexdigest())
+    return ThermalLog.from_frame(reader(source, name, file_type), name, file_type, fingerprint)
+
+
+def is_archive(name):
+    return name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _archive_file(source):
+    return BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+def archive_members(source, name):
+    # zip：CSV 成員（解析時依內容辨識格式）與檔名可分類的成員；gz / xz：單一成員，名稱為去掉副檔名的檔名
+    lower = name.lower()
+    if lower.endswith(".zip"):
+        with zipfile.ZipFile(_archive_file(source)) as zf:
+            return [m.filename for m in zf.infolist()
+                    if not m.is_dir() and not is_archive(m.filename)
+                    and (m.filename.lower().endswith(".csv") or classify_file(m.filename))]
+    if lower.endswith((".gz", ".xz")):
+        return [os.path.basename(name)[:-3]]
+    return []
+
+
+def open_member(source, name, member):
+    # 回傳解壓縮串流（不寫暫存檔）；zip 成員關閉時一併關閉 ZipFile
+    lower = name.lower()
+    if lower.endswith(".gz"):
+        return gzip.open(_archive_file(source), "rb")
+    if lower.endswith(".xz"):
+        return lzma.open(_archive_file(source), "rb")
+    zf = zipfile.ZipFile(_archive_file(source))
+    stream = zf.open(member)
+    close = stream.close
+
+    def close_both():
+        close()
+        zf.close()
+
+    stream.close = close_both
+    return stream
+
+
+def load_member(source, name, member, reader=read_log):
+    with open_member(source, name, member) as raw:
+        # 解壓縮串流的 peek 只保證少量位元組，包一層大緩衝區才能取得辨識格式所需的樣本
+        stream = io.BufferedReader(raw, 1 << 20)
+        file_type = detect_format(stream, member)
+        if not file_type:
+            raise ValueError("無法分類")
+        log = load_log(stream, os.path.basename(member), file_type, reader=reader)
+    log.source = f"{name}/{member}"
+    return log
+
+
+def load_archive(source, name, jobs=None, reader=read_log):
+    # 平行解析壓縮檔內的所有成員 → [(成員名稱, ThermalLog 或 None, 錯誤訊息或 None), ...]
+    # 檔案路徑用 process pool（各 process 自行開檔，reader 需可 pickle）；記憶體中的 bytes 用 thread（解壓縮時釋放 GIL）
+    members = archive_members(source, name)
+    executor = ProcessPoolExecutor if isinstance(source, str) else ThreadPoolExecutor
+    results = []
+    with executor(max_workers=jobs) as pool:
+        futures = [pool.submit(load_member, source, name, m, reader) for m in members]
+        for member, future in zip(members, futures):
+            try:
+                results.append((member, future.result(), None))
+            except Exception as e:
+                results.append((member, None, str(e)))
+    return results
+
+
+def process_file(path, window=None, stats=("mean",), member=None):
+    # 單一檔案（或壓縮檔中的單一成員）完整流程；回傳值需可 pickle，供 process pool 使用
+    name = os.path.basename(member or path)
+    file_type = classify_file(name)
+    try:
+        if member is not None:
+            log = load_member(path, os.path.basename(path), member)
+            file_type = log.file_type
+        else:
+            file_type = detect_format(path, name)
+            if not file_type:
+                return {"name": name, "path": path, "type": None, "error": "無法分類"}
+            log = load_log(path, name, file_type)
+            log.source = path
+    except Exception as e:
+        return {"name": name, "path": path, "type": file_type, "error": str(e)}
+    return {
+        "name": name,
+        "path": path,
+        "type": file_type,
+        "fingerprint": log.fingerprint,
+        "rows": len(log),
+        "resolved": log.standard,
+        "summary": summarize(window_segments([log], window), stats=stats),
+        "log": log,
+        "error": None,
+    }
+
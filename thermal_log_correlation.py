@@ -0,0 +1,107 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import LRUCache, ThermalLog, content_key, to_float
+
+# 欄位相關矩陣與重複感測器偵測：HW64 動輒數百個欄位，其中許多彼此幾乎相同（同一感測器的不同讀法、單位換算）
+# 相關係數以 float32 分段矩陣乘法累加（NaN 以有效遮罩處理，每一對欄位只用兩者皆有效的列），
+# 與已保留欄位 |r| ≥ REDUNDANT_CORRELATION 的欄位標為重複，標準差為 0 的欄位標為常數
+# 標準欄位（Summary 使用）與衍生欄位參照的欄位一律保留；其餘可在欄位選單中隱藏，或在載入後直接移除
+
+REDUNDANT_CORRELATION = 0.999
+CHUNK_ROWS = 65536
+MIN_PAIR_ROWS = 10  # 兩欄同時有效的列數少於此值時不計算相關係數
+MEMO_ENTRIES = 64
+REDUNDANCY_COLUMNS = ["檔案", "欄位", "狀態", "對應欄位", "相關係數", "可移除"]
+
+_flags = LRUCache(MEMO_ENTRIES)
+
+
+def correlation_matrix(matrix, chunk_rows=CHUNK_ROWS):
+    # (n, k) → (k, k) 相關係數；r[i, j] 只用 i、j 同時有效的列，有效列不足或變異數為 0 時為 NaN
+    n, k = matrix.shape
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        center = np.nan_to_num(np.nanmean(matrix, axis=0)).astype(np.float32)  # 先置中，避免 float32 相消誤差
+    count = np.zeros((k, k))
+    sx = np.zeros((k, k))  # sx[i, j] = Σ x_i（i、j 皆有效的列）
+    sxx = np.zeros((k, k))
+    sxy = np.zeros((k, k))
+    for s in range(0, n, chunk_rows):
+        block = matrix[s:s + chunk_rows] - center
+        valid = ~np.isnan(block)
+        x = np.where(valid, block, np.float32(0))
+        v = valid.astype(np.float32)
+        count += v.T @ v
+        sx += x.T @ v
+        sxx += (x * x).T @ v
+        sxy += x.T @ x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mx, my = sx / count, sx.T / count
+        cov = sxy / count - mx * my
+        vx = sxx / count - mx ** 2
+        r = cov / np.sqrt(vx * vx.T)
+    r[(count < MIN_PAIR_ROWS) | ~np.isfinite(r)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def channel_flags(log, threshold=REDUNDANT_CORRELATION, keep=()):
+    # [(欄位, 狀態, 對應欄位, 相關係數, 可移除), ...]，只列出常數或重複的欄位
+    # keep：額外需保留的標準欄位名稱（如衍生欄位參照的欄位）；標準欄位優先保留，其餘依欄位順序
+    key = (content_key(log), threshold, tuple(keep))
+    flags = _flags.get(key)
+    if flags is not None:
+        return flags
+    protected = set(log.standard.values()) | {log.standard[c] for c in keep if c in log.standard}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        std = np.nanstd(log.matrix, axis=0)
+    constant = ~(std > 0)
+    flags = [(c, "常數", None, None, c not in protected) for c, flat in zip(log.columns, constant) if flat]
+
+    varying = np.flatnonzero(~constant)
+    if varying.size > 1:
+        r = np.abs(correlation_matrix(log.matrix[:, varying]))
+        np.fill_diagonal(r, np.nan)
+        names = [log.columns[i] for i in varying]
+        order = sorted(range(len(names)), key=lambda i: names[i] not in protected)  # 穩定排序：標準欄位在前
+        kept = []
+        for i in order:
+            if kept and names[i] not in protected:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    scores = r[i, kept]
+                best = int(np.nanargmax(scores)) if not np.isnan(scores).all() else None
+                if best is not None and scores[best] >= threshold:
+                    flags.append((names[i], "重複", names[kept[best]], to_float(scores[best]), True))
+                    continue
+            kept.append(i)
+    _flags[key] = flags
+    return flags
+
+
+def redundant_columns(log, threshold=REDUNDANT_CORRELATION, keep=()):
+    # 可隱藏 / 移除的欄位名稱
+    return [column for column, *_, removable in channel_flags(log, threshold, keep) if removable]
+
+
+def redundancy_table(logs, threshold=REDUNDANT_CORRELATION, keep=()):
+    rows = [(log.name, *flag) for log in logs for flag in channel_flags(log, threshold, keep)]
+    return pd.DataFrame(rows, columns=REDUNDANCY_COLUMNS)
+
+
+def prune_log(log, columns):
+    # 回傳去掉指定欄位的新 ThermalLog（金字塔同步裁切）；沒有要移除的欄位時回傳原物件
+    drop = set(columns) & set(log.column_index)
+    if not drop:
+        return log
+    keep = [i for i, c in enumerate(log.columns) if c not in drop]
+    pyramid = None
+    if log.pyramid is not None:
+        pyramid = {f: tuple(a[:, keep] for a in level) for f, level in log.pyramid.items()}
+    result = ThermalLog(log.name, log.file_type, [log.columns[i] for i in keep], log.matrix[:, keep],
+                        timestamps=log.timestamps, fingerprint=log.fingerprint, source=log.source, pyramid=pyramid)
+    result.variant = log.variant + (("drop", tuple(sorted(drop))),)
+    return result
@@ -0,0 +1,167 @@
+import ast
+import json
+import os
+import re
+
+import numpy as np
+
+from thermal_log_core import LRUCache, ThermalLog, content_key, resolve_columns
+from thermal_log_pyramid import build_pyramid
+
+# 衍生欄位：以標準欄位名稱撰寫運算式（欄位名稱以 {} 包住），例如
+#   Rth CPU [°C/W] = ({CPU Package [°C]} - {Temp0 [°C]}) / {CPU Package Power [W]}
+#   GPU Other Power (W) = {1:TGP (W)} - {1:NVVDD Power (W)} - {1:FBVDD Power (W)}
+# 所有定義一次編譯成同一份運算計畫：相同的子運算式（含其他衍生欄位）只算一次，逐欄以 float32 向量運算
+# 衍生欄位附加在 ThermalLog 的矩陣之後，選欄、Summary、匯出與繪圖都和原生欄位相同
+# 預設定義可寫在 thermal_log_derived.json（與本檔同一資料夾，或環境變數 THERMAL_LOG_DERIVED 指定的檔案）：{"名稱": "運算式"}
+
+DERIVED_FILE = os.environ.get(
+    "THERMAL_LOG_DERIVED", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thermal_log_derived.json"))
+
+_CHANNEL = re.compile(r"\{([^{}]+)\}")
+
+_BINARY = {ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply, ast.Div: np.divide, ast.Pow: np.power}
+_COMMUTATIVE = (ast.Add, ast.Mult)
+# 函式名稱 → (ufunc, 參數個數)；參數個數在編譯時檢查，多餘的參數不會傳到 ufunc 的 out= 位置
+_FUNCTIONS = {"abs": (np.abs, 1), "sqrt": (np.sqrt, 1), "log": (np.log, 1), "exp": (np.exp, 1),
+              "min": (np.fmin, 2), "max": (np.fmax, 2)}
+APPLIED_LIMIT = 512 << 20  # 記憶的衍生結果總大小（位元組）
+
+_applied = LRUCache(APPLIED_LIMIT, weight=lambda log: log.nbytes)
+
+
+def load_definitions(path=DERIVED_FILE):
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+    return {}
+
+
+def parse_definitions(text):
+    # 每行「名稱 = 運算式」，# 開頭為註解；名稱中不可有 =
+    definitions = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if "=" not in line:
+            raise ValueError(f"缺少「=」：{line}")
+        name, expression = line.split("=", 1)
+        definitions[name.strip()] = expression.strip()
+    return definitions
+
+
+def definitions_text(definitions):
+    return "\n".join(f"{name} = {expression}" for name, expression in definitions.items())
+
+
+def compile_derived(definitions):
+    # {名稱: 運算式} → 運算計畫；nodes 依計算順序排列，每個節點為 (op, 參數)
+    # 節點以結構為 key 去重（交換律運算先排序），相同子運算式只保留一個節點
+    nodes, index, channels, outputs = [], {}, [], {}
+
+    def add(key):
+        if key not in index:
+            index[key] = len(nodes)
+            nodes.append(key)
+        return index[key]
+
+    def visit(node, refs):
+        if isinstance(node, ast.Expression):
+            return visit(node.body, refs)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return add(("const", float(node.value)))
+        if isinstance(node, ast.Name) and node.id in refs:
+            name = refs[node.id]
+            if name in outputs:  # 參照前面定義的衍生欄位
+                return outputs[name]
+            if name not in channels:
+                channels.append(name)
+            return add(("col", name))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = visit(node.operand, refs)
+            return operand if isinstance(node.op, ast.UAdd) else add(("neg", operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            args = (visit(node.left, refs), visit(node.right, refs))
+            if isinstance(node.op, _COMMUTATIVE):
+                args = tuple(sorted(args))
+            return add((type(node.op).__name__, *args))
+        if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS
+                and not node.keywords):
+            arity = _FUNCTIONS[node.func.id][1]
+            if len(node.args) != arity:
+                raise ValueError(f"{node.func.id}() 需要 {arity} 個參數（收到 {len(node.args)} 個）")
+            return add((node.func.id, *(visit(arg, refs) for arg in node.args)))
+        text = re.sub(r"_c\d+", lambda m: "{%s}" % refs.get(m.group(), m.group()), ast.unparse(node))
+        raise ValueError(f"不支援的運算式：{text}")
+
+    for name, expression in definitions.items():
+        refs = {}
+
+        def placeholder(match):
+            key = f"_c{len(refs)}"
+            refs[key] = match.group(1).strip()
+            return key
+
+        try:
+            tree = ast.parse(_CHANNEL.sub(placeholder, expression), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"運算式語法錯誤（{name}）：{expression}") from e
+        outputs[name] = visit(tree, refs)
+    return {"nodes": nodes, "channels": channels, "outputs": outputs, "key": tuple(definitions.items())}
+
+
+def evaluate_derived(plan, log):
+    # {名稱: float32 陣列}；缺少所需欄位的衍生欄位不列入；除以 0 等非有限值視為 NaN
+    columns = resolve_columns(log.columns, plan["channels"])
+    values = []
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for op, *args in plan["nodes"]:
+            if op == "col":
+                value = log.column(columns[args[0]]) if args[0] in columns else None
+            elif op == "const":
+                value = np.float32(args[0])
+            elif any(values[a] is None for a in args):
+                value = None
+            elif op == "neg":
+                value = np.negative(values[args[0]])
+            elif op in _FUNCTIONS:
+                function, arity = _FUNCTIONS[op]
+                value = function(*(values[a] for a in args[:arity]))
+            else:
+                value = _BINARY[getattr(ast, op)](values[args[0]], values[args[1]])
+            values.append(value)
+    result = {}
+    for name, node in plan["outputs"].items():
+        value = values[node]
+        if value is None or np.ndim(value) == 0:
+            continue
+        value = value.astype(np.float32)
+        value[~np.isfinite(value)] = np.nan
+        result[name] = value
+    return result
+
+
+def apply_derived(log, plan):
+    # 回傳附加衍生欄位的新 ThermalLog（不修改快取中的原物件）；同一份內容與計畫只計算一次（LRU 記憶）
+    if not plan["outputs"]:
+        return log
+    memo_key = (content_key(log), plan["key"])
+    result = _applied.get(memo_key)
+    if result is not None:
+        return result
+    derived = {name: values for name, values in evaluate_derived(plan, log).items() if name not in log.column_index}
+    if not derived:
+        result = log
+    else:
+        block = np.column_stack(list(derived.values()))
+        pyramid = None
+        if log.pyramid is not None:
+            extra = build_pyramid(block, tuple(log.pyramid))
+            pyramid = {f: tuple(np.hstack([a, b]) for a, b in zip(level, extra[f])) for f, level in log.pyramid.items()}
+        result = ThermalLog(log.name, log.file_type, log.columns + list(derived), np.hstack([log.matrix, block]),
+                            timestamps=log.timestamps, fingerprint=log.fingerprint, source=log.source, pyramid=pyramid)
+        result.standard.update({name: name for name in derived})
+        result.variant = log.variant + (("derived", plan["key"]),)
+    _applied[memo_key] = result
+    return result
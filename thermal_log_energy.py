@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import to_float
+
+# 功耗欄位的能量積分（Wh）：以實際時間戳記做梯形積分，取樣中斷（間隔超過正常間隔 GAP_FACTOR 倍）的區間不列入
+# EnergyIntegrator 以固定大小的區塊逐段累加，只需保留上一段的最後一筆，超大 log 也不需建立整份 float64 暫存
+
+POWER_CHANNELS = ['Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)', 'Charge Rate [W]']
+GAP_FACTOR = 5
+CHUNK_ROWS = 65536
+STEADY_ROWS = 600  # 與各工具的 tail(600) 穩態平均一致
+ENERGY_COLUMNS = ["檔案", "參數名稱", "範圍", "能量 (Wh)", "平均功率 (W)", "積分時間 (s)", "略過間隔 (s)", "中斷次數"]
+
+
+class EnergyIntegrator:
+    # 多欄位同時積分：update(秒數, 功耗矩陣) 可重複呼叫，前後兩段之間的區間也會計入
+    __slots__ = ("gap_factor", "interval", "energy", "duration", "gap_seconds", "gaps", "_last_t", "_last_p")
+
+    def __init__(self, n_channels, gap_factor=GAP_FACTOR, interval=None):
+        self.gap_factor = gap_factor
+        self.interval = interval  # 正常取樣間隔（秒）；None 時以第一段的間隔中位數決定
+        self.energy = np.zeros(n_channels)  # 焦耳
+        self.duration = np.zeros(n_channels)
+        self.gap_seconds = 0.0
+        self.gaps = 0
+        self._last_t = None
+        self._last_p = None
+
+    def update(self, seconds, power):
+        t = np.asarray(seconds, dtype=np.float64)
+        p = np.asarray(power, dtype=np.float64).reshape(len(t), -1)
+        if self._last_t is not None:
+            t = np.concatenate([[self._last_t], t])
+            p = np.vstack([self._last_p, p])
+        if len(t) == 0:
+            return self
+        self._last_t, self._last_p = t[-1], p[-1]
+        if len(t) < 2:
+            return self
+        dt = np.diff(t)
+        if self.interval is None:
+            normal = dt[np.isfinite(dt) & (dt > 0)]
+            if not normal.size:
+                return self
+            self.interval = float(np.median(normal))
+        limit = self.gap_factor * self.interval
+        gap = dt > limit  # NaN 比較為 False，NaT 的區間直接略過、不算中斷
+        self.gap_seconds += float(dt[gap].sum())
+        self.gaps += int(gap.sum())
+        mid = (p[1:] + p[:-1]) * 0.5
+        valid = ((dt > 0) & (dt <= limit))[:, None] & np.isfinite(mid)
+        self.energy += np.where(valid, mid * dt[:, None], 0.0).sum(axis=0)
+        self.duration += np.where(valid, dt[:, None], 0.0).sum(axis=0)
+        return self
+
+    def result(self):
+        # [(Wh, 平均功率 W, 積分時間 s), ...]，每個欄位一組；沒有可積分的區間時為 None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = self.energy / self.duration
+        return [
+            (to_float(e / 3600), to_float(m), to_float(d)) if d > 0 else (None, None, 0.0)
+            for e, m, d in zip(self.energy, mean, self.duration)
+        ]
+
+
+def log_seconds(log, start=None, end=None):
+    # 相對第一個有效時間戳記的秒數（NaT → NaN）；沒有時間欄位時回傳 None
+    ts = log.timestamps
+    if ts is None:
+        return None
+    valid = ts[~np.isnat(ts)]
+    if not valid.size:
+        return None
+    return (ts[start:end] - valid[0]) / np.timedelta64(1, "s")
+
+
+def log_energy(log, channels=POWER_CHANNELS, start=None, end=None, chunk_rows=CHUNK_ROWS):
+    # ({標準欄位: (Wh, 平均功率, 積分時間)}, 略過秒數, 中斷次數)；log 中沒有的欄位不列入
+    # 沒有時間戳記時回傳 None
+    present = [c for c in channels if c in log.standard]
+    seconds = log_seconds(log, start, end)
+    if not present or seconds is None:
+        return None
+    columns = [log.column_index[log.standard[c]] for c in present]
+    block = log.rows(start, end)
+    integrator = EnergyIntegrator(len(present))
+    for s in range(0, len(seconds), chunk_rows):
+        integrator.update(seconds[s:s + chunk_rows], block[s:s + chunk_rows, columns])
+    return dict(zip(present, integrator.result())), to_float(integrator.gap_seconds), integrator.gaps
+
+
+def cumulative_energy(log, channel, start=None, end=None):
+    # 累積能量曲線（Wh，與資料列對齊，第一筆為 0）；中斷與 NaN 的區間不累加
+    seconds = log_seconds(log, start, end)
+    values = log.standard_column(channel, start, end)
+    if seconds is None or values is None or len(values) < 2:
+        return None
+    dt = np.diff(seconds)
+    normal = dt[np.isfinite(dt) & (dt > 0)]
+    if not normal.size:
+        return None
+    p = values.astype(np.float64)
+    step = (p[1:] + p[:-1]) * 0.5 * dt
+    step[~((dt > 0) & (dt <= GAP_FACTOR * np.median(normal))) | ~np.isfinite(step)] = 0.0
+    return np.concatenate([[0.0], np.cumsum(step) / 3600])
+
+
+def energy_table(ranges, channels=POWER_CHANNELS):
+    # ranges: [(範圍名稱, log, start, end), ...] → 每個 (檔案, 欄位, 範圍) 一列
+    rows = []
+    for label, log, start, end in ranges:
+        result = log_energy(log, channels, start, end)
+        if result is None:
+            continue
+        energy, gap_seconds, gaps = result
+        for channel, (wh, mean, duration) in energy.items():
+            rows.append((log.name, channel.strip(), label, wh, mean, duration, gap_seconds, gaps))
+    return pd.DataFrame(rows, columns=ENERGY_COLUMNS)
+
+
+def standard_ranges(log, start=None, end=None, steady_rows=STEADY_ROWS):
+    # 全部、所選範圍（有指定時）與穩態（最後 steady_rows 筆）
+    ranges = [("全部", log, None, None)]
+    if (start, end) not in ((None, None), (0, len(log))):
+        ranges.append((f"{start or 0}:{len(log) if end is None else end}", log, start, end))
+    ranges.append((f"穩態（最後 {steady_rows} 筆）", log, -steady_rows, None))
+    return ranges
@@ -0,0 +1,125 @@
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import elapsed_seconds, normalize, resolve_columns
+
+# 過溫 / 降頻事件偵測：每個規則對欄位產生布林遮罩，同一個 log 的所有遮罩合成一個矩陣後
+# 以 run-length encoding 一次找出所有連續區段，不需逐筆迴圈
+#
+# kind         "above"：數值 ≥ limit（溫度碰到 throttle 門檻）；"below"：數值 ≤ limit
+#              "drop"：負載期間數值 < ratio × 參考值（第 90 百分位），用於功耗限制與時脈下降
+# columns      標準欄位名稱（依 normalize 比對）
+# pattern      欄位名稱（normalize 後）的 regex，用於各工具名稱不一的欄位（如時脈）
+# min_seconds  事件至少持續的秒數（dwell）；沒有時間戳記時以筆數計
+
+EVENT_RULES = [
+    {"name": "CPU 過溫", "kind": "above", "columns": ['CPU Package [°C]'], "limit": 95, "min_seconds": 1},
+    {"name": "GPU 過溫", "kind": "above", "columns": [' 1:Temperature GPU (C)'], "limit": 87, "min_seconds": 1},
+    {"name": "GPU 記憶體過溫", "kind": "above", "columns": [' 1:Temperature Memory (C)'], "limit": 95,
+     "min_seconds": 1},
+    {"name": "功耗下降", "kind": "drop", "columns": ['CPU Package Power [W]', ' 1:TGP (W)'], "ratio": 0.7,
+     "min_seconds": 2},
+    {"name": "時脈下降", "kind": "drop", "pattern": r"clock.*(\[mhz\]|\(mhz\))", "ratio": 0.8, "min_seconds": 1},
+]
+
+DROP_PERCENTILE = 90
+EVENT_COLUMNS = ["檔案", "事件", "欄位", "start", "end", "開始時間", "結束時間", "持續秒數", "極值", "門檻"]
+
+
+def rule_columns(log, rule):
+    # 規則套用到此 log 的實際欄位名稱
+    columns = list(resolve_columns(log.columns, rule.get("columns", [])).values())
+    if rule.get("pattern"):
+        pattern = re.compile(rule["pattern"])
+        columns += [c for c in log.columns if pattern.search(normalize(c)) and c not in columns]
+    return columns
+
+
+def run_lengths(mask):
+    # mask shape = (筆數, k) → (欄位索引, start, end)，end 不含；依欄位、再依 start 排序
+    edges = np.diff(mask.astype(np.int8), axis=0, prepend=np.int8(0), append=np.int8(0)).T
+    cols, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return cols, starts, ends
+
+
+def _drop_mask(values, ratio):
+    # 負載期間（第一次到最後一次達到參考值之間）低於 ratio × 參考值的筆數；開機前後的待機不算
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全為 NaN 的欄位
+        reference = np.nanpercentile(values, DROP_PERCENTILE, axis=0)
+    high = values >= reference
+    n = len(values)
+    first = np.where(high.any(axis=0), high.argmax(axis=0), n)
+    last = n - 1 - high[::-1].argmax(axis=0)
+    index = np.arange(n)[:, None]
+    return (values < ratio * reference) & (index > first) & (index < last), ratio * reference
+
+
+def detect_events(log, rules=EVENT_RULES):
+    # 單一 log 的事件表（DataFrame，欄位見 EVENT_COLUMNS）
+    pairs = [(rule, c) for rule in rules for c in rule_columns(log, rule)]
+    n = len(log)
+    if not pairs or not n:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    values = log.matrix[:, [log.column_index[c] for _, c in pairs]]
+    mask = np.zeros(values.shape, dtype=bool, order="F")
+    limits = np.full(len(pairs), np.nan)
+    for kind in ("above", "below", "drop"):
+        idx = [i for i, (rule, _) in enumerate(pairs) if rule["kind"] == kind]
+        if not idx:
+            continue
+        if kind == "drop":
+            ratios = np.array([pairs[i][0]["ratio"] for i in idx])
+            mask[:, idx], limits[idx] = _drop_mask(values[:, idx], ratios)
+        else:
+            limit = np.array([pairs[i][0]["limit"] for i in idx], dtype=np.float64)
+            mask[:, idx] = values[:, idx] >= limit if kind == "above" else values[:, idx] <= limit
+            limits[idx] = limit
+
+    cols, starts, ends = run_lengths(mask)
+    if not cols.size:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+
+    # 持續時間：從開始到狀態解除的那一筆（最後一段則到最後一筆）
+    if log.timestamps is not None:
+        elapsed = elapsed_seconds(log.timestamps)
+        duration = elapsed[np.minimum(ends, n - 1)] - elapsed[starts]
+    else:
+        duration = (ends - starts).astype(np.float64)
+    min_seconds = np.array([pairs[c][0].get("min_seconds", 0) for c in cols])
+    keep = ~(duration < min_seconds)
+    cols, starts, ends, duration = cols[keep], starts[keep], ends[keep], duration[keep]
+
+    # 每個區段的極值：欄位依序攤平後以 reduceat 一次計算（above 取最大、其他取最小）
+    flat = np.append(values.ravel(order="F"), np.float32(np.nan))
+    bounds = np.column_stack([cols * n + starts, cols * n + ends]).ravel()
+    highs = np.fmax.reduceat(flat, bounds)[::2]
+    lows = np.fmin.reduceat(flat, bounds)[::2]
+    above = np.array([pairs[c][0]["kind"] == "above" for c in cols], dtype=bool)
+    extreme = np.where(above, highs, lows)
+
+    ts = log.timestamps
+    return pd.DataFrame({
+        "檔案": log.name,
+        "事件": [pairs[c][0]["name"] for c in cols],
+        "欄位": [pairs[c][1] for c in cols],
+        "start": starts,
+        "end": ends,
+        "開始時間": ts[starts] if ts is not None else pd.NaT,
+        "結束時間": ts[ends - 1] if ts is not None else pd.NaT,
+        "持續秒數": np.round(duration, 3),
+        "極值": np.round(extreme.astype(np.float64), 2),
+        "門檻": np.round(limits[cols], 2),
+    }, columns=EVENT_COLUMNS)
+
+
+def event_table(logs, rules=EVENT_RULES):
+    # 所有 log 的事件表，依檔案、開始位置排序
+    tables = [t for t in (detect_events(log, rules) for log in logs) if len(t)]
+    if not tables:
+        return pd.DataFrame(columns=EVENT_COLUMNS)
+    return pd.concat(tables, ignore_index=True).sort_values(["檔案", "start"], kind="stable", ignore_index=True)
@@ -0,0 +1,178 @@
+import numpy as np
+import xlsxwriter
+
+from thermal_log_core import SENSOR_GROUPS, clean_float32, time_only
+from thermal_log_pyramid import build_level
+
+# 匯出 B_full_data_with_summary.xlsx：各類型原始資料 sheet、Summary，以及原生 Excel 折線圖
+# 以 xlsxwriter constant_memory 模式逐列寫入，記憶體用量與筆數無關
+# 超過 Excel 列數上限時自動拆成 HW64_1、HW64_2 …，並在 Manifest sheet 記錄每個分段的範圍
+
+EXCEL_MAX_ROWS = 1048576
+CHART_BUCKETS = 1000  # 每條曲線最多 1000 個 bucket（2000 點）
+CHUNK_ROWS = 8192
+
+
+def decimate(values, buckets=CHART_BUCKETS):
+    # 回傳 (x, y)：x 為 bucket 中心的筆數索引，y 為 min/max 交錯（保留峰值）
+    n = len(values)
+    factor = max(1, -(-n // buckets))
+    if factor == 1:
+        x, y = np.arange(n, dtype=np.float64), values.astype(np.float64)
+    else:
+        mn, mx, _ = build_level(values.reshape(-1, 1), factor)
+        x = np.repeat(np.arange(len(mn)) * factor + factor / 2, 2)
+        y = np.empty(2 * len(mn))
+        y[0::2], y[1::2] = mn[:, 0], mx[:, 0]
+    keep = ~np.isnan(y)
+    return x[keep], clean_float32(y[keep])
+
+
+def _cells(block):
+    # float 區塊 → list of rows，NaN 轉成 None（寫成空白儲存格）
+    values = clean_float32(block).astype(object)
+    values[np.isnan(block)] = None
+    return values.tolist()
+
+
+def sheet_columns(logs):
+    # 同類型檔案欄位聯集（依出現順序）
+    return list(dict.fromkeys(c for log in logs for c in log.columns))
+
+
+def write_data_sheets(book, sheet, logs, max_rows=EXCEL_MAX_ROWS):
+    # 同類型的所有檔案依序串接寫入；每個 sheet 扣除標題列後最多 max_rows - 1 筆
+    # 回傳 manifest 列：(sheet, 分段, 來源檔案, 起始筆, 結束筆, 起始時間, 結束時間, 筆數)
+    columns = sheet_columns(logs)
+    with_time = any(log.timestamps is not None for log in logs)
+    header = (["Timestamp"] if with_time else []) + columns
+    offset = 1 if with_time else 0
+    time_format = book.add_format({"num_format": "yyyy-mm-dd hh:mm:ss.000"})
+    clock_format = book.add_format({"num_format": "hh:mm:ss.000"})  # 只有時間的檔案不顯示佔位日期
+    per_sheet = max_rows - 1
+    total = sum(len(log) for log in logs)
+    n_parts = max(1, -(-total // per_sheet))
+
+    manifest = []
+    part = 0
+    ws = None
+    row = per_sheet  # 觸發建立第一個 sheet
+    global_row = 0
+    part_info = None
+
+    def close_part():
+        if part_info is not None:
+            manifest.append((
+                part_info["name"], part_info["part"], ", ".join(part_info["files"]),
+                part_info["first"], global_row - 1, part_info["start"], part_info["end"], global_row - part_info["first"],
+            ))
+
+    for log in logs:
+        positions = [columns.index(c) for c in log.columns]
+        log_format = clock_format if time_only(log.timestamps) else time_format
+        n = len(log)
+        start = 0
+        while start < n:
+            if row >= per_sheet:
+                close_part()
+                part += 1
+                name = sheet if n_parts == 1 else f"{sheet}_{part}"
+                ws = book.add_worksheet(name)
+                ws.write_row(0, 0, header)
+                row = 0
+                part_info = {"name": name, "part": part, "files": [], "first": global_row, "start": None, "end": None}
+            end = min(n, start + CHUNK_ROWS, start + per_sheet - row)
+            block = np.full((end - start, len(columns)), np.nan, dtype=np.float32)
+            block[:, positions] = log.rows(start, end)
+            ts = None
+            if log.timestamps is not None:
+                ts = log.timestamps[start:end].astype("datetime64[ms]").tolist()
+                valid = [t for t in ts if t is not None]
+                if valid:
+                    part_info["start"] = part_info["start"] or valid[0]
+                    part_info["end"] = valid[-1]
+            if log.name not in part_info["files"]:
+                part_info["files"].append(log.name)
+            for i, values in enumerate(_cells(block)):
+                if ts is not None and ts[i] is not None:
+                    ws.write_datetime(row + 1, 0, ts[i], log_format)
+                ws.write_row(row + 1, offset, values)
+                row += 1
+            global_row += end - start
+            start = end
+    close_part()
+    return manifest
+
+
+def write_table(book, name, header, rows):
+    ws = book.add_worksheet(name)
+    ws.write_row(0, 0, header)
+    for r, values in enumerate(rows, start=1):
+        ws.write_row(r, 0, [None if v is None or (isinstance(v, float) and np.isnan(v)) else v for v in values])
+    return ws
+
+
+def write_charts(book, sheet_logs, groups=SENSOR_GROUPS):
+    # 每個感測器分組一張圖；同一分組內每個檔案的每個欄位為一條曲線
+    # constant_memory 需逐列寫入，先算好所有曲線再一次寫出 ChartData
+    series = []
+    for group, targets in groups.items():
+        for logs in sheet_logs.values():
+            for log in logs:
+                for target in targets:
+                    values = log.standard_column(target)
+                    if values is None:
+                        continue
+                    x, y = decimate(values)
+                    if len(x):
+                        series.append((group, f"{log.name} - {target.strip()}", x, y))
+
+    data_sheet = book.add_worksheet("ChartData")
+    chart_sheet = book.add_worksheet("Charts")
+    if not series:
+        chart_sheet.write(0, 0, "無可繪製的 Summary 欄位")
+        return
+    data_sheet.write_row(0, 0, [h for _, label, _, _ in series for h in (f"{label} (Index)", label)])
+    length = max(len(x) for _, _, x, _ in series)
+    for r in range(length):
+        data_sheet.write_row(r + 1, 0, [
+            (v[r] if r < len(v) else None) for _, _, x, y in series for v in (x, y)
+        ])
+
+    charts = {}
+    for i, (group, label, x, y) in enumerate(series):
+        if group not in charts:
+            charts[group] = book.add_chart({"type": "scatter", "subtype": "straight"})
+        charts[group].add_series({
+            "name": label,
+            "categories": ["ChartData", 1, 2 * i, len(x), 2 * i],
+            "values": ["ChartData", 1, 2 * i + 1, len(y), 2 * i + 1],
+            "line": {"width": 1.0},
+        })
+    for n, (group, chart) in enumerate(charts.items()):
+        chart.set_title({"name": group})
+        chart.set_x_axis({"name": "Index"})
+        chart.set_legend({"position": "bottom"})
+        chart.set_size({"width": 960, "height": 420})
+        chart_sheet.insert_chart(1 + 22 * n, 1, chart)
+
+
+def write_workbook(target, sheet_logs, summary_df=None, charts=True, max_rows=EXCEL_MAX_ROWS, tables=None):
+    # 對應 B_full_data_with_summary.xlsx：各類型 sheet ＋ Summary（＋ Manifest / Charts / ChartData）
+    # target 可為檔案路徑或 BytesIO；tables = {sheet 名稱: DataFrame}，接在 Summary 之後寫入（如規格檢查結果）
+    book = xlsxwriter.Workbook(target, {"constant_memory": True, "nan_inf_to_errors": True})
+    manifest = []
+    for sheet, logs in sheet_logs.items():
+        if logs:
+            manifest.extend(write_data_sheets(book, sheet, logs, max_rows))
+    if summary_df is not None:
+        write_table(book, "Summary", list(summary_df.columns), summary_df.itertuples(index=False))
+    for name, df in (tables or {}).items():
+        write_table(book, name, list(df.columns), df.itertuples(index=False))
+    if any(part > 1 for _, part, *_ in manifest):
+        write_table(book, "Manifest", ["Sheet", "分段", "來源檔案", "起始筆", "結束筆", "起始時間", "結束時間", "筆數"],
+                    [(*m[:5], str(m[5]) if m[5] else None, str(m[6]) if m[6] else None, m[7]) for m in manifest])
+    if charts:
+        write_charts(book, sheet_logs)
+    book.close()
+    return manifest
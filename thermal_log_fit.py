@@ -0,0 +1,145 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import SENSOR_GROUPS, to_float
+from thermal_log_energy import log_seconds
+from thermal_log_events import run_lengths
+
+# 負載步階後的熱時間常數：所有溫度欄位同時擬合 T(t) = T∞ − ΔT·e^(−t/τ)
+# 以積分形式線性化：T(t) = T0 + (T∞/τ)·t − (1/τ)·∫T dt，對 [1, t, ∫T] 做加權最小平方法，
+# 每個欄位一組 3×3 正規方程式，以 einsum / np.linalg.solve 批次求解，不需逐欄呼叫最佳化器
+
+TEMPERATURE_CHANNELS = [c for g in ("CPU/GPU Temperature", "SEN", "Heatpipe", "Fin / TC") for c in SENSOR_GROUPS[g]]
+STEP_CHANNELS = ['Total System Power [W]', 'CPU Package Power [W]', ' 1:TGP (W)']
+STEP_SECONDS = 30  # 功耗需持續高（低）於門檻至少此秒數才算負載開始（結束）
+FIT_POINTS = 5000  # 擬合前等間隔抽樣的最多筆數
+FIT_COLUMNS = ["檔案", "參數名稱", "負載起點", "負載終點", "τ (s)", "T∞", "ΔT", "T∞ 標準差", "R²", "RMSE"]
+
+
+def row_seconds(log):
+    # 各列的秒數；沒有時間戳記時以每筆 1 秒計
+    seconds = log_seconds(log)
+    return seconds if seconds is not None else np.arange(len(log), dtype=np.float64)
+
+
+def load_step(log, channels=STEP_CHANNELS, min_seconds=STEP_SECONDS):
+    # 第一個持續的負載區段 (start, end)：功耗高於 p1 與 p99 的中點並持續 min_seconds（待機只佔 1% 也能偵測）
+    # 區段結束於第一段持續 min_seconds 的低功耗；找不到明顯步階時回傳 None
+    channel = next((c for c in channels if c in log.standard), None)
+    if channel is None or len(log) < 3:
+        return None
+    power = log.standard_column(channel).astype(np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全為 NaN 的欄位
+        low, high = np.nanpercentile(power, [1, 99])
+    if not np.isfinite(high) or high - low < max(1.0, 0.2 * abs(high)):
+        return None
+    dt = np.diff(row_seconds(log))
+    dt = dt[np.isfinite(dt) & (dt > 0)]
+    min_rows = max(1, int(round(min_seconds / np.median(dt)))) if dt.size else min_seconds
+    above = power > (low + high) / 2
+    cols, starts, ends = run_lengths(np.column_stack([above, ~above & ~np.isnan(power)]))
+    sustained = ends - starts >= min_rows
+    high_starts = starts[(cols == 0) & sustained]
+    if not high_starts.size:
+        return None
+    start = int(high_starts[0])
+    low_starts = starts[(cols == 1) & sustained & (starts > start)]
+    return start, int(low_starts[0]) if low_starts.size else len(log)
+
+
+def forward_fill(values, valid):
+    # 每欄以前一個有效值補 NaN；開頭的 NaN 以第一個有效值補
+    n, k = values.shape
+    index = np.where(valid, np.arange(n)[:, None], 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    filled = values[index, np.arange(k)]
+    first = values[valid.argmax(axis=0), np.arange(k)]
+    return np.where(np.isnan(filled), first, filled)
+
+
+def fit_exponential(t, values):
+    # t: (n,) 秒數（從負載起點算起）；values: (n, k) → 各欄位的 τ、T∞、ΔT、T∞ 標準差、R²、RMSE（無法擬合者為 NaN）
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+    keep = np.isfinite(t)
+    t, values = t[keep], values[keep]
+    if len(t):
+        t = t - t[0]
+    n, k = values.shape
+    nan = np.full(k, np.nan)
+    result = {"tau": nan, "t_inf": nan.copy(), "delta": nan.copy(), "t_inf_std": nan.copy(), "r2": nan.copy(),
+              "rmse": nan.copy()}
+    valid = ~np.isnan(values)
+    if n < 4 or not valid.any():
+        return result
+    filled = forward_fill(values, valid)
+    integral = np.zeros_like(filled)
+    integral[1:] = np.cumsum((filled[1:] + filled[:-1]) * 0.5 * np.diff(t)[:, None], axis=0)
+
+    x = np.empty((n, k, 3))
+    x[..., 0] = 1.0
+    x[..., 1] = t[:, None]
+    x[..., 2] = integral
+    w = valid.astype(np.float64)
+    y = np.where(valid, values, 0.0)
+    a = np.einsum("nk,nka,nkb->kab", w, x, x)
+    b = np.einsum("nk,nka,nk->ka", w, x, y)
+    count = w.sum(axis=0)
+    ok = (count >= 4) & (np.abs(np.linalg.det(a)) > 1e-12)
+    a[~ok] = np.eye(3)
+    coef = np.linalg.solve(a, b[..., None])[..., 0]
+    c0, c1, c2 = coef[:, 0], coef[:, 1], coef[:, 2]
+    ok &= c2 < 0
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        tau = -1.0 / c2
+        t_inf = c1 * tau
+        delta = t_inf - c0
+        # 線性迴歸的共變異數，以 delta method 換算 T∞ = −c1 / c2 的標準差
+        residual = np.where(valid, y - np.einsum("nka,ka->nk", x, coef), 0.0)
+        sigma2 = (residual ** 2).sum(axis=0) / np.maximum(count - 3, 1)
+        cov = np.linalg.inv(a) * sigma2[:, None, None]
+        grad = np.stack([np.zeros(k), -1.0 / c2, c1 / c2 ** 2], axis=1)
+        t_inf_std = np.sqrt(np.einsum("ka,kab,kb->k", grad, cov, grad))
+        predicted = t_inf - delta * np.exp(-t[:, None] / tau)
+        error = np.where(valid, values - predicted, 0.0)
+        mean = (y.sum(axis=0) / count)
+        ss_res = (error ** 2).sum(axis=0)
+        ss_tot = (np.where(valid, values - mean, 0.0) ** 2).sum(axis=0)
+        r2 = 1 - ss_res / ss_tot
+        rmse = np.sqrt(ss_res / count)
+    for key, value in (("tau", tau), ("t_inf", t_inf), ("delta", delta), ("t_inf_std", t_inf_std), ("r2", r2),
+                       ("rmse", rmse)):
+        result[key] = np.where(ok, value, np.nan)
+    return result
+
+
+def fit_log(log, channels=TEMPERATURE_CHANNELS, start=None, end=None, max_points=FIT_POINTS):
+    # 單一 log：在 [start, end) 範圍（預設為偵測到的負載區段）擬合所有溫度欄位
+    # 回傳 (start, end, 欄位列表, fit_exponential 結果)；沒有溫度欄位時回傳 None
+    present = [c for c in channels if c in log.standard]
+    if not present:
+        return None
+    if start is None and end is None:
+        start, end = load_step(log) or (0, len(log))
+    start, end, _ = slice(start, end).indices(len(log))
+    stride = max(1, -(-(end - start) // max_points))
+    rows = slice(start, end, stride)
+    values = log.matrix[rows][:, [log.column_index[log.standard[c]] for c in present]]
+    return start, end, present, fit_exponential(row_seconds(log)[rows], values)
+
+
+def fit_table(logs, channels=TEMPERATURE_CHANNELS):
+    rows = []
+    for log in logs:
+        fitted = fit_log(log, channels)
+        if fitted is None:
+            continue
+        start, end, present, result = fitted
+        for i, channel in enumerate(present):
+            values = [result[key][i] for key in ("tau", "t_inf", "delta", "t_inf_std", "r2", "rmse")]
+            rows.append((log.name, channel.strip(), start, end,
+                         *(to_float(v) if np.isfinite(v) else None for v in values)))
+    return pd.DataFrame(rows, columns=FIT_COLUMNS)
@@ -0,0 +1,88 @@
+import json
+import os
+
+# 各種 log 格式的宣告式規格（registry）；thermal_log_core.compile_format 依規格編譯出讀檔函式
+# 新的工具版本或新的 logger（如 AIDA64、DAQ）只需在 thermal_log_formats.json
+# （與本檔同一資料夾，或環境變數 THERMAL_LOG_FORMATS 指定的檔案）加入規格，不需修改各 app
+#
+# match           檔名（小寫）包含任一字串即判定為此格式
+# priority        分類時的比對順序（小者優先）；外部規格預設 -1，先於內建格式比對
+# header_pattern  標題列的 regex，在檔案開頭樣本中找第一個符合的列
+# preamble        沒有 header_pattern 或找不到時，標題列之前固定略過的列數
+# unit_row        單位列在標題列的 "before" / "after"，None 表示沒有單位列
+# skip_rows       標題列（與單位列）之後再略過的資料列數
+# footer          檔尾規則：整數為固定列數，"non-numeric" 為去掉結尾沒有任何數值的列
+# time_columns    {"date": 日期欄位, "time": 時間欄位}
+# time_format     時間欄位（或「日期 時間」）的 strptime 格式，None 時自動推斷
+# junk_columns    要移除的欄位名稱 regex
+# csv             其他 pd.read_csv 參數（如 {"quoting": 3}；標題列有引號時不套用 quoting）
+# signature       代表性的欄位名稱；標題指紋表查無此格式時，以內容模糊比對的依據
+
+FORMAT_DEFAULTS = {
+    "match": [],
+    "priority": -1,
+    "header_pattern": None,
+    "preamble": 0,
+    "unit_row": None,
+    "skip_rows": 0,
+    "footer": 0,
+    "time_columns": {"date": "Date", "time": "Time"},
+    "time_format": None,
+    "junk_columns": [r"^Unnamed: \d+$"],
+    "csv": {},
+    "signature": [],
+}
+
+BUILTIN_FORMATS = {
+    # HWiNFO64：結尾兩列為重複的標題列與感測器分組名稱；前 5 筆為暖機資料
+    "HW64": {
+        "match": ["hw"],
+        "priority": 2,
+        "skip_rows": 5,
+        "footer": "non-numeric",
+        "csv": {"quoting": 3},
+        "signature": ["Date", "Time", "Total System Power [W]", "CPU Package Power [W]", "CPU Package [°C]",
+                      "IA Cores Power [W]", "GT Cores Power [W]", "Charge Rate [W]"],
+    },
+    # PTAT：標題列後有 5 列說明列，時間為 hh:mm:ss:fff
+    "PTAT": {
+        "match": ["ptat"],
+        "priority": 1,
+        "skip_rows": 5,
+        "time_columns": {"time": "Time"},
+        "time_format": "%H:%M:%S:%f",
+        "signature": ["Time"] + [f"SEN{i}-temp(Degree C)" for i in range(1, 10)],
+    },
+    # GPUmon：開頭 35 列說明，接著單位列，再來才是標題列
+    "GPUmon": {
+        "match": ["gpu"],
+        "priority": 0,
+        "header_pattern": r'^\W*Time\s*"?\s*,',
+        "preamble": 35,
+        "unit_row": "before",
+        "time_columns": {"time": "Time"},
+        "signature": ["Time", " 1:TGP (W)", " 1:NVVDD Power (W)", " 1:FBVDD Power (W)", " 1:Temperature GPU (C)",
+                      " 1:Temperature Memory (C)"],
+    },
+}
+
+FORMATS_FILE = os.environ.get(
+    "THERMAL_LOG_FORMATS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thermal_log_formats.json"))
+
+# 標題指紋表：{指紋: {"format": 格式名稱, "columns": [標題欄位]}}，辨識過的版面下次直接查表
+HEADERS_FILE = os.environ.get(
+    "THERMAL_LOG_HEADERS", os.path.join(os.path.expanduser("~"), ".thermal_log_cache", "header_formats.json"))
+
+
+def load_formats(path=FORMATS_FILE):
+    # 內建規格 + 外部 JSON（{"格式名稱": {規格}, ...}）；同名者以外部規格的欄位覆寫內建值
+    formats = {name: {**FORMAT_DEFAULTS, **spec} for name, spec in BUILTIN_FORMATS.items()}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fp:
+            extra = json.load(fp)
+        for name, spec in extra.items():
+            formats[name] = {**formats.get(name, FORMAT_DEFAULTS), **spec}
+    return formats
+
+
+LOG_FORMATS = load_formats()
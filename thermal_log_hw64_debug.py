@@ -4,16 +4,14 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from io import BytesIO, StringIO
 
-def classify_file(filename):
-    lower = filename.lower()
-    if "gpu" in lower:
-        return "GPUmon"
-    elif "ptat" in lower:
-        return "PTAT"
-    elif "hw" in lower:
-        return "HW64"
-    else:
-        return "Other"
+from thermal_log_core import (
+    HEADER_SAMPLE, detect_encoding, detect_format, format_spec, header_fingerprint, header_region, header_table,
+    read_log, repair_header, sniff_encoding,
+)
+
+def classify_file(source, filename):
+    # 依標題區指紋辨識格式，查無時才模糊比對欄位與檔名
+    return detect_format(source, filename) or "Other"
 
 st.set_page_config(page_title="Thermal Log Debug Tool", layout="wide")
 st.title("🛠️ Thermal Log Debug 工具（HW64資料讀取測試）")
@@ -22,19 +20,33 @@ uploaded_file = st.file_uploader("請上傳一個 HW64 thermal log CSV 檔", typ
 
 if uploaded_file:
     filename = uploaded_file.name
-    file_type = classify_file(filename)
+    file_type = classify_file(uploaded_file.getvalue(), filename)
 
     st.write(f"📄 檔案名稱：{filename}")
     st.write(f"🔍 判定檔案類型：{file_type}")
+    sample = uploaded_file.getvalue()[:HEADER_SAMPLE]
+    region = header_region(sample.decode(detect_encoding(sample), errors="replace"))
+    if region:
+        key = header_fingerprint(region)
+        st.write(f"🧬 標題指紋：{key[:12]}（{'已在指紋表' if key in header_table() else '新版面'}，標題區 {len(region)} 列）")
 
     try:
-        df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip', quoting=3)
+        spec = format_spec(file_type)
+        encoding = sniff_encoding(uploaded_file)
+        df = pd.read_csv(uploaded_file, encoding=encoding, encoding_errors='replace', engine='python', on_bad_lines='skip', **spec["csv"])
+        raw_columns = df.columns.tolist()
+        df.columns = [repair_header(str(c)) for c in raw_columns]
         st.success("✅ 成功讀取檔案")
+        st.write(f"🔤 偵測編碼：{encoding}")
         st.write(f"📏 原始資料筆數：{len(df)}")
         st.write(f"📐 欄位數：{len(df.columns)}")
 
         st.subheader("📋 欄位名稱")
         st.write(df.columns.tolist())
+        repaired = [(a, b) for a, b in zip(raw_columns, df.columns) if a != b]
+        if repaired:
+            st.write("🔧 已修正的欄位名稱：")
+            st.dataframe(pd.DataFrame(repaired, columns=["原始名稱", "修正後"]))
 
         st.subheader("🔎 前 20 筆資料")
         st.dataframe(df.head(20))
@@ -42,6 +54,13 @@ if uploaded_file:
         st.subheader("🔎 後 20 筆資料")
         st.dataframe(df.tail(20))
 
+        st.subheader("🧩 套用格式規格後")
+        st.json(spec)
+        parsed = read_log(uploaded_file.getvalue(), filename, file_type)
+        st.write(f"📏 資料筆數：{len(parsed)}（原始 {len(df)}）")
+        st.write(f"📐 欄位數：{len(parsed.columns)}（原始 {len(df.columns)}）")
+        st.dataframe(parsed.tail(5))
+
     except Exception as e:
         st.error(f"❌ 讀取檔案失敗：{e}")
 else:
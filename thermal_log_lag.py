@@ -0,0 +1,125 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import on_date, reference_log, to_float
+from thermal_log_fit import STEP_CHANNELS
+
+# 不同 logger 之間的時鐘偏移：HW64 主機、PTAT 主機與 DAQ 的時鐘會差上數秒
+# 以共同（或高度相關）欄位在重疊時段做 FFT 互相關，每一對 O(n log n)，峰值以拋物線內插到次取樣精度
+# 偏移量 = 要加到該檔案時間戳記上的秒數，使其與參考檔案對齊；thermal_log_arrow.write_dataset 以 offsets 套用
+# PTAT、GPUmon 只記錄時間：先以 on_date 移到參考檔案（HW64）的日期上再比對
+
+# 優先使用兩個檔案都有的欄位；都沒有時改用各自的功耗欄位（負載步階在各 logger 同時發生）
+LAG_CHANNELS = ['CPU Package Power [W]', 'Total System Power [W]', 'IA Cores Power [W]', 'CPU Package [°C]']
+MAX_LAG_SECONDS = 120
+MIN_OVERLAP_SECONDS = 60
+MIN_CORRELATION = 0.5
+LAG_RESOLUTION = 0.1  # 內插網格間隔（秒），比 1 Hz 取樣細，偏移可估到次取樣精度
+MAX_GRID_POINTS = 1 << 21  # 重疊時段很長時放寬網格間隔，FFT 長度不超過約 4M
+LAG_COLUMNS = ["檔案", "參考檔案", "參考欄位", "比對欄位", "偏移 (s)", "相關係數", "重疊 (s)"]
+
+
+def _seconds(ts, t0):
+    # 相對 t0 的秒數（NaT → NaN）
+    return (ts - t0) / np.timedelta64(1, "s")
+
+
+def _resample(t, values, grid):
+    # 以有效值線性內插到等間隔時間軸，標準化為平均 0、標準差 1；變化不足時回傳 None
+    valid = ~np.isnan(t) & ~np.isnan(values)
+    if valid.sum() < 4:
+        return None
+    order = np.argsort(t[valid], kind="stable")
+    y = np.interp(grid, t[valid][order], values[valid][order].astype(np.float64))
+    std = y.std()
+    return (y - y.mean()) / std if std > 1e-9 else None
+
+
+def _channel_pair(reference, log, channels=LAG_CHANNELS):
+    shared = next((c for c in channels if c in reference.standard and c in log.standard), None)
+    if shared is not None:
+        return shared, shared
+    a = next((c for c in STEP_CHANNELS if c in reference.standard), None)
+    b = next((c for c in STEP_CHANNELS if c in log.standard), None)
+    return (a, b) if a and b else (None, None)
+
+
+def cross_lag(a, b, step, max_lag):
+    # a、b 為同一時間軸上的等長序列 → (b 相對 a 的延遲秒數, 相關係數)
+    # c[k] = Σ a[i]·b[i + k]，以 rfft 計算；峰值在 k = d 表示 b 比 a 晚 d 個取樣
+    n = len(a)
+    size = 1 << int(np.ceil(np.log2(2 * n)))
+    c = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    max_k = min(int(max_lag / step), n - 1)
+    lags = np.arange(-max_k, max_k + 1)
+    values = c[lags % size] / (n - np.abs(lags))  # 依重疊長度正規化成相關係數
+    best = int(np.argmax(values))
+    shift = 0.0
+    if 0 < best < len(values) - 1:
+        y0, y1, y2 = values[best - 1:best + 2]
+        denom = y0 - 2 * y1 + y2
+        shift = 0.5 * (y0 - y2) / denom if denom != 0 else 0.0
+    return (lags[best] + shift) * step, float(values[best])
+
+
+def estimate_lag(reference, log, channels=LAG_CHANNELS, max_lag=MAX_LAG_SECONDS):
+    # log 相對 reference 的時鐘偏移 → dict(offset, 參考欄位, 比對欄位, correlation, overlap)；無法估計時回傳 None
+    if reference.timestamps is None or log.timestamps is None:
+        return None
+    ref_channel, channel = _channel_pair(reference, log, channels)
+    if ref_channel is None:
+        return None
+    valid = reference.timestamps[~np.isnat(reference.timestamps)]
+    if not valid.size:
+        return None
+    t_ref = _seconds(reference.timestamps, valid[0])
+    t_log = _seconds(on_date(log.timestamps, reference.timestamps), valid[0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        first = max(np.nanmin(t_ref), np.nanmin(t_log))
+        last = min(np.nanmax(t_ref), np.nanmax(t_log))
+    if not np.isfinite(last - first) or last - first < MIN_OVERLAP_SECONDS:
+        return None
+    step = max(LAG_RESOLUTION, (last - first) / MAX_GRID_POINTS)
+    grid = np.arange(first, last, step)
+    a = _resample(t_ref, reference.standard_column(ref_channel), grid)
+    b = _resample(t_log, log.standard_column(channel), grid)
+    if a is None or b is None:
+        return None
+    delay, correlation = cross_lag(a, b, step, min(max_lag, (last - first) / 2))
+    if correlation < MIN_CORRELATION:
+        return None
+    return {"offset": -delay, "reference_channel": ref_channel, "channel": channel, "correlation": correlation,
+            "overlap": last - first}
+
+
+def lag_results(logs, channels=LAG_CHANNELS, max_lag=MAX_LAG_SECONDS):
+    # {檔名: estimate_lag 結果 ＋ reference}，只列出估計成功且非參考的檔案；與參考檔案時間不重疊（不同 run）的檔案不列入
+    reference = reference_log(logs)
+    if reference is None:
+        return {}
+    results = {}
+    for log in logs:
+        if log is reference or log.name in results:
+            continue
+        result = estimate_lag(reference, log, channels, max_lag)
+        if result is not None:
+            result["reference"] = reference.name
+            results[log.name] = result
+    return results
+
+
+def estimate_offsets(logs, channels=LAG_CHANNELS, max_lag=MAX_LAG_SECONDS):
+    # {檔名: 偏移秒數}，直接傳給 write_dataset(offsets=...)
+    return {name: r["offset"] for name, r in lag_results(logs, channels, max_lag).items()}
+
+
+def lag_table(results):
+    rows = [
+        (name, r["reference"], r["reference_channel"].strip(), r["channel"].strip(), round(r["offset"], 3),
+         to_float(r["correlation"]), to_float(r["overlap"]))
+        for name, r in results.items()
+    ]
+    return pd.DataFrame(rows, columns=LAG_COLUMNS)
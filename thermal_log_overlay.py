@@ -0,0 +1,39 @@
+import numpy as np
+
+from thermal_log_core import LRUCache, content_key
+from thermal_log_fit import STEP_CHANNELS, load_step, row_seconds
+
+# 多 run 疊圖對齊：每個檔案以第一個持續的功耗步階（thermal_log_fit.load_step）為 t = 0，
+# 不同 run 在待機階段停留多久都不影響曲線比較
+# 負載起點依檔案內容指紋記憶（LRU），Streamlit 每次 rerun（即使 20 個以上的 run）都不需重算
+
+MEMO_ENTRIES = 1024
+_MISSING = object()  # 沒有步階的檔案記憶為 None，與「尚未計算」區分
+
+_starts = LRUCache(MEMO_ENTRIES)
+
+
+def load_start(log, channels=STEP_CHANNELS):
+    # 第一個持續負載步階的起始筆；沒有明顯步階時回傳 None
+    key = (content_key(log), tuple(channels))
+    start = _starts.get(key, _MISSING)
+    if start is _MISSING:
+        step = load_step(log, channels)
+        start = _starts[key] = step[0] if step else None
+    return start
+
+
+def load_starts(logs, channels=STEP_CHANNELS):
+    # {檔名: 負載起始筆或 None}
+    return {log.name: load_start(log, channels) for log in logs}
+
+
+def aligned_seconds(log, rows, origin):
+    # rows（可為抽樣 bucket 中心的小數筆數）→ 相對 origin 筆的秒數；沒有時間戳記時以每筆 1 秒計
+    seconds = row_seconds(log)
+    index = np.arange(len(seconds))
+    valid = ~np.isnan(seconds)
+    if not valid.any():
+        return np.asarray(rows, dtype=np.float64) - origin
+    at = np.interp(np.asarray(rows, dtype=np.float64), index[valid], seconds[valid])
+    return at - np.interp(origin, index[valid], seconds[valid])
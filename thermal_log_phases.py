@@ -0,0 +1,210 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import LRUCache, content_key, summary_columns, to_float
+from thermal_log_fit import STEP_CHANNELS, row_seconds
+from thermal_log_pyramid import build_level, choose_factor
+from thermal_log_windows import WINDOW_COLUMNS, window_stats
+
+# 工作階段切分：在總功耗與 CPU / GPU 功耗上做二元切分（binary segmentation）的變化點偵測
+# 先以金字塔的 bucket 平均把資料壓到最多 COMPACT_POINTS 點，每次切分以 cumsum 向量化找出最佳切點，
+# 整體 O(m log m)（m = 壓縮後點數）；切點再回到原始資料 ±1 個 bucket 內精修
+# 各段依功耗高低標為 idle / ramp / load / cooldown，連續同類的段合併
+# 切分結果依 log 內容記憶（LRU）：階段選單、階段表與分段統計共用同一次計算，rerun 不需重算
+
+COMPACT_POINTS = 4096
+MIN_PHASE_SECONDS = 30  # 每段至少 30 秒
+MIN_STEP_RATIO = 0.1  # 相鄰段平均功耗差需超過功耗範圍（p1 ~ p99）的 10%
+PENALTY = 3.0  # 切分增益需超過 PENALTY × 欄位數 × log(m)（以雜訊變異數為單位）
+LOW_LEVEL, HIGH_LEVEL = 0.25, 0.75  # 功耗在範圍中的相對位置：低於 → idle / cooldown，高於 → load
+LOAD_STEP_RATIO = 0.2  # 相鄰 load 段平均功耗差超過範圍的 20% 時視為不同負載等級
+RAMP_SECONDS = 120  # 介於高低之間且短於此秒數的段視為 ramp，否則為 load（部分負載）
+MEMO_ENTRIES = 256
+PHASE_COLUMNS = ["檔案", "階段", "起始筆", "結束筆", "開始 (min)", "結束 (min)", "平均功率 (W)", "參考欄位"]
+
+_phases = LRUCache(MEMO_ENTRIES)
+
+
+def compact_power(log, channels=STEP_CHANNELS, max_points=COMPACT_POINTS):
+    # (factor, 各功耗欄位的 bucket 平均 (m, k), 欄位列表)；優先使用已建好的金字塔層級
+    present = [c for c in channels if c in log.standard]
+    if not present:
+        return 1, None, present
+    columns = [log.column_index[log.standard[c]] for c in present]
+    factors = tuple(log.pyramid) if log.pyramid else ()
+    factor = choose_factor(len(log), max_points, factors)
+    if factor > 1 and factor in factors:
+        return factor, log.pyramid[factor][2][:, columns], present
+    factor = max(1, -(-len(log) // max_points))
+    block = log.matrix[:, columns]
+    return factor, (build_level(block, factor)[2] if factor > 1 else block), present
+
+
+def _best_split(cs, lo, hi, min_len):
+    # cs: 前綴和 (m + 1, k)；在 [lo, hi) 內找使平方誤差下降最多的切點 → (增益, 切點)
+    n = hi - lo
+    if n < 2 * min_len:
+        return 0.0, None
+    i = np.arange(min_len, n - min_len + 1)
+    left = cs[lo + i] - cs[lo]
+    total = cs[hi] - cs[lo]
+    gain = (left ** 2 / i[:, None] + (total - left) ** 2 / (n - i)[:, None] - total ** 2 / n).sum(axis=1)
+    best = int(np.argmax(gain))
+    return float(gain[best]), lo + int(i[best])
+
+
+def change_points(values, min_len, penalty=PENALTY, min_step=0.0):
+    # values: (m, k) 已除以雜訊標準差 → 遞增的切點列表（不含 0 與 m）
+    m, k = values.shape
+    cs = np.vstack([np.zeros((1, k)), np.cumsum(values, axis=0)])
+    threshold = penalty * k * np.log(max(m, 2))
+    points = []
+    stack = [(0, m)]
+    while stack:
+        lo, hi = stack.pop()
+        gain, split = _best_split(cs, lo, hi, min_len)
+        if split is None or gain <= threshold:
+            continue
+        step = np.abs((cs[hi] - cs[split]) / (hi - split) - (cs[split] - cs[lo]) / (split - lo))
+        if step.max() < min_step:
+            continue
+        points.append(split)
+        stack.extend([(lo, split), (split, hi)])
+    return sorted(points)
+
+
+def _refine(block, point, factor):
+    # 壓縮後的切點 → 原始資料中 ±factor 筆內的最佳切點
+    lo, hi = max(point - factor, 0), min(point + factor, len(block))
+    values = np.nan_to_num(block[lo:hi].astype(np.float64) - np.nanmean(block[lo:hi], axis=0))
+    cs = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    _, split = _best_split(cs, 0, hi - lo, 1)
+    return point if split is None else lo + split
+
+
+def _label(levels, durations):
+    # 各段的相對功耗位置與秒數 → idle / ramp / load / cooldown
+    kinds = []
+    loaded = False
+    for i, (level, seconds) in enumerate(zip(levels, durations)):
+        if level >= HIGH_LEVEL or (level > LOW_LEVEL and seconds >= RAMP_SECONDS):
+            kind = "load"
+        elif level > LOW_LEVEL:
+            kind = "ramp" if not loaded or (i + 1 < len(levels) and levels[i + 1] > level) else "cooldown"
+        else:
+            kind = "cooldown" if loaded else "idle"
+        loaded |= kind == "load"
+        kinds.append(kind)
+    return kinds
+
+
+def segment_phases(log, channels=STEP_CHANNELS):
+    # [(階段名稱, 起始筆, 結束筆, 平均功率), ...]；沒有功耗欄位時回傳 []，功耗沒有明顯變化時整份為一段
+    key = (content_key(log), tuple(channels))
+    phases = _phases.get(key)
+    if phases is None:
+        phases = _phases[key] = _segment(log, channels)
+    return phases
+
+
+def _segment(log, channels):
+    n = len(log)
+    factor, compact, present = compact_power(log, channels)
+    if compact is None or n < 2:
+        return []
+    compact = compact.astype(np.float64)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low, high = np.nanpercentile(compact, [1, 99], axis=0)
+        fill = np.nanmedian(compact, axis=0)
+        noise = 1.4826 * np.nanmedian(np.abs(np.diff(compact, axis=0)), axis=0) / np.sqrt(2)
+    usable = np.isfinite(high) & (high - low >= 1.0)
+    primary = log.standard_column(present[0]).astype(np.float64)
+
+    points = []
+    if usable.any():
+        span = (high - low)[usable]
+        scale = np.maximum(noise[usable], 0.01 * span)
+        values = np.where(np.isnan(compact[:, usable]), fill[usable], compact[:, usable]) / scale
+        dt = np.diff(row_seconds(log))
+        dt = dt[np.isfinite(dt) & (dt > 0)]
+        min_rows = MIN_PHASE_SECONDS / np.median(dt) if dt.size else MIN_PHASE_SECONDS
+        min_len = max(1, int(round(min_rows / factor)))
+        points = change_points(values, min_len, min_step=(MIN_STEP_RATIO * span / scale).min())
+        if factor > 1:
+            block = log.matrix[:, [log.column_index[log.standard[c]] for c, ok in zip(present, usable) if ok]]
+            points = [_refine(block, p * factor, factor) for p in points]
+    bounds = np.unique(np.clip([0, *points, n], 0, n))
+
+    starts, ends = bounds[:-1], bounds[1:]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        means = np.array([np.nanmean(primary[s:e]) for s, e in zip(starts, ends)])
+        p_low, p_high = np.nanpercentile(primary, [1, 99])
+    seconds = row_seconds(log)
+    durations = [np.nanmax(seconds[s:e]) - np.nanmin(seconds[s:e]) for s, e in zip(starts, ends)]
+    if not np.isfinite(p_high) or p_high - p_low < 1.0:
+        kinds = ["load" if np.nanmean(primary) >= 1.0 else "idle"] * len(starts)
+    else:
+        kinds = _label((means - p_low) / (p_high - p_low), durations)
+
+    # 連續同類的段合併（不同功耗等級的 load 各自保留），重複出現的類別加上編號（load 1、load 2 …）
+    merged = []
+    for kind, s, e, mean in zip(kinds, starts, ends, means):
+        same_level = kind != "load" or abs(mean - merged[-1][3]) < LOAD_STEP_RATIO * (p_high - p_low) if merged else False
+        if merged and merged[-1][0] == kind and same_level:
+            merged[-1][2] = e
+        else:
+            merged.append([kind, s, e, mean])
+    counts = {}
+    for kind, *_ in merged:
+        counts[kind] = counts.get(kind, 0) + 1
+    seen = {}
+    phases = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for kind, s, e, _ in merged:
+            seen[kind] = seen.get(kind, 0) + 1
+            label = f"{kind} {seen[kind]}" if counts[kind] > 1 else kind
+            mean = np.nanmean(primary[s:e])
+            phases.append((label, int(s), int(e), to_float(mean) if np.isfinite(mean) else None))
+    return phases
+
+
+def phase_table(logs, channels=STEP_CHANNELS):
+    rows = []
+    for log in logs:
+        phases = segment_phases(log, channels)
+        if not phases:
+            continue
+        seconds = row_seconds(log)
+        reference = next(c for c in channels if c in log.standard).strip()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            for label, s, e, mean in phases:
+                rows.append((log.name, label, s, e, round(float(np.nanmin(seconds[s:e])) / 60, 2),
+                             round(float(np.nanmax(seconds[s:e])) / 60, 2), mean, reference))
+    return pd.DataFrame(rows, columns=PHASE_COLUMNS)
+
+
+def phase_ranges(log, channels=STEP_CHANNELS):
+    # {階段名稱: (起始筆, 結束筆)}，供 Summary / 匯出範圍直接套用
+    return {label: (s, e) for label, s, e, _ in segment_phases(log, channels)}
+
+
+def find_phase(ranges, phase):
+    # 階段名稱 → (實際名稱, (起始筆, 結束筆))；同類階段有多段時名稱帶編號（load 1、load 2…），
+    # 只給類別（如 load）時取該類最長的一段（同長取較早者）；找不到時回傳 None
+    if phase in ranges:
+        return phase, ranges[phase]
+    numbered = [(label, r) for label, r in ranges.items() if label.rsplit(" ", 1)[0] == phase]
+    return max(numbered, key=lambda item: item[1][1] - item[1][0], default=None)
+
+
+def phase_window_table(logs, channels=summary_columns):
+    # 依自動偵測的階段做分段統計（欄位與 thermal_log_windows.window_table 相同）
+    tables = [window_stats(log, [(label, s) for label, s, _, _ in segment_phases(log)], channels) for log in logs]
+    tables = [t for t in tables if len(t)]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=WINDOW_COLUMNS)
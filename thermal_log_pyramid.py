@@ -0,0 +1,56 @@
+import warnings
+
+import numpy as np
+
+# 多解析度 min/max/mean 金字塔：1×（原始資料）、10×、100×、1000× 抽樣
+# 繪圖時依可見範圍與像素寬度挑選層級，任何縮放都只需畫數千點
+
+PYRAMID_FACTORS = (10, 100, 1000)
+
+
+def build_level(matrix, factor):
+    # 每 factor 筆為一個 bucket，最後不足一個 bucket 的部分以 NaN 補齊
+    n, n_cols = matrix.shape
+    n_buckets = -(-n // factor)
+    padded = np.full((n_buckets * factor, n_cols), np.nan, dtype=np.float32)
+    padded[:n] = matrix
+    blocks = padded.reshape(n_buckets, factor, n_cols)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # 全為 NaN 的 bucket
+        return (
+            np.nanmin(blocks, axis=1),
+            np.nanmax(blocks, axis=1),
+            np.nanmean(blocks, axis=1).astype(np.float32),
+        )
+
+
+def build_pyramid(matrix, factors=PYRAMID_FACTORS):
+    # {factor: (min, max, mean)}，每個陣列 shape = (bucket 數, 欄位數)
+    return {f: build_level(matrix, f) for f in factors if f < len(matrix)}
+
+
+def choose_factor(n_visible, max_points, factors):
+    # 挑 bucket 數不超過 max_points 的最細層級；都太多時用最粗的層級
+    if n_visible <= max_points:
+        return 1
+    for f in sorted(factors):
+        if n_visible / f <= max_points:
+            return f
+    return max(factors) if factors else 1
+
+
+def pyramid_view(matrix, pyramid, col, start=0, end=None, max_points=2400):
+    # 回傳 (x, y)：x 為相對 start 的筆數索引
+    # 抽樣層級以 min/max 交錯輸出，折線外觀與原始資料相同（峰值不會被平均掉）
+    end = len(matrix) if end is None else min(end, len(matrix))
+    factor = choose_factor(end - start, max_points, tuple(pyramid))
+    if factor == 1:
+        return np.arange(end - start), matrix[start:end, col]
+    mn, mx, _ = pyramid[factor]
+    b0, b1 = start // factor, -(-end // factor)
+    centers = np.arange(b0, b1) * factor + factor / 2 - start
+    x = np.repeat(centers, 2)
+    y = np.empty(2 * (b1 - b0), dtype=mn.dtype)
+    y[0::2] = mn[b0:b1, col]
+    y[1::2] = mx[b0:b1, col]
+    return x, y
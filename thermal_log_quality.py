@@ -0,0 +1,172 @@
+import re
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import SENSOR_GROUPS, LRUCache, ThermalLog, content_key
+from thermal_log_energy import GAP_FACTOR
+from thermal_log_events import run_lengths
+from thermal_log_fit import forward_fill, row_seconds
+
+# 資料品質檢查：載入時對整個數值矩陣做一次向量化掃描
+#   時間中斷  相鄰時間戳記間隔超過正常間隔 GAP_FACTOR 倍（logger 暫停、掉資料）
+#   卡值      溫度欄位連續 STUCK_SECONDS 秒以上完全不變，且同一欄位在其他時段有變化（感測器斷線、凍結）
+#   超出範圍  超出該類欄位的物理範圍（如 255 °C）
+#   突波      與前後 SPIKE_WINDOW 筆的移動中位數相差超過 SPIKE_K 倍移動 MAD（且超過欄位範圍的 SPIKE_MIN_RATIO）
+# 標記的樣本可在 Summary 中排除（clean_log 將其設為 NaN）
+
+STUCK_SECONDS = 600
+SPIKE_WINDOW = 11
+SPIKE_K = 8.0
+SPIKE_MIN_RATIO = 0.2  # 偏差需超過欄位 p1 ~ p99 範圍的 20%，量化階梯與正常步階不算突波
+CHUNK_ELEMENTS = 1 << 24  # 移動中位數每段處理的元素數（筆數 × 欄位數 × 視窗）
+SCAN_LIMIT = 256 << 20  # 記憶的掃描結果（三個 (n, k) bool 標記）總大小（位元組）
+
+_TEMPERATURE = {c for g in ("CPU/GPU Temperature", "SEN", "Heatpipe", "Fin / TC") for c in SENSOR_GROUPS[g]}
+# (欄位名稱樣式, 下限, 上限)；依序比對，第一個符合者生效，都不符合的欄位不檢查範圍
+QUALITY_RANGES = [
+    (re.compile(r"°C|\(C\)|degree c|temp", re.I), -40.0, 150.0),
+    (re.compile(r"\[W\]|\(W\)"), -300.0, 1000.0),
+    (re.compile(r"MHz"), 0.0, 10000.0),
+    (re.compile(r"%"), 0.0, 100.0),
+]
+ISSUES = ("時間中斷", "卡值", "超出範圍", "突波")
+QUALITY_COLUMNS = ["檔案", "欄位", "問題", "次數", "樣本數", "首次 (筆)", "說明"]
+
+_scans = LRUCache(SCAN_LIMIT, weight=lambda result: sum(mask.nbytes for mask in result[0].values()))
+
+
+def channel_ranges(log):
+    # 各欄位的 (下限, 上限)，不檢查的欄位為 (-inf, inf)
+    temperature = {log.standard[c] for c in _TEMPERATURE if c in log.standard}
+    lower = np.full(len(log.columns), -np.inf)
+    upper = np.full(len(log.columns), np.inf)
+    for i, column in enumerate(log.columns):
+        if column in temperature:
+            lower[i], upper[i] = QUALITY_RANGES[0][1:]
+            continue
+        for pattern, lo, hi in QUALITY_RANGES:
+            if pattern.search(column):
+                lower[i], upper[i] = lo, hi
+                break
+    return lower, upper
+
+
+def rolling_median(matrix, window=SPIKE_WINDOW):
+    # 置中的移動中位數與移動 MAD（window 為奇數），頭尾以邊界值延伸；分段處理，暫存不超過 CHUNK_ELEMENTS
+    # NaN 先以前一個有效值補上，再以 np.partition 取中位數（比 nanmedian 快數倍）
+    n, k = matrix.shape
+    half = window // 2
+    valid = ~np.isnan(matrix)
+    filled = forward_fill(matrix, valid) if valid.any() else matrix
+    padded = np.pad(filled, ((half, half), (0, 0)), mode="edge")
+    median = np.empty((n, k), dtype=np.float32)
+    mad = np.empty((n, k), dtype=np.float32)
+    rows = max(1024, CHUNK_ELEMENTS // max(1, k * window))
+    for s in range(0, n, rows):
+        e = min(s + rows, n)
+        view = np.lib.stride_tricks.sliding_window_view(padded[s:e + 2 * half], window, axis=0)
+        median[s:e] = np.partition(view, half, axis=-1)[..., half]
+        mad[s:e] = np.partition(np.abs(view - median[s:e, :, None]), half, axis=-1)[..., half]
+    return median, mad
+
+
+def scan_log(log):
+    # → (樣本標記 dict{問題: (n, k) bool}, 時間中斷 dict(次數, 秒數, 首次, 正常間隔))；依 log 內容記憶
+    key = content_key(log)
+    result = _scans.get(key)
+    if result is not None:
+        return result
+    matrix = log.matrix
+    n = len(log)
+    valid = ~np.isnan(matrix)
+    lower, upper = channel_ranges(log)
+    out_of_range = valid & ((matrix < lower) | (matrix > upper))
+
+    # 突波判斷前先排除超出範圍的值，避免 255 °C 這類值拉高移動中位數
+    values = np.where(out_of_range, np.float32(np.nan), matrix)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        low, high = np.nanpercentile(values, [1, 99], axis=0) if n else (np.zeros(0), np.zeros(0))
+    median, mad = rolling_median(values)
+    limit = np.maximum(SPIKE_K * 1.4826 * mad, SPIKE_MIN_RATIO * np.nan_to_num(high - low))
+    with np.errstate(invalid="ignore"):
+        spikes = (np.abs(values - median) > limit) & (limit > 0)
+
+    # 卡值：溫度類欄位（依 QUALITY_RANGES 第一類判斷）相鄰差為 0 的連續區段，長度換算成秒數
+    # 時脈、功耗在負載下本來就可能長時間固定，不檢查；整份都不變的欄位（常數欄位）也不算
+    seconds = row_seconds(log)
+    dt = np.diff(seconds)
+    normal = dt[np.isfinite(dt) & (dt > 0)]
+    interval = float(np.median(normal)) if normal.size else 1.0
+    stuck = np.zeros_like(valid)
+    if n > 1:
+        same = (np.diff(matrix, axis=0) == 0)
+        cols, starts, ends = run_lengths(same)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            varying = np.nanmax(matrix, axis=0) > np.nanmin(matrix, axis=0)
+        checked = varying & (lower == QUALITY_RANGES[0][1]) & (upper == QUALITY_RANGES[0][2])
+        long = ((ends - starts) * interval >= STUCK_SECONDS) & checked[cols]
+        for c, s, e in zip(cols[long], starts[long], ends[long]):
+            stuck[s:e + 1, c] = True
+
+    gap = dt > GAP_FACTOR * interval
+    gaps = {"count": int(gap.sum()), "seconds": float(dt[gap].sum()),
+            "first": int(np.argmax(gap)) + 1 if gap.any() else None, "interval": interval}
+    result = ({"卡值": stuck, "超出範圍": out_of_range, "突波": spikes & ~stuck}, gaps)
+    _scans[key] = result
+    return result
+
+
+def quality_mask(log):
+    # (n, k) bool：任一問題標記的樣本
+    flags, _ = scan_log(log)
+    return flags["卡值"] | flags["超出範圍"] | flags["突波"]
+
+
+def clean_log(log):
+    # 標記的樣本設為 NaN 的新 ThermalLog（供 Summary 排除異常值）；沒有標記時回傳原物件
+    mask = quality_mask(log)
+    if not mask.any():
+        return log
+    result = ThermalLog(log.name, log.file_type, log.columns, np.where(mask, np.float32(np.nan), log.matrix),
+                        timestamps=log.timestamps, fingerprint=log.fingerprint, source=log.source)
+    result.standard = dict(log.standard)
+    result.variant = log.variant + ("clean",)
+    return result
+
+
+def quality_report(log):
+    # 單一檔案的品質報告（QUALITY_COLUMNS），沒有問題時為空表
+    flags, gaps = scan_log(log)
+    rows = []
+    if gaps["count"]:
+        rows.append((log.name, "（時間戳記）", "時間中斷", gaps["count"], None, gaps["first"],
+                     f"共略過 {gaps['seconds']:.1f} 秒（正常間隔 {gaps['interval']:g} 秒）"))
+    for issue in ISSUES[1:]:
+        mask = flags[issue]
+        if not mask.any():
+            continue
+        cols, starts, _ = run_lengths(mask)
+        samples = mask.sum(axis=0)
+        counts = np.bincount(cols, minlength=mask.shape[1])
+        firsts = np.full(mask.shape[1], -1)
+        firsts[cols[::-1]] = starts[::-1]  # 每欄第一個區段
+        for c in np.flatnonzero(samples):
+            column = log.columns[c]
+            values = log.matrix[mask[:, c], c]
+            if issue == "超出範圍":
+                note = f"最小 {np.min(values):g}，最大 {np.max(values):g}"
+            elif issue == "卡值":
+                note = f"固定於 {values[0]:g}"
+            else:
+                note = f"絕對值最大者 {values[np.argmax(np.abs(values))]:g}"
+            rows.append((log.name, column, issue, int(counts[c]), int(samples[c]), int(firsts[c]), note))
+    return pd.DataFrame(rows, columns=QUALITY_COLUMNS)
+
+
+def quality_table(logs):
+    tables = [t for t in (quality_report(log) for log in logs) if len(t)]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=QUALITY_COLUMNS)
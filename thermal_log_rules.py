@@ -0,0 +1,161 @@
+import argparse
+import json
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_catalog import DEFAULT_DB, TAIL_ROWS, connect, stat_matrix
+from thermal_log_core import normalize, summary_columns
+
+# 規格檢查：每個標準欄位宣告上下限，編譯成陣列後以向量化比較一次檢查所有 run
+# 限制值可在 thermal_log_limits.json（與本檔同一資料夾，或環境變數 THERMAL_LOG_LIMITS 指定的檔案）覆寫，例如
+# {"SEN1-temp(Degree C)": {"stat": "max", "max": 46}, "CPUfin": null}   ← null 表示不檢查此欄位
+#
+# stat  比較的統計量：max、min、mean、tail_mean（最後 TAIL_ROWS 筆平均，與穩態平均一致）
+# max   統計量不可超過此值；min：統計量不可低於此值
+
+RULE_STATS = ("max", "min", "mean", "tail_mean")
+
+DEFAULT_LIMITS = {
+    'CPU Package [°C]': {"stat": "max", "max": 100},
+    ' 1:Temperature GPU (C)': {"stat": "max", "max": 87},
+    ' 1:Temperature Memory (C)': {"stat": "max", "max": 95},
+    **{f'SEN{i}-temp(Degree C)': {"stat": "max", "max": 48} for i in range(1, 10)},
+    **{f'HP{p}-{i}': {"stat": "max", "max": 95} for p in (1, 2) for i in range(1, 5)},
+    'CPUfin': {"stat": "max", "max": 85},
+    'GPUfin': {"stat": "max", "max": 85},
+}
+
+LIMITS_FILE = os.environ.get(
+    "THERMAL_LOG_LIMITS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "thermal_log_limits.json"))
+
+
+def load_limits(path=LIMITS_FILE):
+    limits = dict(DEFAULT_LIMITS)
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as fp:
+            for channel, limit in json.load(fp).items():
+                if limit is None:
+                    limits.pop(channel, None)
+                else:
+                    limits[channel] = limit
+    return limits
+
+
+def compile_limits(limits):
+    # {標準欄位: 限制} → 陣列形式的規則；欄位不在 summary_columns 或統計量未知時丟出 ValueError
+    known = {normalize(c): c for c in summary_columns}
+    channels, stats, lower, upper = [], [], [], []
+    for channel, limit in limits.items():
+        if normalize(channel) not in known:
+            raise ValueError(f"未知的標準欄位：{channel}")
+        if not isinstance(limit, dict):
+            raise ValueError(f"限制值格式錯誤（{channel}）：{limit}")
+        stat = limit.get("stat", "max")
+        if stat not in RULE_STATS:
+            raise ValueError(f"未知的統計量：{stat}")
+        channels.append(known[normalize(channel)])
+        stats.append(stat)
+        lower.append(limit.get("min", -np.inf))
+        upper.append(limit.get("max", np.inf))
+    labels = []
+    for channel, stat, lo, hi in zip(channels, stats, lower, upper):
+        bounds = [f"≥ {lo:g}"] if np.isfinite(lo) else []
+        bounds += [f"≤ {hi:g}"] if np.isfinite(hi) else []
+        labels.append(f"{channel.strip()} {stat} {' '.join(bounds)}")
+    return {
+        "channels": channels,
+        "stats": stats,
+        "labels": labels,
+        "lower": np.array(lower, dtype=np.float64),
+        "upper": np.array(upper, dtype=np.float64),
+    }
+
+
+def log_values(logs, rules):
+    # 各 log 的規則統計量矩陣，shape = (log 數, 規則數)，缺少的欄位為 NaN
+    stat_index = np.array([RULE_STATS.index(s) for s in rules["stats"]])
+    values = np.full((len(logs), len(rules["channels"])), np.nan)
+    for i, log in enumerate(logs):
+        present = [j for j, c in enumerate(rules["channels"]) if c in log.standard]
+        if not present or not len(log):
+            continue
+        block = log.matrix[:, [log.column_index[log.standard[rules["channels"][j]]] for j in present]]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # 全為 NaN 的欄位
+            stats = np.stack([
+                np.nanmax(block, axis=0), np.nanmin(block, axis=0), np.nanmean(block, axis=0),
+                np.nanmean(block[-TAIL_ROWS:], axis=0),
+            ])
+        values[i, present] = stats[stat_index[present], np.arange(len(present))]
+    return values
+
+
+def evaluate(rules, values):
+    # 1 = 通過、0 = 不通過、-1 = 缺少欄位；NaN 比較結果為 False，不會被判為不通過
+    status = np.where((values < rules["lower"]) | (values > rules["upper"]), 0, 1).astype(np.int8)
+    status[np.isnan(values)] = -1
+    return status
+
+
+def compliance_matrix(names, rules, values):
+    # run × 規則的 PASS / FAIL 表（缺少欄位為 "-"），最後一欄為整體結果
+    status = evaluate(rules, values)
+    table = pd.DataFrame(np.choose(status + 1, ["-", "FAIL", "PASS"]), index=names, columns=rules["labels"])
+    table["結果"] = np.where((status == 0).any(axis=1), "FAIL", np.where((status == 1).any(axis=1), "PASS", "-"))
+    table.index.name = "檔案"
+    return table
+
+
+def checked_columns(table):
+    # 只保留至少一個 run 有資料的規則欄位（與結果欄），方便顯示
+    return table.loc[:, (table != "-").any().to_numpy() | (table.columns == "結果")]
+
+
+def default_rules(path=LIMITS_FILE):
+    # 使用時才讀取並編譯限制檔：檔案有誤（未知欄位、JSON 格式錯誤）時丟出 ValueError，由各 app / CLI 回報，不影響匯入
+    return compile_limits(load_limits(path))
+
+
+def check_logs(logs, rules=None):
+    rules = rules or default_rules()
+    return compliance_matrix([log.name for log in logs], rules, log_values(logs, rules))
+
+
+def check_catalog(conn, rules=None, platform=None, date_from=None, date_to=None):
+    rules = rules or default_rules()
+    names, values = stat_matrix(conn, rules["channels"], rules["stats"], platform, date_from, date_to)
+    return compliance_matrix(names, rules, values)
+
+
+def main(argv=None):
+    # 用法：python thermal_log_rules.py --db thermal_catalog.db --platform X --limits limits.json
+    parser = argparse.ArgumentParser(description="Thermal Log 規格檢查（SQLite run 目錄）")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"資料庫路徑（預設 {DEFAULT_DB}）")
+    parser.add_argument("--limits", default=LIMITS_FILE, help="限制值 JSON（預設 thermal_log_limits.json）")
+    parser.add_argument("--platform", default=None)
+    parser.add_argument("--date-from", default=None)
+    parser.add_argument("--date-to", default=None)
+    parser.add_argument("-o", "--out", default=None, help="另存 PASS / FAIL 表為 CSV")
+    args = parser.parse_args(argv)
+
+    try:
+        rules = default_rules(args.limits)
+    except ValueError as e:
+        print(f"❌ 限制值檔案錯誤：{e}", file=sys.stderr)
+        return 2
+    conn = connect(args.db)
+    table = check_catalog(conn, rules, args.platform, args.date_from, args.date_to)
+    conn.close()
+    if args.out:
+        table.to_csv(args.out, encoding="utf-8-sig")
+    table = checked_columns(table)
+    print(table.to_string())
+    return 1 if (table["結果"] == "FAIL").any() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
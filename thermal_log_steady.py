@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import detect_format, load_log, to_float
+from thermal_log_fit import TEMPERATURE_CHANNELS, fit_log, load_step, row_seconds
+
+# 穩態提前預測：在仍在增長（或只跑了一部分）的 log 上，從負載起點擬合各溫度欄位的指數趨近曲線，
+# 估計最終穩態值與信賴區間；所有欄位的預測都在容許誤差內時即可提前結束 soak 測試
+# 信賴區間 = 迴歸標準差與「只用前 70%、80%、90% 資料」預測值的離散程度合併，避免資料不足時過度樂觀
+
+STEADY_TOLERANCE = 1.0  # °C
+CONFIDENCE_Z = 1.96
+RECENT_SECONDS = 60  # 「目前值」為最後 60 秒平均
+MIN_FIT_SECONDS = 120  # 負載開始後至少 120 秒才預測
+PREFIX_FRACTIONS = (0.7, 0.8, 0.9)
+STEADY_COLUMNS = ["檔案", "參數名稱", "方法", "目前值", "預測穩態", "信賴區間 ±", "τ (s)", "已測 (s)", "預估還需 (s)", "已達穩態"]
+
+
+def _window_mean(values, seconds, first, last):
+    # seconds 在 [first, last) 之間的各欄平均
+    rows = (seconds >= first) & (seconds < last)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(values[rows], axis=0), np.nanstd(values[rows], axis=0)
+
+
+def predict_steady(log, channels=TEMPERATURE_CHANNELS, tolerance=STEADY_TOLERANCE):
+    present = [c for c in channels if c in log.standard]
+    if not present or len(log) < 4:
+        return pd.DataFrame(columns=STEADY_COLUMNS)
+    start, end = load_step(log) or (0, len(log))
+    seconds = row_seconds(log)
+    elapsed = float(np.nanmax(seconds[start:end]) - np.nanmin(seconds[start:end]))
+
+    _, _, _, fit = fit_log(log, present, start, end)
+    prefixes = np.stack([fit_log(log, present, start, start + int((end - start) * f))[3]["t_inf"]
+                         for f in PREFIX_FRACTIONS])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        spread = np.nanstd(np.vstack([prefixes, fit["t_inf"]]), axis=0)
+    predicted = fit["t_inf"]
+    half = CONFIDENCE_Z * np.sqrt(fit["t_inf_std"] ** 2 + spread ** 2)
+
+    values = log.matrix[start:end][:, [log.column_index[log.standard[c]] for c in present]]
+    t = seconds[start:end]
+    t_end = np.nanmax(t)
+    current, noise = _window_mean(values, t, t_end - RECENT_SECONDS, np.inf)
+    previous, _ = _window_mean(values, t, t_end - 2 * RECENT_SECONDS, t_end - RECENT_SECONDS)
+
+    # 沒有指數趨勢（擬合失敗）但最近兩段平均幾乎不變的欄位視為已平坦，預測值即目前值
+    flat = ~np.isfinite(predicted) & (np.abs(current - previous) <= tolerance / 2)
+    predicted = np.where(flat, current, predicted)
+    half = np.where(flat, CONFIDENCE_Z * noise, half)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reach = fit["tau"] * np.log(np.abs(fit["delta"]) / tolerance)
+    remaining = np.where(flat, 0.0, np.maximum(np.nan_to_num(reach, nan=np.inf) - elapsed, 0.0))
+    ready = (np.isfinite(predicted) & (half <= tolerance) & (np.abs(current - predicted) <= tolerance)
+             & (elapsed >= MIN_FIT_SECONDS))
+
+    def clean(v):
+        return to_float(v) if np.isfinite(v) else None
+
+    rows = [
+        (log.name, channel.strip(), "平坦" if flat[i] else "擬合", clean(current[i]), clean(predicted[i]),
+         clean(half[i]), clean(fit["tau"][i]), to_float(elapsed), clean(remaining[i]), bool(ready[i]))
+        for i, channel in enumerate(present)
+    ]
+    return pd.DataFrame(rows, columns=STEADY_COLUMNS)
+
+
+def steady_table(logs, channels=TEMPERATURE_CHANNELS, tolerance=STEADY_TOLERANCE):
+    tables = [t for t in (predict_steady(log, channels, tolerance) for log in logs) if len(t)]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=STEADY_COLUMNS)
+
+
+def all_steady(table):
+    # 所有欄位都已在容許誤差內（沒有任何欄位時為 False）
+    return bool(len(table)) and bool(table["已達穩態"].all())
+
+
+def main(argv=None):
+    # 用法：python thermal_log_steady.py run_hw64.csv run_ptat.csv --watch 30
+    # --watch 時每 N 秒重新讀取增長中的 log，全部欄位達穩態時結束（exit 0）
+    parser = argparse.ArgumentParser(description="Thermal Log 穩態提前預測")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--tolerance", type=float, default=STEADY_TOLERANCE, help=f"容許誤差（預設 {STEADY_TOLERANCE}）")
+    parser.add_argument("--watch", type=float, default=None, help="每 N 秒重新檢查，直到全部欄位達穩態")
+    args = parser.parse_args(argv)
+
+    while True:
+        logs = []
+        for path in args.paths:
+            name = os.path.basename(path)
+            file_type = detect_format(path, name)
+            if not file_type:
+                print(f"⚠️ {name}：無法分類，已略過", file=sys.stderr)
+                continue
+            try:
+                logs.append(load_log(path, name, file_type))
+            except Exception as e:
+                print(f"⚠️ {name}：{e}", file=sys.stderr)
+        table = steady_table(logs, tolerance=args.tolerance)
+        print(table.to_string(index=False))
+        if all_steady(table):
+            print("✅ 所有欄位皆已在容許誤差內，可提前結束測試")
+            return 0
+        if args.watch is None:
+            return 1
+        print(f"⏳ {args.watch:g} 秒後重新檢查…")
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,23 +2,19 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
+import numpy as np
 from io import BytesIO, StringIO
 
+from thermal_log_core import detect_format, load_log
+
 def normalize(col):
     if not isinstance(col, str):
         return ""
     return col.strip().lower().replace(" ", "").replace(":", "").replace("（", "(").replace("）", ")")
 
-def classify_file(filename):
-    lower = filename.lower()
-    if "gpu" in lower:
-        return "GPUmon"
-    elif "ptat" in lower:
-        return "PTAT"
-    elif "hw" in lower:
-        return "HW64"
-    else:
-        return "Other"
+def classify_file(source, filename):
+    # 依標題區指紋辨識格式（檔名改過也能辨識），查無時才模糊比對欄位與檔名
+    return detect_format(source, filename) or "Other"
 
 column_alias_map = {
     'Total System Power [W]': ['Total System Power [W]', 'System Power(W)'],
@@ -29,7 +25,7 @@ column_alias_map = {
     'GT Cores Power [W]': ['GT Cores Power [W]'],
     ' 1:NVVDD Power (W)': ['1:NVVDD Power (W)'],
     ' 1:FBVDD Power (W)': ['1:FBVDD Power (W)'],
-    'CPU Package [蚓]': ['CPU Package [蚓]', 'CPU Temperature(°C)', 'CPU Package(C)'],
+    'CPU Package [°C]': ['CPU Package [°C]', 'CPU Temperature(°C)', 'CPU Package(C)'],
     ' 1:Temperature GPU (C)': ['1:Temperature GPU (C)', 'GPU Temperature(°C)', '1:GPU Temperature (C)'],
     ' 1:Temperature Memory (C)': ['1:Temperature Memory (C)', 'Memory Temperature(°C)', '1:Memory Temperature (C)'],
     'SEN1-temp(Degree C)': ['SEN1-temp(Degree C)', 'Temp0 [°C]'],
@@ -48,10 +44,9 @@ st.title("Thermal Log 分析工具（v6.4 - 常用欄位別名比對修正）")
 
 uploaded_files = st.file_uploader("請上傳 thermal log 的 CSV 檔（可多選）", type="csv", accept_multiple_files=True)
 
-all_dataframes = {}
+logs = {}
 file_column_selection = {}
 file_range_selection = {}
-valid_dataframes = []
 
 if uploaded_files:
     st.info("📌 每個檔案可選擇多個欄位與資料範圍，圖表支援高解析度（DPI 200）")
@@ -60,27 +55,11 @@ if uploaded_files:
         try:
             filename = uploaded_file.name
             shortname = filename.split('/')[-1]
-            file_type = classify_file(filename)
-
-            if file_type == "GPUmon":
-                all_lines = uploaded_file.getvalue().decode('cp950').splitlines()
-                df = pd.read_csv(StringIO("\n".join(all_lines[35:])), encoding='cp950', engine='python')
-            elif file_type == "PTAT":
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip')
-                df = df.iloc[5:].reset_index(drop=True)
-            elif file_type == "HW64":
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip', quoting=3)
-                df = df.reset_index(drop=True)
-                if not pd.to_numeric(df.iloc[-1].dropna(), errors='coerce').notna().all():
-                    df = df.iloc[:-1]
-                df.columns = df.columns.str.strip()
-            else:
-                df = pd.read_csv(uploaded_file, encoding='cp950', engine='python', on_bad_lines='skip')
-                df = df.reset_index(drop=True)
-                df.columns = df.columns.str.strip()
-
-            all_dataframes[shortname] = df
-            valid_dataframes.append((shortname, df))
+            data = uploaded_file.getvalue()
+            file_type = classify_file(data, filename)
+
+            # 各格式的前言、標題列、檔尾與編碼依 thermal_log_formats 的規格處理
+            logs[shortname] = load_log(data, shortname, file_type)
 
         except Exception as e:
             st.error(f"❌ 檔案 {filename} 發生錯誤：{e}")
@@ -91,16 +70,16 @@ if uploaded_files:
     unique_param_results = []
     added_keys = set()
 
-    for shortname, df in valid_dataframes:
-        df_tail = df.tail(600)
+    for shortname, log in logs.items():
         for standard_name, alias_list in column_alias_map.items():
             norm_key = normalize(standard_name)
             if norm_key in added_keys:
                 continue
-            match = [c for c in df_tail.columns if normalize(c) in [normalize(a) for a in alias_list]]
+            match = [c for c in log.columns if normalize(c) in [normalize(a) for a in alias_list]]
             if match:
-                values = pd.to_numeric(df_tail[match[0]], errors='coerce').dropna()
-                value = f"{values.mean():.2f}" if not values.empty else "-"
+                values = log.column(match[0], -600)
+                values = values[~np.isnan(values)]
+                value = f"{values.mean():.2f}" if values.size else "-"
                 unique_param_results.append((standard_name, value))
                 added_keys.add(norm_key)
 
@@ -0,0 +1,114 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from thermal_log_core import clean_float32, summary_columns
+from thermal_log_fit import row_seconds
+
+# 分段統計：每 N 分鐘（或自訂的階段邊界）一列的 mean / min / max
+# 所有欄位一次以 np.add.reduceat / np.fmin.reduceat / np.fmax.reduceat 沿列方向彙總，不建立 DataFrame 也不用 groupby
+# 階段邊界格式：「名稱=起始分鐘」以逗號分隔，例如 idle=0, load=5, cooldown=35（從 log 第一個時間戳記起算）
+
+WINDOW_MINUTES = 5
+WINDOW_STATS = ("mean", "min", "max")
+WINDOW_COLUMNS = ["檔案", "區段", "起始筆", "結束筆", "開始 (min)", "結束 (min)", "參數名稱", *WINDOW_STATS, "筆數"]
+
+
+def parse_phases(text):
+    # "idle=0, load=5, cooldown=35" → [("idle", 0.0), ("load", 5.0), ("cooldown", 35.0)]；空白 → []
+    phases = []
+    for part in str(text or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "=" not in part:
+            raise ValueError(f"階段格式應為「名稱=起始分鐘」：{part}")
+        label, minutes = part.rsplit("=", 1)
+        try:
+            phases.append((label.strip(), float(minutes)))
+        except ValueError:
+            raise ValueError(f"起始分鐘不是數字：{part}") from None
+    if any(b[1] <= a[1] for a, b in zip(phases, phases[1:])):
+        raise ValueError("階段起始分鐘需遞增")
+    return phases
+
+
+def _monotonic_seconds(log):
+    # searchsorted 需要遞增序列：NaT 視為與前一筆同時
+    seconds = row_seconds(log)
+    return np.maximum.accumulate(np.where(np.isnan(seconds), -np.inf, seconds))
+
+
+def fixed_windows(log, minutes=WINDOW_MINUTES):
+    # 每 minutes 分鐘一段 → [(標籤, 起始筆), ...]
+    seconds = _monotonic_seconds(log)
+    if not len(seconds) or not np.isfinite(seconds[-1]):
+        return [("0", 0)] if len(seconds) else []
+    edges = np.arange(0, seconds[-1] + 1e-9, minutes * 60)
+    starts = np.searchsorted(seconds, edges)
+    return [(f"{m:g}-{m + minutes:g} min", int(s)) for m, s in zip(edges / 60, starts)]
+
+
+def phase_windows(log, phases):
+    # 自訂階段 → [(名稱, 起始筆), ...]；第一個階段之前的資料不列入
+    seconds = _monotonic_seconds(log)
+    starts = np.searchsorted(seconds, [minutes * 60 for _, minutes in phases])
+    return [(label, int(s)) for (label, _), s in zip(phases, starts)]
+
+
+def aggregate(matrix, starts):
+    # matrix: (n, k)；starts: 遞增且 < n 的起始列 → (mean, min, max, count)，每個皆為 (段數, k)
+    # NaN 不計入；全為 NaN 的區段結果為 NaN
+    valid = ~np.isnan(matrix)
+    count = np.add.reduceat(valid, starts, axis=0, dtype=np.int64)
+    total = np.add.reduceat(np.where(valid, matrix, 0), starts, axis=0, dtype=np.float64)
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        mean = total / count
+        low = np.fmin.reduceat(matrix, starts, axis=0)
+        high = np.fmax.reduceat(matrix, starts, axis=0)
+    return mean, low, high, count
+
+
+def window_stats(log, windows, channels=summary_columns):
+    # windows: [(標籤, 起始筆), ...]，每段到下一段起點（最後一段到 log 結尾）為止 → WINDOW_COLUMNS 的 DataFrame
+    present = [c for c in channels if c in log.standard]
+    n = len(log)
+    # 去掉空的區段（起點相同或超出 log），reduceat 遇到重複起點會回傳單筆而不是空集合
+    windows = [(label, s) for i, (label, s) in enumerate(windows)
+               if s < n and (i + 1 == len(windows) or windows[i + 1][1] > s)]
+    if not present or not windows:
+        return pd.DataFrame(columns=WINDOW_COLUMNS)
+    starts = np.array([s for _, s in windows])
+    ends = np.append(starts[1:], n)
+    values = log.matrix[starts[0]:][:, [log.column_index[log.standard[c]] for c in present]]
+    mean, low, high, count = aggregate(values, starts - starts[0])
+    _, first, last, _ = aggregate(row_seconds(log)[starts[0]:, None], starts - starts[0])
+    first, last = first[:, 0] / 60, last[:, 0] / 60
+
+    k = len(present)
+    table = pd.DataFrame({
+        "檔案": log.name,
+        "區段": np.repeat([label for label, _ in windows], k),
+        "起始筆": np.repeat(starts, k),
+        "結束筆": np.repeat(ends, k),
+        "開始 (min)": np.repeat(first, k).round(2),
+        "結束 (min)": np.repeat(last, k).round(2),
+        "參數名稱": np.tile([c.strip() for c in present], len(windows)),
+        "mean": clean_float32(mean.ravel()),
+        "min": clean_float32(low.ravel()),
+        "max": clean_float32(high.ravel()),
+        "筆數": count.ravel(),
+    }, columns=WINDOW_COLUMNS)
+    return table[table["筆數"] > 0].reset_index(drop=True)
+
+
+def window_table(logs, minutes=WINDOW_MINUTES, phases=None, channels=summary_columns):
+    # 所有檔案的分段統計；phases 有指定時依階段切分，否則每 minutes 分鐘一段
+    tables = [
+        window_stats(log, phase_windows(log, phases) if phases else fixed_windows(log, minutes), channels)
+        for log in logs
+    ]
+    tables = [t for t in tables if len(t)]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=WINDOW_COLUMNS)